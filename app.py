@@ -1,17 +1,18 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
-from flasgger import Swagger
-from extensions import db
+from extensions import (alternatives, comment_buffer, compression, db, metrics, profiler,
+                        scan_log, snapshot, stats, tag_index, thumbnails)
+from scripts.apispec import LazySwagger
+from scripts.commands import register_commands
 
-# import data models to create data base tables
-from model.product import Product
-from model.comment import Comment
-from model.user import User
 
-
-def create_app():
+def create_app(config=None):
     """
     Creates and configures the Flask application, integrating OpenAPI 3.0.
+
+    Args:
+        config (dict | None): Overrides applied on top of the default config
+            (e.g. a separate SQLALCHEMY_DATABASE_URI for benchmarks).
     """
 
     # API Configuration (Metadata for OpenAPI)
@@ -28,6 +29,74 @@ def create_app():
     app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///truthlable.db'
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+    # Open Food Facts API (overridden by the benchmark stub server)
+    app.config['OFF_BASE_URL'] = 'https://br.openfoodfacts.net'
+
+    # Performance instrumentation exposed at /metrics (Prometheus format)
+    app.config['METRICS_ENABLED'] = True
+
+    # Opt-in profiling (X-Profile: 1 header or ?profile=1), off by default
+    app.config['PROFILING_ENABLED'] = False
+    app.config['PROFILING_MAX_FILES'] = 50
+
+    # OpenAPI spec precomputed at build time (flask --app app export-apispec).
+    # When None, the spec is generated on the first /apispec.json request.
+    app.config['SWAGGER_SPEC_FILE'] = None
+
+    # Write-behind for POST /comment: comments are queued and committed in
+    # batches by a writer thread (group commit). Off by default.
+    # COMMENT_BUFFER_ACK: 'queued' (202 + provisional id) or 'committed'
+    # (waits for the batch commit and returns the real id).
+    app.config['COMMENT_BUFFER_ENABLED'] = False
+    app.config['COMMENT_BUFFER_MAX_BATCH'] = 500
+    app.config['COMMENT_BUFFER_MAX_DELAY_MS'] = 50
+    app.config['COMMENT_BUFFER_MAX_PENDING'] = 10000
+    app.config['COMMENT_BUFFER_ACK'] = 'queued'
+    app.config['COMMENT_BUFFER_SYNCHRONOUS'] = None
+
+    # gzip/brotli negotiated through Accept-Encoding for text/JSON responses
+    # of at least COMPRESSION_MIN_SIZE bytes; compressed GET bodies (e.g.
+    # /products-list, /apispec.json) are reused from a bounded cache.
+    app.config['COMPRESSION_ENABLED'] = True
+    app.config['COMPRESSION_MIN_SIZE'] = 1024
+    app.config['COMPRESSION_CACHE_MAX_BYTES'] = 16 * 1024 * 1024
+
+    # Summary tables behind GET /stats, updated in the same transaction as
+    # product/comment writes and fully recomputed every interval (seconds, 0 = never)
+    app.config['STATS_ENABLED'] = True
+    app.config['STATS_RECONCILE_INTERVAL'] = 6 * 3600
+
+    # Scan history (scan_event), written in batches off the request path;
+    # events older than the retention are rolled up into daily counters
+    app.config['SCAN_LOG_ENABLED'] = True
+    app.config['SCAN_LOG_MAX_BATCH'] = 1000
+    app.config['SCAN_LOG_MAX_DELAY_MS'] = 200
+    app.config['SCAN_LOG_RETENTION_DAYS'] = 90
+    app.config['SCAN_LOG_COMPACT_INTERVAL'] = 24 * 3600
+
+    # Product image proxy: originals downloaded once, thumbnails (Pillow)
+    # kept in a size-bounded on-disk LRU (default dir: instance/images)
+    app.config['IMAGE_SIZES'] = (100, 200, 400)
+    app.config['IMAGE_DEFAULT_SIZE'] = 200
+    app.config['IMAGE_CACHE_MAX_BYTES'] = 256 * 1024 * 1024
+    app.config['IMAGE_MAX_AGE'] = 30 * 24 * 3600
+
+    # Tag columns indexed as in-memory bitmaps for GET /products/filter,
+    # built in a background thread at startup (TAG_INDEX_WARMUP)
+    app.config['TAG_INDEX_FIELDS'] = ('allergens_tags', 'ingredients_analysis_tags')
+    app.config['TAG_INDEX_WARMUP'] = True
+
+    # Read-only mmap'd catalogue snapshot for scan hits, shared by all workers
+    # (instance/product_snapshot.bin); rebuild with `flask --app app build-snapshot`
+    # or every SNAPSHOT_REBUILD_INTERVAL seconds (0 = never). Products changed since
+    # the build (product_change table, polled every SNAPSHOT_CHECK_INTERVAL) go to the database
+    app.config['SNAPSHOT_ENABLED'] = False
+    app.config['SNAPSHOT_CHECK_INTERVAL'] = 5
+    app.config['SNAPSHOT_REBUILD_INTERVAL'] = 0
+
+    if config:
+        app.config.update(config)
+
     # Swagger Configuration
     swagger_config = {
         "headers": [],
@@ -67,16 +136,34 @@ def create_app():
             {
                 "name": "Comment",
                 "description": "Operações relacionadas a comentários"
+            },
+            {
+                "name": "Stats",
+                "description": "Estatísticas agregadas do catálogo"
             }
         ]
     }
 
-    # Inicializar Swagger
-    Swagger(app, config=swagger_config, template=swagger_template)
+    # Inicializar Swagger (spec gerada sob demanda)
+    LazySwagger(app, config=swagger_config, template=swagger_template)
 
     # db.init_app(app) initializes the SQLAlchemy database with the Flask app
     db.init_app(app)
 
+    # Request latency, SQL, OFF and scoring metrics
+    metrics.init_app(app)
+    profiler.init_app(app)
+
+    # MinHash/LSH index behind GET /product/<id>/alternatives (loaded in the background on first use)
+    alternatives.init_app(app)
+    comment_buffer.init_app(app)
+    compression.init_app(app)
+    stats.init_app(app)
+    scan_log.init_app(app)
+    thumbnails.init_app(app)
+    tag_index.init_app(app)
+    snapshot.init_app(app)
+
     # CORS Configuration: connect front end to back end
     CORS(app, resources={
         r"/*": {
@@ -86,18 +173,20 @@ def create_app():
         }
     })
 
-    # Database Initialization
-    with app.app_context():
-        db.create_all()
+    # Database Initialization: tables are created by "flask --app app migrate",
+    # not on every boot
+    register_commands(app)
 
     # Route Registration (Blueprints)
     from routes.product_bp import product_bp
     from routes.user_bp import user_bp
     from routes.comment_bp import comment_bp
+    from routes.stats_bp import stats_bp
 
     app.register_blueprint(product_bp)
     app.register_blueprint(comment_bp)
     app.register_blueprint(user_bp)
+    app.register_blueprint(stats_bp)
 
     # Simple test route
     @app.route('/')
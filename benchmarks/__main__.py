@@ -0,0 +1,109 @@
+"""
+Executa a suíte de benchmarks e grava os resultados em JSON.
+
+Exemplos:
+    python -m benchmarks                                # micro + scenarios
+    python -m benchmarks --suite micro --repeat 5000
+    python -m benchmarks --suite load --concurrency 16 --duration 30
+    python -m benchmarks --suite startup --repeat 20
+    python -m benchmarks --suite ranking --ranking-products 1000000
+    python -m benchmarks --suite comments --concurrency 16 --db-dir /var/tmp
+    python -m benchmarks --suite images --image-latency-ms 80
+    python -m benchmarks --baseline benchmarks/results/<arquivo>.json
+"""
+import argparse
+import logging
+import sys
+
+from benchmarks import common
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmarks da API Truth Label.')
+    parser.add_argument('--suite', action='append', choices=['micro', 'scenarios', 'load', 'startup', 'ranking', 'comments', 'images'],
+                        help='Suíte a executar (repetível). Padrão: micro e scenarios.')
+    parser.add_argument('--repeat', type=int, default=1000,
+                        help='Repetições por microbenchmark (e processos na suíte startup).')
+    parser.add_argument('--scans', type=int, default=200,
+                        help='Códigos distintos nos cenários cold/warm scan.')
+    parser.add_argument('--list-size', type=int, default=100000,
+                        help='Tamanho do catálogo no cenário list_products.')
+    parser.add_argument('--comments', type=int, default=5000,
+                        help='Comentários do produto no cenário comment_heavy.')
+    parser.add_argument('--ranking-products', type=int, default=1000000,
+                        help='Tamanho do catálogo na suíte ranking.')
+    parser.add_argument('--off-latency-ms', type=float, default=0,
+                        help='Latência artificial do stub do OFF.')
+    parser.add_argument('--image-latency-ms', type=float, default=0,
+                        help='Latência artificial do stub de imagens (suíte images).')
+    parser.add_argument('--url', help='Servidor já em execução para a suíte load.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0,
+                        help='Duração de cada cenário de carga (segundos).')
+    parser.add_argument('--db-dir',
+                        help='Pasta dos bancos temporários da suíte comments (disco real).')
+    parser.add_argument('--output', help='Arquivo JSON de saída (padrão: benchmarks/results/).')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar.')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Variação de p50 considerada regressão (0.10 = 10%%).')
+    args = parser.parse_args(argv)
+
+    # O log de cada requisição do werkzeug distorceria a medição de carga
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+    suites = args.suite or ['micro', 'scenarios']
+    results = {'environment': common.environment(), 'params': vars(args), 'suites': {}}
+
+    if 'micro' in suites:
+        from benchmarks import micro
+        results['suites']['micro'] = micro.run(repeat=args.repeat)
+    if 'scenarios' in suites:
+        from benchmarks import scenarios
+        results['suites']['scenarios'] = scenarios.run(
+            scans=args.scans, list_size=args.list_size, comments=args.comments,
+            off_latency_ms=args.off_latency_ms)
+    if 'load' in suites:
+        from benchmarks import load
+        results['suites']['load'] = load.run(
+            url=args.url, concurrency=args.concurrency, duration=args.duration)
+
+    if 'startup' in suites:
+        from benchmarks import startup
+        results['suites']['startup'] = startup.run(repeat=min(args.repeat, 50))
+
+    if 'ranking' in suites:
+        from benchmarks import ranking
+        results['suites']['ranking'] = ranking.run(
+            products=args.ranking_products, repeat=min(args.repeat, 200))
+
+    if 'comments' in suites:
+        from benchmarks import comments
+        results['suites']['comments'] = comments.run(
+            concurrency=args.concurrency, duration=args.duration, db_dir=args.db_dir)
+
+    if 'images' in suites:
+        from benchmarks import images
+        results['suites']['images'] = images.run(latency_ms=args.image_latency_ms)
+
+    for suite, benches in results['suites'].items():
+        print(f'\n== {suite} ==')
+        for name, stats in benches.items():
+            print(f"{name:<40} p50 {stats['p50_ms']:>10.3f} ms   p99 {stats['p99_ms']:>10.3f} ms"
+                  f"   {stats['ops_per_s']:>10.1f} ops/s")
+
+    path = common.save_results(results, args.output)
+    print(f'\nResultados gravados em {path}')
+
+    if args.baseline:
+        rows = common.compare(results, common.load_results(args.baseline), args.threshold)
+        regressions = [r for r in rows if r[4]]
+        print(f'\n== comparação com {args.baseline} ==')
+        for name, base, current, change, regressed in rows:
+            flag = '  REGRESSÃO' if regressed else ''
+            print(f'{name:<40} {base:>10.3f} -> {current:>10.3f} ms ({change:+.1%}){flag}')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
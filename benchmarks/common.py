@@ -0,0 +1,171 @@
+"""
+Utilidades compartilhadas pelos benchmarks: medição, estatísticas,
+criação de um app isolado (banco temporário) e persistência dos resultados.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Permite rodar "python -m benchmarks" a partir da raiz do repositório
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+
+def percentile(sorted_values, q):
+    """Percentil por interpolação linear (q entre 0 e 100)."""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(samples, wall_time=None):
+    """
+    Resume uma lista de durações (segundos) em um dict de estatísticas.
+    Todas as latências são reportadas em milissegundos.
+    """
+    values = sorted(samples)
+    n = len(values)
+    total = sum(values)
+    stats = {
+        'n': n,
+        'mean_ms': round(total / n * 1000, 4) if n else 0.0,
+        'min_ms': round(values[0] * 1000, 4) if n else 0.0,
+        'p50_ms': round(percentile(values, 50) * 1000, 4),
+        'p99_ms': round(percentile(values, 99) * 1000, 4),
+        'max_ms': round(values[-1] * 1000, 4) if n else 0.0,
+    }
+    elapsed = wall_time if wall_time is not None else total
+    stats['ops_per_s'] = round(n / elapsed, 2) if elapsed else 0.0
+    return stats
+
+
+def measure(fn, repeat=1000, warmup=10):
+    """Executa fn() repeat vezes (após warmup) e retorna summarize() dos tempos."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    perf = time.perf_counter
+    for _ in range(repeat):
+        start = perf()
+        fn()
+        samples.append(perf() - start)
+    return summarize(samples)
+
+
+def make_app(db_path=None, off_base_url=None, **config):
+    """
+    Cria o app apontando para um banco SQLite temporário (nunca o
+    instance/truthlable.db do desenvolvimento) e, opcionalmente, para o stub do OFF.
+    """
+    from app import create_app
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='truthlable-bench-'), 'bench.db')
+    # Arquivos derivados do banco ficam ao lado dele, nunca em instance/
+    overrides = {
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
+        'ALTERNATIVES_INDEX_PATH': os.path.splitext(db_path)[0] + '.alternatives.pkl',
+    }
+    if off_base_url:
+        overrides['OFF_BASE_URL'] = off_base_url
+    overrides.update(config)
+    app = create_app(overrides)
+
+    from scripts.migrations import migrate
+    with app.app_context():
+        migrate(log=lambda message: None)
+    return app
+
+
+def make_barcode(seq, prefix='789'):
+    """EAN-13 válido (dígito verificador GS1) e canônico para o número seq."""
+    from scripts.gtin import canonical_barcode, check_digit
+
+    body = f'{prefix}{seq:09d}'
+    return canonical_barcode(body + check_digit(body))
+
+
+def seed_products(n, start=0, with_tags=True):
+    """
+    Insere n produtos sintéticos com bulk insert (requer app context).
+    Retorna a lista de barcodes inseridos.
+    """
+    from extensions import db
+    from model.product import Product
+
+    barcodes = [make_barcode(start + i, prefix='200') for i in range(n)]
+    rows = [{
+        'name': f'Produto Sintético {start + i}',
+        'barcode': code,
+        'score': float((start + i) % 101),
+        'nova_group': (start + i) % 4 + 1,
+        'ingredients_analysis_tags': 'en:palm-oil-free,en:vegan' if with_tags else None,
+        'labels_tags': 'en:organic' if with_tags and i % 3 == 0 else '',
+        'allergens_tags': 'en:gluten' if with_tags and i % 5 == 0 else '',
+        'additives_tags': 'en:e330,en:e322' if with_tags else '',
+        'date_inserted': datetime.now(),
+    } for i, code in enumerate(barcodes)]
+    for chunk in range(0, len(rows), 10000):
+        db.session.execute(Product.__table__.insert(), rows[chunk:chunk + 10000])
+    db.session.commit()
+    return barcodes
+
+
+def environment():
+    try:
+        commit = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def save_results(results, path=None):
+    if path is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        path = os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%dT%H%M%S') + '.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare(current, baseline, threshold=0.10):
+    """
+    Compara o p50 de cada benchmark com o baseline.
+
+    Returns:
+        list[tuple]: (nome, p50_baseline, p50_atual, variação, regressão?)
+    """
+    rows = []
+    for suite, benches in current.get('suites', {}).items():
+        base_benches = baseline.get('suites', {}).get(suite, {})
+        for name, stats in benches.items():
+            base = base_benches.get(name)
+            if not base or not base.get('p50_ms'):
+                continue
+            change = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms']
+            rows.append((f'{suite}.{name}', base['p50_ms'], stats['p50_ms'],
+                         change, change > threshold))
+    return rows
@@ -0,0 +1,134 @@
+"""
+Servidor local de imagens para os benchmarks de GET /product/<id>/image.
+
+Qualquer caminho (ex.: /images/7891000053508.png) responde um PNG de
+size x size pixels gerado em Python puro, com a cor derivada do
+caminho: imagens distintas por produto, sem depender de arquivos nem de
+Pillow. Caminhos terminados em .txt respondem text/plain (não é imagem) e
+os que começam com /missing/ respondem 404.
+
+Uso isolado:
+    python -m benchmarks.image_stub --port 8766 --size 1200 --latency-ms 80
+"""
+import argparse
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_png(width, height, seed=0):
+    """PNG RGB com um degradê vertical; a cor base vem de seed."""
+    r, g, b = seed & 0xFF, (seed >> 8) & 0xFF, (seed >> 16) & 0xFF
+    rows = []
+    for y in range(height):
+        shade = y * 255 // max(height - 1, 1)
+        rows.append(b'\x00' + bytes([(r + shade) & 0xFF, g, (b + shade) & 0xFF]) * width)
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+class ImageStubServer:
+    """
+    Stub HTTP de imagens rodando em uma thread. Pode ser usado como context manager:
+
+        with ImageStubServer(size=1200) as stub:
+            url = f'{stub.base_url}/images/1.png'
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, size=800, latency_ms=0):
+        self.size = size
+        self.latency = latency_ms / 1000.0
+        self.requests_served = 0
+        self._images = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def image_for(self, path):
+        with self._lock:
+            data = self._images.get(path)
+            if data is None:
+                data = make_png(self.size, self.size, zlib.crc32(path.encode()))
+                self._images[path] = data
+            return data
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                path = self.path.split('?')[0]
+                if path.startswith('/missing/'):
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if path.endswith('.txt'):
+                    body, content_type = b'not an image', 'text/plain'
+                else:
+                    body, content_type = stub.image_for(path), 'image/png'
+                with stub._lock:
+                    stub.requests_served += 1
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub local de imagens de produtos.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--size', type=int, default=800,
+                        help='Largura e altura das imagens geradas (pixels).')
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Latência artificial por requisição, imitando a rede.')
+    args = parser.parse_args()
+
+    stub = ImageStubServer(args.host, args.port, args.size, args.latency_ms)
+    print(f'Image stub em {stub.base_url} ({args.size}x{args.size} PNG)')
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark de GET /product/<id>/image contra o stub local de imagens
+(benchmarks/image_stub.py):
+
+- image_cold: primeiro acesso, com download da original e redimensionamento
+- image_warm: miniatura servida do cache em disco
+- image_revalidate: If-None-Match com o ETag, resposta 304 sem corpo
+
+Sem Pillow instalado, a rota serve a original e cold mede só o download.
+"""
+import tempfile
+import time
+
+from benchmarks.common import make_app, seed_products, summarize
+from benchmarks.image_stub import ImageStubServer
+
+
+def _bench(client, requests, expected):
+    """requests: lista de (caminho, headers)."""
+    samples = []
+    for path, headers in requests:
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        samples.append(time.perf_counter() - start)
+        if response.status_code != expected:
+            raise RuntimeError(f'{path}: HTTP {response.status_code}')
+    return summarize(samples)
+
+
+def run(products=200, size=200, image_size=800, latency_ms=0):
+    from extensions import db, thumbnails
+    from model.product import Product
+
+    results = {}
+    with ImageStubServer(size=image_size, latency_ms=latency_ms) as stub:
+        app = make_app(IMAGE_CACHE_DIR=tempfile.mkdtemp(prefix='truthlable-images-'))
+        with app.app_context():
+            seed_products(products)
+            for product in Product.query.all():
+                product.image_url = f'{stub.base_url}/images/{product.barcode}.png'
+            db.session.commit()
+            ids = [row[0] for row in db.session.query(Product.id)]
+
+        client = app.test_client()
+        paths = [f'/product/{product_id}/image?size={size}' for product_id in ids]
+        results['image_cold'] = _bench(client, [(path, {}) for path in paths], 200)
+        results['image_warm'] = _bench(client, [(path, {}) for path in paths * 5], 200)
+        etags = [client.get(path).headers['ETag'] for path in paths]
+        results['image_revalidate'] = _bench(
+            client, [(path, {'If-None-Match': etag}) for path, etag in zip(paths, etags)], 304)
+
+        results['image_cold']['upstream_requests'] = stub.requests_served
+        results['image_cold']['resized'] = thumbnails.resize_available()
+        results['image_cold']['cache_bytes'] = thumbnails.cache.size
+    return results
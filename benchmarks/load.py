@@ -0,0 +1,108 @@
+"""
+Gerador de carga concorrente.
+
+Dispara requisições HTTP reais (requests.Session por worker) contra um
+servidor já em execução (--url) ou contra um servidor local criado na hora
+(werkzeug multi-thread, banco temporário e stub do OFF). Reporta p50/p99,
+throughput e erros por cenário.
+"""
+import random
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+from benchmarks.common import make_app, seed_products, summarize
+from benchmarks.off_stub import OFFStubServer
+
+
+def scenario_warm_scan(barcodes):
+    def request(session, base_url, rnd):
+        return session.post(f'{base_url}/product/scan',
+                            json={'barcode': rnd.choice(barcodes)})
+    return request
+
+
+def scenario_get_product(barcodes):
+    def request(session, base_url, rnd):
+        return session.get(f'{base_url}/product', params={'barcode': rnd.choice(barcodes)})
+    return request
+
+
+def generate_load(base_url, request, concurrency=8, duration=10.0, seed=42):
+    """
+    Executa request(session, base_url, rnd) em `concurrency` threads durante
+    `duration` segundos. Retorna summarize() das latências mais a contagem de erros.
+    """
+    samples = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    deadline = time.perf_counter() + duration
+
+    def worker(idx):
+        rnd = random.Random(seed + idx)
+        session = requests.Session()
+        local = samples[idx]
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = request(session, base_url, rnd)
+                ok = response.status_code < 500
+            except requests.RequestException:
+                ok = False
+            local.append(time.perf_counter() - start)
+            if not ok:
+                errors[idx] += 1
+        session.close()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    start_all = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start_all
+
+    stats = summarize([s for worker_samples in samples for s in worker_samples], wall)
+    stats['errors'] = sum(errors)
+    stats['concurrency'] = concurrency
+    return stats
+
+
+class LocalServer:
+    """Servidor werkzeug multi-thread rodando o app em uma thread daemon."""
+
+    def __init__(self, app):
+        self._server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.base_url = f'http://127.0.0.1:{self._server.server_port}'
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+
+
+def run(url=None, concurrency=8, duration=10.0, products=10000, seed=42):
+    if url:
+        # Servidor externo: usa os códigos das fixtures, que o stub/OFF conhece
+        from benchmarks.off_stub import load_fixtures
+        barcodes = list(load_fixtures())
+        return {
+            'warm_scan': generate_load(url, scenario_warm_scan(barcodes), concurrency, duration, seed),
+            'get_product': generate_load(url, scenario_get_product(barcodes), concurrency, duration, seed),
+        }
+
+    with OFFStubServer() as stub:
+        app = make_app(off_base_url=stub.base_url)
+        with app.app_context():
+            barcodes = seed_products(products)
+        with LocalServer(app) as server:
+            return {
+                'warm_scan': generate_load(server.base_url, scenario_warm_scan(barcodes),
+                                           concurrency, duration, seed),
+                'get_product': generate_load(server.base_url, scenario_get_product(barcodes),
+                                             concurrency, duration, seed),
+            }
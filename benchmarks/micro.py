@@ -0,0 +1,64 @@
+"""
+Microbenchmarks: calculate_score, serialização com ProductResponseSchema
+e buscas no banco (barcode exato, nome com ILIKE, listagem).
+"""
+from benchmarks.common import make_app, measure, seed_products
+from benchmarks.off_stub import load_fixtures
+
+
+def bench_score(repeat):
+    from scripts.score_calculator import calculate_score
+
+    products = [f['product'] for f in load_fixtures().values()]
+    results = {}
+    for i, off_data in enumerate(products):
+        results[f'calculate_score[{i}]'] = measure(
+            lambda d=off_data: calculate_score(d, nova_group=d.get('nova_group')),
+            repeat=repeat)
+    return results
+
+
+def bench_serialization(app, repeat):
+    from model.product import Product
+    from schemas.product_schemas import ProductResponseSchema
+
+    with app.app_context():
+        product = Product.query.first()
+        return {
+            'ProductResponseSchema.dump': measure(
+                lambda: ProductResponseSchema.model_validate(product).model_dump(),
+                repeat=repeat),
+        }
+
+
+def bench_db(app, barcodes, repeat):
+    from model.product import Product
+    from routes.product_bp import buscar_produto_no_db
+    from extensions import db
+
+    target = barcodes[len(barcodes) // 2]
+    with app.app_context():
+        def lookup():
+            buscar_produto_no_db(target)
+            db.session.expire_all()
+
+        def by_name():
+            Product.query.filter(Product.name.ilike('%Sintético 4242%')).first()
+            db.session.expire_all()
+
+        return {
+            'lookup_by_barcode': measure(lookup, repeat=repeat),
+            'search_by_name': measure(by_name, repeat=max(1, repeat // 10)),
+        }
+
+
+def run(products=10000, repeat=1000):
+    app = make_app()
+    with app.app_context():
+        barcodes = seed_products(products)
+
+    results = {}
+    results.update(bench_score(repeat))
+    results.update(bench_serialization(app, repeat))
+    results.update(bench_db(app, barcodes, repeat))
+    return results
@@ -0,0 +1,124 @@
+"""
+Servidor local que imita a API do Open Food Facts para os benchmarks.
+
+Reproduz respostas gravadas em benchmarks/fixtures/off/<barcode>.json.
+Códigos sem fixture recebem a resposta de uma fixture escolhida de forma
+determinística pelo hash do código (com o "code" trocado), o que permite
+cold scans de quantos códigos distintos forem necessários. Códigos que
+começam com "000" respondem {"status": 0} (produto inexistente).
+
+Uso isolado:
+    python -m benchmarks.off_stub --port 8765 --latency-ms 80
+"""
+import argparse
+import json
+import os
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures', 'off')
+PRODUCT_PATH = re.compile(r'^/api/v2/product/([^/?]+)')
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    fixtures = {}
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                fixtures[name[:-len('.json')]] = json.load(f)
+    return fixtures
+
+
+class OFFStubServer:
+    """
+    Stub HTTP do OFF rodando em uma thread. Pode ser usado como context manager:
+
+        with OFFStubServer(latency_ms=50) as stub:
+            app = create_app({'OFF_BASE_URL': stub.base_url})
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, fixtures=None):
+        self.fixtures = fixtures if fixtures is not None else load_fixtures()
+        self._ordered = [self.fixtures[k] for k in sorted(self.fixtures)]
+        self.latency = latency_ms / 1000.0
+        self.requests_served = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def response_for(self, barcode):
+        if barcode.startswith('000'):
+            return {'code': barcode, 'status': 0, 'status_verbose': 'product not found'}
+        if barcode in self.fixtures:
+            return self.fixtures[barcode]
+        template = self._ordered[zlib.crc32(barcode.encode()) % len(self._ordered)]
+        return dict(template, code=barcode)
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                match = PRODUCT_PATH.match(self.path)
+                if not match:
+                    self.send_error(404)
+                    return
+                if stub.latency:
+                    time.sleep(stub.latency)
+                body = json.dumps(stub.response_for(match.group(1))).encode()
+                stub.requests_served += 1
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub local da API do Open Food Facts.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0,
+                        help='Latência artificial por requisição, imitando a rede.')
+    args = parser.parse_args()
+
+    stub = OFFStubServer(args.host, args.port, args.latency_ms)
+    print(f'OFF stub em {stub.base_url} ({len(stub.fixtures)} fixtures)')
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark de GET /products/ranking sobre um catálogo grande (1M produtos por
+padrão), gerado com scripts/generate_catalogue.py. Mede a primeira página,
+páginas profundas via cursor e os filtros por NOVA group e por label.
+Também mede GET /products/filter (índice de bitmaps de tags) no mesmo catálogo.
+"""
+import time
+
+from benchmarks.common import make_app, summarize
+
+
+def _bench(client, params, repeat, path='/products/ranking'):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, query_string=params)
+        samples.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f'{params}: HTTP {response.status_code}')
+    return summarize(samples)
+
+
+def _deep_cursor(client, params, pages):
+    """Percorre `pages` páginas e devolve o cursor da última."""
+    cursor = None
+    for _ in range(pages):
+        query = dict(params, cursor=cursor) if cursor else params
+        cursor = client.get('/products/ranking', query_string=query).json['next_cursor']
+    return cursor
+
+
+def run(products=1000000, repeat=200, seed=42):
+    from extensions import tag_index
+    from scripts.generate_catalogue import generate
+
+    app = make_app()
+    started = time.perf_counter()
+    with app.app_context():
+        generate(products, users=0, max_comments=0, seed=seed, log=lambda message: None)
+    print(f'catálogo de {products} produtos gerado em {time.perf_counter() - started:.1f}s')
+
+    client = app.test_client()
+    results = {}
+    for name, params in [
+        ('top20_desc', {'limit': 20}),
+        ('top20_asc', {'order': 'asc', 'limit': 20}),
+        ('top20_nova1', {'nova_group': 1, 'limit': 20}),
+        ('top20_label_organic', {'label': 'en:organic', 'limit': 20}),
+        ('top100_desc', {'limit': 100}),
+    ]:
+        results[f'{name}[{products}]'] = _bench(client, params, repeat)
+
+    # Página 500 (10 mil produtos adiante): o custo deve ser igual ao da primeira
+    deep = _deep_cursor(client, {'limit': 20}, 500)
+    results[f'page500_desc[{products}]'] = _bench(client, {'limit': 20, 'cursor': deep}, repeat)
+
+    # Filtros de dieta/alergênicos; o índice de bitmaps é montado antes de medir
+    # (o da inicialização foi feito com o catálogo ainda vazio)
+    with app.app_context():
+        tag_index.build_from_db()
+    for name, params in [
+        ('filter_vegan_palmfree_no_gluten_milk', {
+            'tag': ['en:vegan', 'en:palm-oil-free'], 'exclude_tag': ['en:gluten', 'en:milk']}),
+        ('filter_any_nuts_peanuts', {'any_tag': ['en:nuts', 'en:peanuts']}),
+        ('filter_no_gluten', {'exclude_tag': 'en:gluten'}),
+    ]:
+        results[f'{name}[{products}]'] = _bench(client, params, repeat, '/products/filter')
+    return results
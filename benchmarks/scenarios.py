@@ -0,0 +1,107 @@
+"""
+Cenários ponta a ponta executados pelo test client do Flask, com o OFF
+substituído pelo stub local (benchmarks/off_stub.py):
+
+- cold_scan: códigos inéditos (DB miss -> OFF -> score -> INSERT)
+- warm_scan: os mesmos códigos, já no histórico (DB hit)
+- warm_scan_snapshot: os mesmos códigos servidos pelo snapshot mmap
+- list_products: GET /products-list com um catálogo grande
+- comment_heavy: GET /comment/product/<id> para um produto com muitos comentários
+"""
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.common import make_app, make_barcode, seed_products, summarize
+from benchmarks.off_stub import OFFStubServer
+
+
+def _timed_requests(send, items):
+    samples = []
+    start_all = time.perf_counter()
+    for item in items:
+        start = time.perf_counter()
+        response = send(item)
+        samples.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{item}: HTTP {response.status_code} {response.data[:200]!r}')
+    return summarize(samples, time.perf_counter() - start_all)
+
+
+def bench_scans(client, scans):
+    barcodes = [make_barcode(i) for i in range(scans)]
+
+    def scan(code):
+        return client.post('/product/scan', json={'barcode': code})
+
+    results = {
+        'cold_scan': _timed_requests(scan, barcodes),
+        'warm_scan': _timed_requests(scan, barcodes),
+    }
+    results['warm_scan_snapshot'] = bench_snapshot_scans(client.application, scan, barcodes)
+    return results
+
+
+def bench_snapshot_scans(app, scan, barcodes):
+    """Warm scans com SNAPSHOT_ENABLED, a partir de um snapshot recém-gerado."""
+    from extensions import snapshot
+
+    path = os.path.join(tempfile.mkdtemp(prefix='truthlable-snapshot-'), 'snapshot.bin')
+    app.config.update(SNAPSHOT_ENABLED=True, SNAPSHOT_PATH=path)
+    snapshot.init_app(app)
+    with app.app_context():
+        snapshot.build()
+    try:
+        return _timed_requests(scan, barcodes)
+    finally:
+        app.config['SNAPSHOT_ENABLED'] = False
+        snapshot.init_app(app)
+        os.remove(path)
+
+
+def bench_list(app, client, list_size, repeat):
+    with app.app_context():
+        seed_products(list_size, start=10 ** 8)
+    return {
+        f'list_products[{list_size}]': _timed_requests(
+            lambda _: client.get('/products-list'), range(repeat)),
+    }
+
+
+def bench_comment_heavy(app, client, comments, repeat):
+    from extensions import db
+    from model.comment import Comment
+    from model.product import Product
+
+    with app.app_context():
+        product = Product(name='Produto Popular', barcode='9990000000001')
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+        rows = [{
+            'text': f'Comentário {i} sobre o rótulo e a origem dos ingredientes.',
+            'author': f'user{i % 500}',
+            'n_estrela': i % 6,
+            'date_inserted': datetime.now(),
+            'product_id': product_id,
+        } for i in range(comments)]
+        db.session.execute(Comment.__table__.insert(), rows)
+        db.session.commit()
+
+    return {
+        f'comment_heavy[{comments}]': _timed_requests(
+            lambda _: client.get(f'/comment/product/{product_id}'), range(repeat)),
+    }
+
+
+def run(scans=200, list_size=100000, list_repeat=5, comments=5000,
+        comment_repeat=20, off_latency_ms=0):
+    results = {}
+    with OFFStubServer(latency_ms=off_latency_ms) as stub:
+        app = make_app(off_base_url=stub.base_url)
+        client = app.test_client()
+        results.update(bench_scans(client, scans))
+        results.update(bench_comment_heavy(app, client, comments, comment_repeat))
+        results.update(bench_list(app, client, list_size, list_repeat))
+    return results
@@ -0,0 +1,42 @@
+"""
+Tempo de inicialização, medido em interpretadores novos (como um worker do
+gunicorn ou um processo de teste):
+
+- import_app: "from app import create_app"
+- create_app: montagem do app (config, extensões, blueprints)
+- first_request: primeira requisição a GET /
+- first_apispec: primeira requisição a GET /apispec.json (geração da spec)
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import ROOT, summarize
+
+PROBE = r'''
+import json, sys, time
+t0 = time.perf_counter()
+from app import create_app
+t1 = time.perf_counter()
+app = create_app({"SQLALCHEMY_DATABASE_URI": sys.argv[1], "METRICS_ENABLED": False})
+t2 = time.perf_counter()
+client = app.test_client()
+client.get("/")
+t3 = time.perf_counter()
+client.get("/apispec.json")
+t4 = time.perf_counter()
+print(json.dumps({"import_app": t1 - t0, "create_app": t2 - t1,
+                  "first_request": t3 - t2, "first_apispec": t4 - t3}))
+'''
+
+
+def run(repeat=10):
+    db_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='truthlable-startup-'), 'startup.db')
+    samples = {}
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', PROBE, db_uri], cwd=ROOT)
+        for name, value in json.loads(output.decode().strip().splitlines()[-1]).items():
+            samples.setdefault(name, []).append(value)
+    return {name: summarize(values) for name, values in samples.items()}
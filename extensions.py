@@ -1,3 +1,23 @@
 from flask_sqlalchemy import SQLAlchemy
+from scripts.alternatives import AlternativesIndex
+from scripts.comment_buffer import CommentWriteBuffer
+from scripts.compression import ResponseCompressor
+from scripts.metrics import Metrics
+from scripts.profiling import RequestProfiler
+from scripts.scan_log import ScanLog
+from scripts.snapshot import SnapshotStore
+from scripts.stats import CatalogueStats
+from scripts.tag_index import TagIndex
+from scripts.thumbnails import ThumbnailCache
 
 db = SQLAlchemy()
+metrics = Metrics()
+profiler = RequestProfiler()
+alternatives = AlternativesIndex()
+comment_buffer = CommentWriteBuffer()
+compression = ResponseCompressor()
+stats = CatalogueStats()
+scan_log = ScanLog()
+thumbnails = ThumbnailCache()
+tag_index = TagIndex()
+snapshot = SnapshotStore()
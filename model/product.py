@@ -27,12 +27,27 @@ class Product(db.Model):
     additives_tags = db.Column(
         db.Text, nullable=True)            # Prioridade Média
 
+    # Regras do score que dispararam (bitmask de scripts.score_calculator.ScoreRule)
+    score_rules = db.Column(db.Integer, nullable=True)
+
     comments = db.relationship(
         "Comment", backref="product", lazy=True, cascade="all, delete-orphan")
 
+    # Índices compostos do ranking (GET /products/ranking): top-K por score
+    # com desempate por id, com ou sem filtro de NOVA group ou de regras do score.
+    # AUTOINCREMENT: o id de um produto removido nunca é reutilizado, então os
+    # índices em memória podem incorporar produtos novos só pelo maior id
+    __table_args__ = (
+        db.Index('ix_product_score_id', 'score', 'pk_product'),
+        db.Index('ix_product_nova_score_id', 'nova_group', 'score', 'pk_product'),
+        db.Index('ix_product_rules_score_id', 'score_rules', 'score', 'pk_product'),
+        {'sqlite_autoincrement': True},
+    )
+
     def __init__(self, name, barcode, score=None, image_url=None, nova_group=None,
                  ingredients_analysis_tags=None, labels_tags=None,
-                 allergens_tags=None, additives_tags=None, date_inserted=None):
+                 allergens_tags=None, additives_tags=None, date_inserted=None,
+                 score_rules=None):
         self.name = name
         self.barcode = barcode
         self.score = score
@@ -42,6 +57,7 @@ class Product(db.Model):
         self.labels_tags = labels_tags
         self.allergens_tags = allergens_tags
         self.additives_tags = additives_tags
+        self.score_rules = score_rules
 
         if date_inserted:
             self.date_inserted = date_inserted
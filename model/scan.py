@@ -0,0 +1,46 @@
+from extensions import db
+from datetime import datetime
+
+
+class ScanEvent(db.Model):
+    """
+    Log append-only dos scans (POST /product/scan).
+
+    Gravado em lote por scripts/scan_log.py, fora da transação do scan.
+    Eventos mais antigos que SCAN_LOG_RETENTION_DAYS são consolidados em
+    ScanDaily e removidos. user_id é o informado no scan (None = anônimo);
+    não há foreign keys para o log não depender de product/user existirem.
+    """
+    __tablename__ = 'scan_event'
+
+    id = db.Column("pk_scan", db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer)
+    product_id = db.Column(db.Integer, nullable=False)
+    ts = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    # "Meus scans" por usuário e popularidade por produto, ambos por período;
+    # (ts, product_id) cobre a janela de GET /products/popular sem ler a tabela
+    __table_args__ = (
+        db.Index('ix_scan_event_user_ts', 'user_id', 'ts'),
+        db.Index('ix_scan_event_product_ts', 'product_id', 'ts'),
+        db.Index('ix_scan_event_ts_product', 'ts', 'product_id'),
+    )
+
+    def __repr__(self):
+        return f'<ScanEvent user={self.user_id} product={self.product_id} {self.ts}>'
+
+
+class ScanDaily(db.Model):
+    """Quantidade de scans por produto e dia, para eventos além da retenção."""
+    __tablename__ = 'scan_daily'
+
+    product_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_scan_daily_day', 'day'),
+    )
+
+    def __repr__(self):
+        return f'<ScanDaily product={self.product_id} {self.day} = {self.count}>'
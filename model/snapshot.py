@@ -0,0 +1,20 @@
+from extensions import db
+
+
+class ProductChange(db.Model):
+    """
+    Produtos alterados ou removidos, para o snapshot do catálogo.
+
+    Uma linha por produto com o momento (epoch) da última alteração, gravada
+    por scripts/snapshot.py na mesma transação do UPDATE/DELETE. Um hit no
+    snapshot de qualquer worker só é servido se o produto não mudou depois
+    da geração do arquivo; linhas anteriores ao snapshot em uso são apagadas
+    na regeneração. Sem foreign key: a linha precisa sobreviver à remoção.
+    """
+    __tablename__ = 'product_change'
+
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    changed_at = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<ProductChange product={self.product_id} at {self.changed_at}>'
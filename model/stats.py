@@ -0,0 +1,27 @@
+from extensions import db
+
+
+class StatCounter(db.Model):
+    """
+    Tabela de resumo das estatísticas do catálogo (GET /stats).
+
+    Cada linha é um contador identificado por (kind, key), ex.:
+    ('score_bucket', '7'), ('additive', 'en:e330'), ('rating', '').
+    count é a quantidade e total a soma do valor agregado (score, estrelas),
+    para médias. As linhas são mantidas por scripts/stats.py na mesma
+    transação das escritas em product e comment.
+    """
+    __tablename__ = 'stat_counter'
+
+    kind = db.Column(db.String(32), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Top-K por tipo (aditivos e labels mais comuns) direto do índice
+    __table_args__ = (
+        db.Index('ix_stat_counter_kind_count', 'kind', 'count'),
+    )
+
+    def __repr__(self):
+        return f'<StatCounter {self.kind}:{self.key} = {self.count}>'
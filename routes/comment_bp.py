@@ -1,7 +1,8 @@
 from flask import Blueprint, jsonify, request
-from extensions import db
+from extensions import comment_buffer, db
 from model.comment import Comment
 from schemas.comment_schemas import CommentInputSchema, CommentResponseSchema
+from datetime import datetime
 
 # Criar blueprint padrão do Flask
 comment_bp = Blueprint('comment', __name__)
@@ -28,6 +29,12 @@ def create_comment():
         )
         new_comment.product_id = validated_data.product_id
 
+        # Modo write-behind: vai para o buffer e é gravado em lote
+        if comment_buffer.enabled:
+            buffered = enfileirar_comentario(new_comment)
+            if buffered is not None:
+                return buffered
+
         # Adicionar e commitar
         db.session.add(new_comment)
         db.session.commit()
@@ -49,6 +56,73 @@ def create_comment():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+# write-behind helper
+
+
+def enfileirar_comentario(comment):
+    """
+    Envia o comentário para o buffer de escrita (group commit).
+
+    Args:
+        comment (Comment): Comentário validado, ainda fora da sessão
+
+    Returns:
+        tuple | None: Resposta Flask, ou None se o buffer estiver cheio
+        (o comentário é então gravado de forma síncrona)
+    """
+    comment.date_inserted = datetime.now()
+    pending = comment_buffer.submit({
+        "author": comment.author,
+        "text": comment.text,
+        "n_estrela": comment.n_estrela,
+        "product_id": comment.product_id,
+        "date_inserted": comment.date_inserted,
+    })
+    if pending is None:
+        return None
+
+    data = {
+        "id": None,
+        "provisional_id": pending.provisional_id,
+        "author": comment.author,
+        "text": comment.text,
+        "n_estrela": comment.n_estrela,
+        "product_id": comment.product_id,
+        "date_inserted": comment.date_inserted.isoformat()
+    }
+
+    if comment_buffer.ack == 'committed':
+        # Espera o commit do lote: mesma garantia do modo síncrono
+        data["id"] = pending.future.result(timeout=30)
+        return jsonify({"message": "Comentário criado com sucesso", "comment": data}), 201
+
+    return jsonify({"message": "Comentário recebido", "comment": data}), 202
+
+
+# status of a buffered comment
+
+
+@comment_bp.route('/comment/pending/<provisional_id>', methods=['GET'])
+def get_pending_comment(provisional_id):
+    """
+    Consulta um comentário aceito pelo buffer de escrita pelo ID provisório.
+    O status fica na memória do worker que aceitou o comentário: só ele responde.
+    """
+    if not comment_buffer.issued_here(provisional_id):
+        return jsonify({"error": "Provisional id issued by another worker process; "
+                                 "its status is only available from that worker"}), 404
+    state = comment_buffer.status(provisional_id)
+    if state is None:
+        return jsonify({"error": "Unknown or expired provisional id"}), 404
+
+    status, comment_id, error = state
+    return jsonify({
+        "provisional_id": provisional_id,
+        "status": status,
+        "id": comment_id,
+        "error": error
+    }), 200
+
 # read history
 
 
@@ -1,12 +1,21 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from flasgger import swag_from
-from extensions import db
+from extensions import alternatives, db, metrics, scan_log, snapshot, tag_index, thumbnails
 from model.product import Product
 from schemas.product_schemas import ProductInputSchema, ProductResponseSchema
-import requests
+from scripts.gtin import canonical_barcode, lookup_key
+from scripts import export
+from scripts.tag_index import iter_bits, popcount
+from scripts.thumbnails import ImageFetchError
+from pydantic import ValidationError
+import base64
+import json
+import time
+from itertools import islice
 
 # score calculator
-from scripts.score_calculator import calculate_score
+from scripts.score_calculator import (
+    ALL_RULES, ScoreRule, decode_rules, matching_masks, parse_rules, rule_names, score_breakdown)
 
 
 # Blueprint definition
@@ -38,10 +47,16 @@ def buscar_produto_na_off(barcode):
     Returns:
         dict | None: Dados do produto se encontrado, None caso contrário
     """
-    off_url = f"https://br.openfoodfacts.net/api/v2/product/{barcode}"
+    # Importado só no primeiro cache miss: mantém o boot dos workers leve
+    import requests
 
+    off_url = f"{current_app.config['OFF_BASE_URL']}/api/v2/product/{barcode}"
+
+    start = time.perf_counter()
     try:
         response = requests.get(off_url, timeout=10)
+        metrics.off_latency.observe(
+            time.perf_counter() - start, response.status_code)
         product_data = response.json()
 
         if product_data.get("status") == 0:
@@ -50,7 +65,8 @@ def buscar_produto_na_off(barcode):
         return product_data.get("product")
 
     except requests.exceptions.RequestException as e:
-        print(f"Erro ao consultar OFF: {e}")
+        metrics.off_latency.observe(time.perf_counter() - start, "error")
+        current_app.logger.warning(f"Erro ao consultar OFF: {e}")
         return None
 
 
@@ -71,14 +87,16 @@ def criar_e_salvar_produto(barcode, off_data):
     lab_tags = off_data.get("labels_tags", [])
     add_tags = off_data.get("additives_tags", [])
 
-    # Calcula o score
-    final_score = calculate_score(
+    # Calcula o score e as regras que dispararam
+    start = time.perf_counter()
+    final_score, score_rules = score_breakdown(
         off_data,
         nova_group=off_data.get('nova_group'),
         ingredients_tags=off_data.get('ing_tags'),
         labels_tags=lab_tags,
         additives_tags=",".join(add_tags)
     )
+    metrics.scoring_seconds.observe(time.perf_counter() - start)
 
     # Cria o objeto Product
     novo_produto = Product(
@@ -91,16 +109,176 @@ def criar_e_salvar_produto(barcode, off_data):
         labels_tags=",".join(lab_tags),
         allergens_tags=",".join(off_data.get("allergens_tags", [])),
         additives_tags=",".join(add_tags),
-        score=final_score
+        score=final_score,
+        score_rules=score_rules
     )
 
     # Salva no banco de dados
     db.session.add(novo_produto)
     db.session.commit()
 
+    # Índices em memória: alternativas (MinHash/LSH) e bitmaps de tags
+    alternatives.upsert(novo_produto)
+    tag_index.upsert(novo_produto)
+
     return novo_produto
 
 
+def codificar_cursor(product):
+    """
+    Gera o cursor opaco de paginação (keyset) a partir do último item da página.
+
+    Args:
+        product (Product): Último produto retornado
+
+    Returns:
+        str: Cursor em base64 url-safe com (score, id)
+    """
+    raw = json.dumps([product.score, product.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """
+    Lê um cursor gerado por codificar_cursor.
+
+    Returns:
+        tuple[float, int]: (score, id) do último item da página anterior
+
+    Raises:
+        ValueError: Se o cursor estiver malformado
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, product_id = json.loads(raw)
+        return float(score), int(product_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def filtrar_por_regras(query, all_of=0, none_of=0):
+    """
+    Filtra pelas regras do score gravadas em Product.score_rules.
+
+    O predicado é "(score_rules & all_of) = all_of AND (score_rules & none_of) = 0",
+    escrito como score_rules IN (valores que satisfazem a condição): o universo
+    de bitmasks é pequeno e a forma IN é resolvida pelo índice
+    ix_product_rules_score_id, enquanto a forma bitwise obrigaria a ler a tabela toda.
+
+    Args:
+        query: Query de Product
+        all_of (int): Bits que precisam estar ligados
+        none_of (int): Bits que precisam estar desligados
+
+    Returns:
+        Query filtrada
+    """
+    return query.filter(Product.score_rules.in_(matching_masks(all_of, none_of)))
+
+
+def buscar_pagina_ranking(query, order, limit, after=None):
+    """
+    Busca uma página do ranking por keyset sobre o índice (score, id).
+
+    A continuação é feita em duas buscas por índice: primeiro o restante dos
+    empates com o mesmo score do cursor, depois os scores seguintes. Uma
+    única comparação (score, id) < (s, i) faria o SQLite percorrer todos os
+    empates do score do cursor, que são milhares em catálogos grandes.
+
+    Args:
+        query: Query de Product já com os filtros aplicados
+        order (str): 'desc' (maior score primeiro) ou 'asc'
+        limit (int): Quantidade máxima de produtos
+        after (tuple | None): (score, id) do último item da página anterior
+
+    Returns:
+        list[Product]: Até `limit` produtos na ordem pedida
+    """
+    if order == 'desc':
+        ordering = (Product.score.desc(), Product.id.desc())
+    else:
+        ordering = (Product.score.asc(), Product.id.asc())
+
+    if after is None:
+        return query.order_by(*ordering).limit(limit).all()
+
+    ties, rest = continuacao_ranking(query, order, after)
+    products = ties.order_by(*ordering).limit(limit).all()
+    if len(products) < limit:
+        products += rest.order_by(*ordering).limit(limit - len(products)).all()
+    return products
+
+
+def continuacao_ranking(query, order, after):
+    """Consultas dos empates do cursor e dos scores seguintes (sem ordenação/limite)."""
+    score, last_id = after
+    if order == 'desc':
+        return (query.filter(Product.score == score, Product.id < last_id),
+                query.filter(Product.score < score))
+    return (query.filter(Product.score == score, Product.id > last_id),
+            query.filter(Product.score > score))
+
+
+def mascaras_presentes():
+    """
+    Valores distintos de score_rules existentes no banco.
+
+    Skip-scan no índice (score_rules, score, id): cada passo busca o próximo
+    valor maior que o anterior, então o custo é uma busca por valor distinto
+    (no máximo 2^len(ScoreRule)), não uma passada pela tabela.
+    """
+    return [value for (value,) in db.session.execute(db.text(
+        'WITH RECURSIVE masks(value) AS ('
+        ' SELECT MIN(score_rules) FROM product'
+        ' UNION ALL'
+        ' SELECT (SELECT MIN(score_rules) FROM product WHERE score_rules > masks.value)'
+        ' FROM masks WHERE masks.value IS NOT NULL'
+        ') SELECT value FROM masks WHERE value IS NOT NULL'))]
+
+
+def buscar_pagina_ranking_por_regras(query, order, limit, after, all_of, none_of):
+    """
+    Página do ranking filtrada pelas regras do score.
+
+    Cada valor de score_rules que satisfaz o filtro é uma faixa contígua do
+    índice (score_rules, score, id): a página é montada com uma busca por
+    keyset em cada faixa presente no banco (só (score, id), direto do índice),
+    juntando os resultados por (score, id) e carregando apenas os produtos da
+    página. O custo depende do número de faixas, não de onde os produtos
+    filtrados caem no ranking geral.
+
+    Returns:
+        list[Product]: Até `limit` produtos na ordem pedida
+    """
+    wanted = set(matching_masks(all_of, none_of))
+    keys = query.with_entities(Product.score, Product.id)
+    if order == 'desc':
+        ordering = (Product.score.desc(), Product.id.desc())
+    else:
+        ordering = (Product.score.asc(), Product.id.asc())
+
+    # Uma busca limitada por faixa (duas com cursor), todas em um só UNION ALL
+    parts = []
+    for value in mascaras_presentes():
+        if value not in wanted:
+            continue
+        band = keys.filter(Product.score_rules == value)
+        for part in (continuacao_ranking(band, order, after) if after else (band,)):
+            # SQLite não aceita ORDER BY/LIMIT direto nos ramos do UNION: cada
+            # busca vira uma subquery
+            subquery = part.order_by(*ordering).limit(limit).subquery()
+            parts.append(db.select(*subquery.c))
+    if not parts:
+        return []
+
+    candidates = [tuple(row) for row in db.session.execute(db.union_all(*parts))]
+    candidates.sort(reverse=order == 'desc')
+
+    ids = [product_id for _, product_id in candidates[:limit]]
+    found = {p.id: p for p in Product.query.filter(Product.id.in_(ids))} if ids else {}
+    return [found[product_id] for product_id in ids if product_id in found]
+
+
 # ========== ROTAS ==========
 
 # SCAN: Escaneia código de barras e retorna/cria produto
@@ -118,7 +296,7 @@ def criar_e_salvar_produto(barcode, off_data):
                 'type': 'object',
                 'required': ['barcode'],
                 'properties': {
-                    'barcode': {'type': 'string', 'example': '7891234567890'}
+                    'barcode': {'type': 'string', 'example': '7891234567895'}
                 }
             }
         }
@@ -127,7 +305,7 @@ def criar_e_salvar_produto(barcode, off_data):
         200: {'description': 'Product found in local database'},
         201: {'description': 'Product fetched from OFF and saved'},
         404: {'description': 'Product not found in OFF'},
-        400: {'description': 'Invalid request'}
+        400: {'description': 'Invalid request or barcode (bad GS1 check digit)'}
     }
 })
 def scan_product():
@@ -143,10 +321,14 @@ def scan_product():
         validated_data = ProductInputSchema(**data)
         barcode = validated_data.barcode
 
-        # Passo 1: Verifica no banco de dados local
-        produto_existente = buscar_produto_no_db(barcode)
+        # Passo 1: Verifica no snapshot mmap (se habilitado) e no banco de dados local
+        produto_existente = snapshot.lookup(barcode)
+        if produto_existente is None:
+            produto_existente = buscar_produto_no_db(barcode)
+        metrics.cache('product_history', produto_existente is not None)
 
         if produto_existente:
+            scan_log.record(validated_data.user_id, produto_existente.id)
             return jsonify({
                 "message": "Product found in history",
                 "product": ProductResponseSchema.model_validate(produto_existente).model_dump()
@@ -160,6 +342,7 @@ def scan_product():
 
         # Passo 3: Cria e salva o produto
         novo_produto = criar_e_salvar_produto(barcode, off_data)
+        scan_log.record(validated_data.user_id, novo_produto.id)
 
         # Passo 4: Retorna o resultado
         return jsonify({
@@ -167,6 +350,13 @@ def scan_product():
             "product": ProductResponseSchema.model_validate(novo_produto).model_dump()
         }), 201
 
+    except ValidationError as e:
+        # Código inválido é rejeitado antes de qualquer consulta ao DB ou à OFF
+        return jsonify({
+            "error": "Invalid request",
+            "details": e.errors(include_url=False, include_context=False)
+        }), 400
+
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": f"Internal error: {str(e)}"}), 400
@@ -205,7 +395,7 @@ def get_product():
     if product_id:
         product = query.get(product_id)
     elif barcode:
-        product = query.filter_by(barcode=barcode).first()
+        product = query.filter_by(barcode=lookup_key(barcode)).first()
     elif name:
         product = query.filter(Product.name.ilike(f"%{name}%")).first()
     else:
@@ -262,9 +452,10 @@ def update_product(product_id):
             product.name = data['name']
 
         if 'barcode' in data:
-            product.barcode = data['barcode']
+            product.barcode = canonical_barcode(data['barcode'])
 
         db.session.commit()
+        alternatives.upsert(product)
 
         response_data = ProductResponseSchema.model_validate(
             product).model_dump()
@@ -306,14 +497,17 @@ def delete_product():
     barcode = data.get('barcode')
 
     # Busca o produto no banco
-    product = Product.query.filter_by(barcode=barcode).first()
+    product = Product.query.filter_by(barcode=lookup_key(barcode)).first()
 
     if not product:
         return jsonify({"error": "Produto não encontrado no histórico"}), 404
 
     try:
+        product_id = product.id
         db.session.delete(product)
         db.session.commit()
+        alternatives.remove(product_id)
+        tag_index.remove(product_id)
         return jsonify({"message": "Produto removido com sucesso"}), 200
     except Exception as e:
         db.session.rollback()
@@ -336,3 +530,396 @@ def list_products():
     response_data = [ProductResponseSchema.model_validate(
         prod).model_dump() for prod in products]
     return jsonify(response_data), 200
+
+
+# EXPORT: Histórico completo em streaming (CSV, NDJSON ou Parquet)
+@product_bp.route('/products/export', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Stream the whole product history as CSV, NDJSON or Parquet',
+    'description': 'Reads the table in fixed-size keyset chunks and streams each one as it is '
+                   'converted, so memory use does not grow with the catalogue. In NDJSON and '
+                   'Parquet the tag columns are lists of strings. Parquet requires pyarrow.',
+    'parameters': [
+        {'name': 'format', 'in': 'query', 'type': 'string',
+            'enum': ['csv', 'ndjson', 'parquet'], 'default': 'csv'},
+        {'name': 'chunk_size', 'in': 'query', 'type': 'integer', 'default': 5000,
+            'description': 'Rows read from the database per chunk / Parquet row group (100-50000)'}
+    ],
+    'responses': {
+        200: {'description': 'Export file (streamed)'},
+        400: {'description': 'Unknown format'},
+        501: {'description': 'Parquet requested but pyarrow is not installed'}
+    }
+})
+def export_products():
+    fmt = request.args.get('format', 'csv').lower()
+    chunk_size = max(100, min(request.args.get(
+        'chunk_size', export.DEFAULT_CHUNK_SIZE, type=int), 50000))
+
+    if fmt not in export.FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(export.FORMATS)}"}), 400
+    if fmt == 'parquet' and not export.parquet_available():
+        return jsonify({"error": "Parquet export requires pyarrow"}), 501
+
+    response = Response(
+        stream_with_context(export.export_stream(fmt, chunk_size)),
+        mimetype=export.MIMETYPES[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=products.{fmt}'
+    return response
+
+
+# RANKING: Produtos mais verdes / piores pelo score
+@product_bp.route('/products/ranking', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Top or bottom scored products',
+    'description': 'Greenest (order=desc) or worst (order=asc) products by score, '
+                   'with keyset pagination. Backed by composite indexes on '
+                   '(score, id) and (nova_group, score, id), so each page reads only '
+                   'the rows it returns.',
+    'parameters': [
+        {'name': 'order', 'in': 'query', 'type': 'string', 'enum': ['desc', 'asc'],
+            'default': 'desc', 'description': 'desc = greenest first, asc = worst first'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 20,
+            'description': 'Page size (1-100)'},
+        {'name': 'cursor', 'in': 'query', 'type': 'string',
+            'description': 'next_cursor returned by the previous page'},
+        {'name': 'nova_group', 'in': 'query', 'type': 'integer',
+            'description': 'Only products of this NOVA group (1-4)'},
+        {'name': 'label', 'in': 'query', 'type': 'string',
+            'description': 'Only products with this label tag (e.g. en:organic)'},
+        {'name': 'rule', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'description': 'Only products where all these score rules fired (e.g. palm_oil)'},
+        {'name': 'exclude_rule', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'description': 'Only products where none of these score rules fired'}
+    ],
+    'responses': {
+        200: {'description': 'Page of ranked products and the cursor for the next page'},
+        400: {'description': 'Invalid parameter or cursor'}
+    }
+})
+def ranking_products():
+    """
+    Ranking paginado por keyset: a página seguinte continua a partir do
+    (score, id) do último item, sem OFFSET, então o custo de cada página é
+    O(limit) em qualquer tamanho de catálogo. Produtos sem score ficam de fora.
+    """
+    order = request.args.get('order', 'desc')
+    if order not in ('desc', 'asc'):
+        return jsonify({"error": "order must be 'desc' or 'asc'"}), 400
+
+    try:
+        limit = int(request.args.get('limit', 20))
+        nova_group = request.args.get('nova_group', type=int)
+        cursor = request.args.get('cursor')
+        after = decodificar_cursor(cursor) if cursor else None
+        all_rules = parse_rules(request.args.getlist('rule'))
+        no_rules = parse_rules(request.args.getlist('exclude_rule'))
+    except ValueError as e:
+        return jsonify({"error": str(e), "rules": rule_names()}), 400
+    limit = max(1, min(limit, 100))
+
+    query = Product.query.filter(Product.score.isnot(None))
+    if nova_group is not None:
+        query = query.filter(Product.nova_group == nova_group)
+
+    label = request.args.get('label')
+    if label:
+        # labels_tags é texto separado por vírgulas: casa a tag inteira
+        query = query.filter(
+            (',' + Product.labels_tags + ',').like(f'%,{label},%'))
+
+    # Busca um item a mais para saber se existe próxima página
+    if all_rules or no_rules:
+        products = buscar_pagina_ranking_por_regras(
+            query, order, limit + 1, after, all_rules, no_rules)
+    else:
+        products = buscar_pagina_ranking(query, order, limit + 1, after)
+    has_more = len(products) > limit
+    products = products[:limit]
+
+    return jsonify({
+        "products": [ProductResponseSchema.model_validate(p).model_dump() for p in products],
+        "next_cursor": codificar_cursor(products[-1]) if has_more else None
+    }), 200
+
+
+# RULES: Regras do score e quantos produtos cada uma atinge
+@product_bp.route('/products/rules', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Score rules and how many products each one affects',
+    'description': 'Lists the score rules (name, points, description) with the number of '
+                   'products where each one fired. Counts come from the indexed score_rules '
+                   'bitmask column; rule and exclude_rule narrow every count further.',
+    'parameters': [
+        {'name': 'rule', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'description': 'Only count products where all these rules fired'},
+        {'name': 'exclude_rule', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi',
+            'description': 'Only count products where none of these rules fired'}
+    ],
+    'responses': {
+        200: {'description': 'Rules with product counts'},
+        400: {'description': 'Unknown rule'}
+    }
+})
+def score_rules_summary():
+    try:
+        all_rules = parse_rules(request.args.getlist('rule'))
+        no_rules = parse_rules(request.args.getlist('exclude_rule'))
+    except ValueError as e:
+        return jsonify({"error": str(e), "rules": rule_names()}), 400
+
+    # Uma passada pelo índice: contagem por bitmask; as contagens por regra
+    # saem da soma dos bitmasks que têm o bit da regra
+    counts = filtrar_por_regras(
+        db.session.query(Product.score_rules, db.func.count(Product.id)),
+        all_rules, no_rules).group_by(Product.score_rules).all()
+
+    rules = [dict(item, products=sum(n for value, n in counts if value & bit))
+             for item, bit in zip(decode_rules(ALL_RULES), ScoreRule)]
+
+    return jsonify({
+        "products": sum(n for _, n in counts),
+        "rules": rules
+    }), 200
+
+
+# ALTERNATIVES: Produtos parecidos com score melhor
+@product_bp.route('/product/<int:product_id>/alternatives', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Greener alternatives to a product',
+    'description': 'Similar products (name tokens, labels, ingredient analysis and additives) '
+                   'with a higher score, found through a MinHash/LSH index instead of '
+                   'comparing against every product.',
+    'parameters': [
+        {'name': 'product_id', 'in': 'path', 'type': 'integer', 'required': True,
+            'description': 'Product ID'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 5,
+            'description': 'Maximum number of alternatives (1-50)'}
+    ],
+    'responses': {
+        200: {'description': 'Alternatives ordered by similarity, then score'},
+        404: {'description': 'Product not found'},
+        503: {'description': 'Index still loading in the background, retry shortly'}
+    }
+})
+def product_alternatives(product_id):
+    """
+    Sugere alternativas mais verdes para um produto: vizinhos no índice
+    MinHash/LSH com score maior que o dele.
+    """
+    product = Product.query.get_or_404(product_id)
+    limit = max(1, min(request.args.get('limit', 5, type=int), 50))
+
+    # A primeira chamada só dispara a carga do índice em segundo plano
+    if not alternatives.ensure_loaded():
+        response = jsonify({"error": "Alternatives index is loading, retry shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    matches = alternatives.alternatives(product, limit)
+
+    # Uma única consulta por chave primária para os vizinhos encontrados
+    found = {p.id: p for p in Product.query.filter(
+        Product.id.in_([pid for pid, _ in matches])).all()} if matches else {}
+    results = []
+    for pid, similarity in matches:
+        if pid in found:
+            item = ProductResponseSchema.model_validate(found[pid]).model_dump()
+            item['similarity'] = round(similarity, 3)
+            results.append(item)
+
+    return jsonify({
+        "product_id": product.id,
+        "score": product.score,
+        "alternatives": results
+    }), 200
+
+
+# POPULAR: Produtos mais escaneados
+@product_bp.route('/products/popular', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Most scanned products',
+    'description': 'Products ranked by number of scans in the last days, counting recent '
+                   'scan events and the daily counters they are rolled up into.',
+    'parameters': [
+        {'name': 'days', 'in': 'query', 'type': 'integer', 'default': 7,
+            'description': 'Window in days, today included (1-3650)'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 10,
+            'description': 'Number of products (1-100)'}
+    ],
+    'responses': {
+        200: {'description': 'Products with their scan count, most scanned first'}
+    }
+})
+def popular_products():
+    days = max(1, min(request.args.get('days', 7, type=int), 3650))
+    limit = max(1, min(request.args.get('limit', 10, type=int), 100))
+
+    ranking = scan_log.popular(days, limit)
+    found = {p.id: p for p in Product.query.filter(
+        Product.id.in_([pid for pid, _ in ranking])).all()} if ranking else {}
+    results = []
+    for pid, scans in ranking:
+        item = ProductResponseSchema.model_validate(found[pid]).model_dump()
+        item['scans'] = scans
+        results.append(item)
+
+    return jsonify({"days": days, "products": results}), 200
+
+
+# SCANS: Scans por dia de um produto
+@product_bp.route('/product/<int:product_id>/scans', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Scan count of a product per day',
+    'parameters': [
+        {'name': 'product_id', 'in': 'path', 'type': 'integer', 'required': True,
+            'description': 'Product ID'},
+        {'name': 'days', 'in': 'query', 'type': 'integer', 'default': 30,
+            'description': 'Window in days, today included (1-3650)'}
+    ],
+    'responses': {
+        200: {'description': 'Total scans and scans per day (days without scans omitted)'},
+        404: {'description': 'Product not found'}
+    }
+})
+def product_scans(product_id):
+    product = Product.query.get_or_404(product_id)
+    days = max(1, min(request.args.get('days', 30, type=int), 3650))
+
+    daily = scan_log.daily_scans(product.id, days)
+    return jsonify({
+        "product_id": product.id,
+        "days": days,
+        "scans": sum(scans for _, scans in daily),
+        "daily": [{"day": day, "scans": scans} for day, scans in daily]
+    }), 200
+
+
+# IMAGE: Miniatura da imagem do produto (proxy com cache em disco)
+@product_bp.route('/product/<int:product_id>/image', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Product image thumbnail',
+    'description': 'Resized product image served from a local on-disk cache. The original is '
+                   'downloaded from image_url only once. Responses carry an ETag (content '
+                   'hash) and a long Cache-Control max-age. Without Pillow installed, the '
+                   'original image is served.',
+    'produces': ['image/jpeg', 'image/png', 'image/webp', 'image/gif'],
+    'parameters': [
+        {'name': 'product_id', 'in': 'path', 'type': 'integer', 'required': True,
+            'description': 'Product ID'},
+        {'name': 'size', 'in': 'query', 'type': 'integer', 'default': 200,
+            'description': 'Bounding box in pixels (one of IMAGE_SIZES: 100, 200, 400)'}
+    ],
+    'responses': {
+        200: {'description': 'Image'},
+        304: {'description': 'Not modified (If-None-Match matched the ETag)'},
+        400: {'description': 'Unsupported size'},
+        404: {'description': 'Product not found or product without image'},
+        502: {'description': 'Original image could not be fetched or decoded'}
+    }
+})
+def product_image(product_id):
+    product = Product.query.get_or_404(product_id)
+    if not product.image_url:
+        return jsonify({"error": "Product has no image"}), 404
+
+    size = request.args.get('size', thumbnails.default_size, type=int)
+    if size not in thumbnails.sizes:
+        return jsonify({"error": "Unsupported size", "sizes": list(thumbnails.sizes)}), 400
+
+    try:
+        path, name, hit = thumbnails.get(product.image_url, size)
+    except ImageFetchError as e:
+        return jsonify({"error": str(e)}), 502
+    metrics.cache('product_image', hit)
+    return thumbnails.response(path, name)
+
+
+# FILTER: Filtro por tags de dieta e alergênicos (índice de bitmaps)
+@product_bp.route('/products/filter', methods=['GET'])
+@swag_from({
+    'tags': ['Product'],
+    'summary': 'Filter products by dietary and allergen tags',
+    'description': 'AND/OR/NOT filter over allergens_tags and ingredients_analysis_tags, '
+                   'e.g. vegan and palm-oil-free without gluten or milk: '
+                   '?tag=en:vegan&tag=en:palm-oil-free&exclude_tag=en:gluten&exclude_tag=en:milk. '
+                   'Evaluated as bitwise operations on an in-memory bitmap per tag; '
+                   'results come in product id order.',
+    'parameters': [
+        {'name': 'tag', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi', 'description': 'Products must have all these tags'},
+        {'name': 'any_tag', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi', 'description': 'Products must have at least one of these tags'},
+        {'name': 'exclude_tag', 'in': 'query', 'type': 'array', 'items': {'type': 'string'},
+            'collectionFormat': 'multi', 'description': 'Products must have none of these tags'},
+        {'name': 'limit', 'in': 'query', 'type': 'integer', 'default': 20,
+            'description': 'Page size (1-100)'},
+        {'name': 'cursor', 'in': 'query', 'type': 'string',
+            'description': 'next_cursor returned by the previous page'}
+    ],
+    'responses': {
+        200: {'description': 'Total matches, page of products and the cursor for the next page'},
+        400: {'description': 'No filter given or invalid parameter'},
+        503: {'description': 'Index still being built in the background, retry shortly'}
+    }
+})
+def filter_products():
+    """
+    Filtro AND (tag) / OR (any_tag) / NOT (exclude_tag) resolvido no índice de
+    bitmaps; o banco só é consultado, por chave primária, para os ids da página.
+    """
+    all_of = request.args.getlist('tag')
+    any_of = request.args.getlist('any_tag')
+    none_of = request.args.getlist('exclude_tag')
+    if not (all_of or any_of or none_of):
+        return jsonify({"error": "At least one tag, any_tag or exclude_tag is required"}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        cursor = request.args.get('cursor')
+        after = int(cursor) if cursor else -1
+    except ValueError:
+        return jsonify({"error": "limit and cursor must be integers"}), 400
+    if cursor and after < 0:
+        return jsonify({"error": "cursor must be a non-negative integer"}), 400
+
+    # O índice é montado na inicialização; até lá a consulta não espera por ele
+    if not tag_index.ensure_loaded():
+        response = jsonify({"error": "Tag index is loading, retry shortly"})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    matches = tag_index.match(all_of, any_of, none_of)
+
+    # Busca um item a mais para saber se existe próxima página; ids de
+    # produtos removidos por outro processo são pulados e limpos do índice
+    ids = iter_bits(matches, after)
+    products, missing = [], []
+    while len(products) <= limit:
+        batch = list(islice(ids, limit + 1 - len(products)))
+        if not batch:
+            break
+        found = {p.id: p for p in Product.query.filter(Product.id.in_(batch)).all()}
+        for product_id in batch:
+            if product_id in found:
+                products.append(found[product_id])
+            else:
+                missing.append(product_id)
+    if missing:
+        tag_index.discard_missing(missing)
+    has_more = len(products) > limit
+    products = products[:limit]
+
+    return jsonify({
+        "total": popcount(matches) - len(missing),
+        "products": [ProductResponseSchema.model_validate(p).model_dump() for p in products],
+        "next_cursor": str(products[-1].id) if has_more else None
+    }), 200
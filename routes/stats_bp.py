@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify, request
+from flasgger import swag_from
+from extensions import stats
+
+# Blueprint definition
+stats_bp = Blueprint('stats', __name__)
+
+
+# STATS: Painel do catálogo
+@stats_bp.route('/stats', methods=['GET'])
+@swag_from({
+    'tags': ['Stats'],
+    'summary': 'Catalogue statistics for the dashboard',
+    'description': 'Score histogram, NOVA group distribution, most common additives and '
+                   'labels/certifications, average score and average rating. Served from '
+                   'summary tables kept up to date on every write, so the cost does not '
+                   'depend on the catalogue size.',
+    'parameters': [
+        {'name': 'top', 'in': 'query', 'type': 'integer', 'default': 10,
+            'description': 'How many additives and labels to list (1-100)'}
+    ],
+    'responses': {
+        200: {'description': 'Catalogue statistics'}
+    }
+})
+def get_stats():
+    top = max(1, min(request.args.get('top', 10, type=int), 100))
+    return jsonify(stats.summary(top)), 200
@@ -1,6 +1,9 @@
 from flask import Blueprint, jsonify, request
-from extensions import db
+from extensions import db, scan_log
+from model.product import Product
 from model.user import User
+from schemas.product_schemas import ProductResponseSchema
+from scripts.scan_log import decode_cursor
 from schemas.user_schemas import UserInputSchema, UserResponseSchema
 
 # Criar blueprint padrão do Flask
@@ -79,6 +82,40 @@ def get_user(user_id):
     }), 200
 
 
+@user_bp.route('/user/<int:user_id>/scans', methods=['GET'])
+def get_user_scans(user_id):
+    """
+    Histórico de scans do usuário, do mais recente ao mais antigo, paginado
+    por cursor (next_cursor). Cobre a janela de SCAN_LOG_RETENTION_DAYS.
+    """
+    User.query.get_or_404(user_id)
+    try:
+        limit = max(1, min(int(request.args.get('limit', 20)), 100))
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    rows, next_cursor = scan_log.history(user_id, limit, after)
+
+    # Uma única consulta para os produtos da página (None se já removido)
+    ids = {row.product_id for row in rows}
+    found = {p.id: p for p in Product.query.filter(Product.id.in_(ids)).all()} if ids else {}
+    return jsonify({
+        "scans": [
+            {
+                "id": row.id,
+                "scanned_at": row.ts.isoformat(),
+                "product_id": row.product_id,
+                "product": ProductResponseSchema.model_validate(found[row.product_id]).model_dump()
+                if row.product_id in found else None
+            }
+            for row in rows
+        ],
+        "next_cursor": next_cursor
+    }), 200
+
+
 @user_bp.route('/user/<int:user_id>', methods=['DELETE'])
 def delete_user(user_id):
     """
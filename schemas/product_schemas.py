@@ -1,6 +1,13 @@
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import AfterValidator, BaseModel, Field, ConfigDict, computed_field
 from datetime import datetime
-from typing import Optional
+from typing import Annotated, Optional
+
+from scripts.gtin import canonical_barcode
+from scripts.score_calculator import decode_rules
+
+# Barcode validated (GS1 check digit) and normalized before any DB/OFF lookup:
+# UPC-A, EAN-8, EAN-13 and GTIN-14 forms of the same item share one key.
+CanonicalBarcode = Annotated[str, AfterValidator(canonical_barcode)]
 
 # --- Input Schemas (Request Body) ---
 
@@ -17,10 +24,10 @@ class ProductInputSchema(BaseModel):
         json_schema_extra={"example": "Eco Green Soap"}
     )
 
-    barcode: str = Field(
+    barcode: CanonicalBarcode = Field(
         ...,
-        description="Product barcode (EAN-13).",
-        json_schema_extra={"example": "7891234567890"},
+        description="Product barcode (EAN-8, UPC-A, EAN-13 or GTIN-14).",
+        json_schema_extra={"example": "7891234567895"},
     )
 
     user_id: Optional[int] = Field(None, json_schema_extra={"example": 1})
@@ -40,6 +47,9 @@ class ProductResponseSchema(ProductInputSchema):
     id: int = Field(..., json_schema_extra={
                     "description": "Internal database ID."})
 
+    # Stored value, returned as is (not re-validated on output)
+    barcode: str = Field(..., description="Canonical product barcode.")
+
     # Image URL for the frontend card
     image_url: Optional[str] = Field(None, json_schema_extra={
                                      "description": "Product image link."})
@@ -51,6 +61,18 @@ class ProductResponseSchema(ProductInputSchema):
             "description": "Sustainability/Health score from 0 to 100.", "example": 95.6}
     )
 
+    # Score rules that fired, as a bitmask (see scripts/score_calculator.py)
+    score_rules: Optional[int] = Field(
+        None,
+        json_schema_extra={"description": "Bitmask of the score rules that fired.", "example": 37}
+    )
+
+    @computed_field
+    @property
+    def score_breakdown(self) -> list[dict]:
+        """Decoded score_rules: rule name, points and description."""
+        return decode_rules(self.score_rules)
+
     # Industrial processing level (1 to 4)
     nova_group: Optional[int] = Field(None, json_schema_extra={"example": 1})
 
@@ -0,0 +1,522 @@
+"""
+Índice de similaridade para sugerir alternativas mais verdes.
+
+Cada produto vira um conjunto de features (tokens do nome e tags de labels,
+análise de ingredientes e aditivos), resumido em uma assinatura MinHash de
+NUM_PERM inteiros. As assinaturas são divididas em BANDS faixas de ROWS
+valores; produtos que coincidem em alguma faixa caem no mesmo bucket (LSH).
+Uma consulta só compara o produto com os candidatos dos seus buckets, em vez
+de percorrer a tabela inteira.
+
+O índice fica em memória e é atualizado a cada inserção, alteração ou
+remoção de produto. Nada disso pesa na requisição:
+
+- o primeiro uso dispara, em uma thread, a carga do arquivo
+  ALTERNATIVES_INDEX_PATH ou a reconstrução a partir do banco; até terminar,
+  a rota responde 503 e as alterações ficam em um diário aplicado no fim
+- o arquivo guarda o banco de origem, a quantidade de produtos e o maior id:
+  ao carregar, produtos com id acima do gravado são incorporados e, se a
+  contagem ainda não bater com o banco, o índice é reconstruído
+- a gravação (arquivo temporário + rename) roda a cada
+  ALTERNATIVES_SAVE_INTERVAL segundos e na saída do processo, só no worker
+  que detém o lock do arquivo (os demais só leem)
+- slots de produtos alterados ou removidos são compactados em segundo plano
+  quando passam de ALTERNATIVES_COMPACT_RATIO do total
+
+Alterações de produtos já indexados feitas por outros workers só aparecem
+depois de uma reconstrução: flask --app app build-alternatives-index
+"""
+import atexit
+import os
+import pickle
+import random
+import re
+import tempfile
+import threading
+import unicodedata
+import zlib
+from array import array
+
+try:
+    import fcntl
+except ImportError:  # Windows: todo worker grava (a troca do arquivo é atômica)
+    fcntl = None
+
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_FORMAT_VERSION = 2
+_TOKEN = re.compile(r'[a-z0-9]+')
+_MIN_DEAD_TO_COMPACT = 1000
+
+
+def _normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def product_features(name, labels_tags, ingredients_analysis_tags, additives_tags):
+    """Conjunto de features de um produto (tags já separadas por vírgula no banco)."""
+    features = {'n:' + token for token in _TOKEN.findall(_normalize(name)) if len(token) >= 3}
+    for prefix, tags in (('l:', labels_tags), ('i:', ingredients_analysis_tags),
+                         ('a:', additives_tags)):
+        features.update(prefix + tag for tag in (tags or '').split(',') if tag)
+    return features
+
+
+def _band_keys(sig):
+    return [hash(tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class _Tables:
+    """Slots, scores, assinaturas e buckets LSH de uma versão do índice."""
+
+    def __init__(self):
+        self.slot_of = {}            # product_id -> slot
+        self.ids = array('q')        # slot -> product_id (-1 = removido)
+        self.scores = array('d')     # slot -> score
+        self.sigs = array('I')       # assinaturas concatenadas, NUM_PERM por slot
+        self.buckets = [{} for _ in range(BANDS)]  # faixa -> {chave: array de slots}
+        self.dead = 0                # slots removidos ainda ocupando espaço
+
+    def __len__(self):
+        return len(self.slot_of)
+
+    def sig_at(self, slot):
+        return self.sigs[slot * NUM_PERM:(slot + 1) * NUM_PERM]
+
+    def add(self, product_id, score, sig):
+        self.remove(product_id)
+        slot = len(self.ids)
+        self.slot_of[product_id] = slot
+        self.ids.append(product_id)
+        self.scores.append(score if score is not None else float('nan'))
+        self.sigs.extend(sig)
+        for band, key in enumerate(_band_keys(sig)):
+            bucket = self.buckets[band].get(key)
+            if bucket is None:
+                self.buckets[band][key] = array('q', [slot])
+            else:
+                bucket.append(slot)
+
+    def remove(self, product_id):
+        slot = self.slot_of.pop(product_id, None)
+        if slot is None:
+            return
+        for band, key in enumerate(_band_keys(self.sig_at(slot))):
+            bucket = self.buckets[band].get(key)
+            if bucket is not None:
+                bucket.remove(slot)
+                if not bucket:
+                    del self.buckets[band][key]
+        self.ids[slot] = -1
+        self.dead += 1
+
+    def apply(self, change):
+        """Aplica uma entrada do diário: (product_id, score, sig) ou (product_id,) para remoção."""
+        if len(change) == 1:
+            self.remove(change[0])
+        else:
+            self.add(*change)
+
+
+class AlternativesIndex:
+    """Índice MinHash/LSH de produtos, com score para filtrar alternativas melhores."""
+
+    def __init__(self, seed=1):
+        rnd = random.Random(seed)
+        self._coeffs = [(rnd.randrange(1, _MERSENNE), rnd.randrange(0, _MERSENNE))
+                        for _ in range(NUM_PERM)]
+        self._lock = threading.RLock()
+        self.path = None
+        self.save_interval = 300
+        self.compact_ratio = 0.25
+        self._app = None
+        self._tables = _Tables()
+        self._loaded = False
+        self._journal = None      # alterações durante uma carga ou compactação
+        self._worker = None       # thread de carga/compactação em andamento
+        self._generation = 0      # muda a cada init_app: descarta threads de um app anterior
+        self._dirty = 0
+        self._timer = None
+        self._owner = None        # arquivo de lock mantido aberto pelo worker que grava
+        self._exit_hook = False
+
+    def init_app(self, app):
+        app.config.setdefault('ALTERNATIVES_INDEX_PATH',
+                              os.path.join(app.instance_path, 'alternatives_index.pkl'))
+        app.config.setdefault('ALTERNATIVES_SAVE_INTERVAL', 300)
+        app.config.setdefault('ALTERNATIVES_COMPACT_RATIO', 0.25)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._release_ownership()
+        self.path = app.config['ALTERNATIVES_INDEX_PATH']
+        self.save_interval = app.config['ALTERNATIVES_SAVE_INTERVAL']
+        self.compact_ratio = app.config['ALTERNATIVES_COMPACT_RATIO']
+        self._app = app
+        # Um novo app pode apontar para outro banco: recarrega no primeiro uso
+        with self._lock:
+            self._generation += 1
+            self._tables = _Tables()
+            self._loaded = False
+            self._journal = None
+            self._worker = None
+            self._dirty = 0
+        self._schedule()
+        if not self._exit_hook:
+            atexit.register(self._save_if_dirty)
+            self._exit_hook = True
+
+    def __len__(self):
+        return len(self._tables)
+
+    # ---------- MinHash / LSH ----------
+
+    def signature(self, features):
+        hashes = [zlib.crc32(f.encode('utf-8')) for f in features]
+        if not hashes:
+            return [_MAX_HASH] * NUM_PERM
+        return [min((a * h + b) % _MERSENNE for h in hashes) & _MAX_HASH
+                for a, b in self._coeffs]
+
+    def _product_sig(self, name, labels, analysis, additives):
+        return self.signature(product_features(name, labels, analysis, additives))
+
+    # ---------- Atualização ----------
+
+    def upsert(self, product):
+        """Insere ou reindexa um produto (após criação, alteração ou novo score)."""
+        self.ensure_loaded()
+        sig = self._product_sig(product.name, product.labels_tags,
+                                product.ingredients_analysis_tags, product.additives_tags)
+        self._change((product.id, product.score, sig))
+
+    def remove(self, product_id):
+        self.ensure_loaded()
+        self._change((product_id,))
+
+    def _change(self, change):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(change)
+            if not self._loaded:
+                return
+            self._tables.apply(change)
+            self._dirty += 1
+            tables = self._tables
+            if (tables.dead >= _MIN_DEAD_TO_COMPACT
+                    and tables.dead > self.compact_ratio * len(tables.ids)):
+                self._start(self._compact)
+
+    # ---------- Consulta ----------
+
+    def alternatives(self, product, limit=5):
+        """
+        Produtos parecidos com score maior que o de `product`.
+
+        Returns:
+            list[tuple[int, float]]: (product_id, similaridade estimada) ordenados
+            por similaridade e depois por score, do melhor para o pior
+        """
+        with self._lock:
+            tables = self._tables
+            slot = tables.slot_of.get(product.id)
+            if slot is not None:
+                sig = list(tables.sig_at(slot))
+            else:
+                sig = self._product_sig(product.name, product.labels_tags,
+                                        product.ingredients_analysis_tags, product.additives_tags)
+
+            candidates = set()
+            for band, key in enumerate(_band_keys(sig)):
+                candidates.update(tables.buckets[band].get(key, ()))
+            candidates.discard(slot)
+
+            base_score = product.score if product.score is not None else float('-inf')
+            ranked = []
+            for cand in candidates:
+                score = tables.scores[cand]
+                # score NaN (produto sem score) nunca é maior que base_score
+                if not score > base_score:
+                    continue
+                cand_sig = tables.sig_at(cand)
+                similarity = sum(1 for x, y in zip(sig, cand_sig) if x == y) / NUM_PERM
+                ranked.append((similarity, score, tables.ids[cand]))
+
+        ranked.sort(reverse=True)
+        return [(product_id, similarity) for similarity, _, product_id in ranked[:limit]]
+
+    # ---------- Construção ----------
+
+    def _build_tables(self, rows):
+        """Tabelas a partir de tuplas (id, name, score, labels_tags, ingredients_analysis_tags, additives_tags)."""
+        tables = _Tables()
+        for product_id, name, score, labels, analysis, additives in rows:
+            tables.add(product_id, score, self._product_sig(name, labels, analysis, additives))
+        return tables
+
+    def build(self, rows):
+        """
+        Reconstrói o índice a partir de tuplas (id, name, score, labels_tags,
+        ingredients_analysis_tags, additives_tags).
+        """
+        tables = self._build_tables(rows)
+        with self._lock:
+            self._tables = tables
+            self._loaded = True
+            self._dirty = 0
+
+    def build_from_db(self, batch_size=10000):
+        """Reconstrói o índice lendo a tabela product (requer app context)."""
+        self.build(self._rows(batch_size))
+        return len(self)
+
+    @staticmethod
+    def _rows(chunk_size=10000, after_id=0):
+        """
+        Linhas de product em ordem de id, em blocos por keyset.
+
+        Cada bloco é uma leitura curta: no SQLite, uma única leitura longa
+        bloquearia as escritas durante toda a construção.
+        """
+        from extensions import db
+        from model.product import Product
+
+        table = Product.__table__
+        query = (db.select(table.c.pk_product, table.c.name, table.c.score, table.c.labels_tags,
+                           table.c.ingredients_analysis_tags, table.c.additives_tags)
+                 .order_by(table.c.pk_product)
+                 .limit(chunk_size))
+        last = after_id
+        while True:
+            with db.engine.connect() as conn:
+                rows = conn.execute(query.where(table.c.pk_product > last)).all()
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][0]
+
+    @staticmethod
+    def _db_extent():
+        """(quantidade de produtos, maior id) no banco."""
+        from extensions import db
+        from model.product import Product
+
+        table = Product.__table__
+        with db.engine.connect() as conn:
+            count, max_id = conn.execute(
+                db.select(db.func.count(), db.func.max(table.c.pk_product))).one()
+        return count, max_id or 0
+
+    # ---------- Carga e compactação em segundo plano ----------
+
+    def ensure_loaded(self):
+        """
+        True se o índice está pronto para consultas. Caso contrário, dispara
+        a carga (arquivo ou banco) em uma thread e devolve False sem esperar.
+        """
+        if self._loaded:
+            return True
+        self._start(self._load_or_build)
+        return False
+
+    def _start(self, target):
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            if self._app is None:
+                return
+            self._journal = []
+            self._worker = threading.Thread(
+                target=self._run, args=(target, self._app, self._generation),
+                name='alternatives-index', daemon=True)
+            self._worker.start()
+
+    def _run(self, target, app, generation):
+        try:
+            with app.app_context():
+                target(generation)
+        except Exception as e:
+            app.logger.warning(f'Falha ao montar o índice de alternativas: {e}')
+            with self._lock:
+                if generation == self._generation:
+                    self._journal = None
+
+    def _install(self, tables, generation):
+        """Aplica o diário e troca as tabelas em uso; False se o app mudou nesse meio-tempo."""
+        with self._lock:
+            if generation != self._generation:
+                return False
+            for change in self._journal or ():
+                tables.apply(change)
+            self._tables = tables
+            self._journal = None
+            self._loaded = True
+            return True
+
+    def _load_or_build(self, generation):
+        tables = self._read_valid()
+        built = tables is None
+        if built:
+            tables = self._build_tables(self._rows())
+        if self._install(tables, generation) and built:
+            self._save_owned()
+
+    def _compact(self, generation):
+        # Cópia rápida dos arrays sob o lock; a remontagem dos buckets fica fora dele
+        with self._lock:
+            tables = self._tables
+            ids, scores, sigs = array('q', tables.ids), array('d', tables.scores), array('I', tables.sigs)
+        fresh = _Tables()
+        for slot, product_id in enumerate(ids):
+            if product_id != -1:
+                fresh.add(product_id, scores[slot], sigs[slot * NUM_PERM:(slot + 1) * NUM_PERM])
+        self._install(fresh, generation)
+
+    # ---------- Persistência ----------
+
+    def save(self, path=None):
+        """Grava os slots vivos de forma atômica (temporário exclusivo + rename)."""
+        path = path or self.path
+        from extensions import db
+
+        with self._lock:
+            tables, dirty = self._tables, self._dirty
+            ids, scores, sigs = array('q', tables.ids), array('d', tables.scores), array('I', tables.sigs)
+        live_ids, live_scores, live_sigs = array('q'), array('d'), array('I')
+        for slot, product_id in enumerate(ids):
+            if product_id != -1:
+                live_ids.append(product_id)
+                live_scores.append(scores[slot])
+                live_sigs.extend(sigs[slot * NUM_PERM:(slot + 1) * NUM_PERM])
+        state = {
+            'version': _FORMAT_VERSION,
+            'num_perm': NUM_PERM,
+            'bands': BANDS,
+            'coeffs': self._coeffs,
+            'database': str(db.engine.url),
+            'max_id': max(live_ids, default=0),
+            'ids': live_ids,
+            'scores': live_scores,
+            'sigs': live_sigs,
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix='.alternatives-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._dirty = max(0, self._dirty - dirty)
+
+    def load(self, path=None):
+        """
+        Lê um arquivo gravado por save().
+
+        Returns:
+            tuple[_Tables, dict]: Tabelas e metadados (database, max_id)
+
+        Raises:
+            ValueError: Arquivo em formato incompatível
+        """
+        path = path or self.path
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if (not isinstance(state, dict) or state.get('version') != _FORMAT_VERSION
+                or state['num_perm'] != NUM_PERM or state['bands'] != BANDS
+                or state['coeffs'] != self._coeffs):
+            raise ValueError(f'Índice em formato incompatível: {path}')
+        tables = _Tables()
+        ids, scores, sigs = state['ids'], state['scores'], state['sigs']
+        for slot, product_id in enumerate(ids):
+            tables.add(product_id, scores[slot], sigs[slot * NUM_PERM:(slot + 1) * NUM_PERM])
+        return tables, {'database': state['database'], 'max_id': state['max_id']}
+
+    def _read_valid(self):
+        """Tabelas do arquivo, se ele for deste banco e estiver em dia; senão None."""
+        from extensions import db
+
+        if not self.path or not os.path.exists(self.path):
+            return None
+        app = self._app
+        try:
+            tables, meta = self.load()
+        except (OSError, EOFError, KeyError, ValueError, pickle.UnpicklingError) as e:
+            app.logger.warning(f'Índice de alternativas ignorado: {e}')
+            return None
+        if meta['database'] != str(db.engine.url):
+            app.logger.warning(f'Índice de alternativas de outro banco ignorado: {self.path}')
+            return None
+
+        count, max_id = self._db_extent()
+        # Produtos inseridos depois da gravação (outro worker ou carga em massa)
+        if max_id > meta['max_id']:
+            for product_id, name, score, labels, analysis, additives in self._rows(
+                    after_id=meta['max_id']):
+                tables.add(product_id, score, self._product_sig(name, labels, analysis, additives))
+        if len(tables) != count or max(tables.slot_of, default=0) != max_id:
+            app.logger.warning(
+                f'Índice de alternativas desatualizado ({len(tables)} produtos, '
+                f'banco com {count}): reconstruindo')
+            return None
+        return tables
+
+    def _acquire_ownership(self):
+        """Só um worker grava o arquivo: o que conseguir o lock exclusivo de <path>.lock."""
+        if self._owner is not None or fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        handle = open(self.path + '.lock', 'a')
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._owner = handle
+        return True
+
+    def _release_ownership(self):
+        if self._owner is not None:
+            self._owner.close()
+            self._owner = None
+
+    def _save_owned(self):
+        if self.path and self._loaded and self._acquire_ownership():
+            self.save()
+
+    def _schedule(self):
+        if self.save_interval and self.save_interval > 0:
+            self._timer = threading.Timer(self.save_interval, self._periodic_save)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _periodic_save(self):
+        app = self._app
+        try:
+            if self._dirty:
+                with app.app_context():
+                    self._save_owned()
+        except Exception as e:
+            app.logger.warning(f'Falha ao gravar o índice de alternativas: {e}')
+        finally:
+            self._schedule()
+
+    def _save_if_dirty(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._dirty and self._app is not None:
+            try:
+                with self._app.app_context():
+                    self._save_owned()
+            except Exception as e:
+                self._app.logger.warning(f'Falha ao gravar o índice de alternativas: {e}')
@@ -0,0 +1,56 @@
+import json
+import os
+
+from flasgger import Swagger
+
+
+class LazySwagger(Swagger):
+    """
+    Swagger com a especificação OpenAPI gerada sob demanda.
+
+    Nada é calculado no create_app: a spec é montada na primeira requisição
+    a /apispec.json e reaproveitada nas seguintes (inclusive em modo debug,
+    onde o Flasgger original refaz a varredura de todas as rotas a cada
+    chamada). Se SWAGGER_SPEC_FILE apontar para um arquivo existente,
+    gerado no build com "flask --app app export-apispec", ele é servido
+    direto, sem percorrer as rotas.
+    """
+
+    def get_apispecs(self, endpoint='apispec_1'):
+        spec = self.apispecs.get(endpoint)
+        if spec is not None:
+            return spec
+
+        spec_file = self.app.config.get('SWAGGER_SPEC_FILE')
+        if spec_file and os.path.exists(spec_file):
+            with open(spec_file, encoding='utf-8') as f:
+                spec = json.load(f)
+        else:
+            spec = super().get_apispecs(endpoint)
+
+        self.apispecs[endpoint] = spec
+        return spec
+
+
+def export_apispec(app, path, endpoint='apispec'):
+    """
+    Gera a especificação e grava em JSON, para ser servida como arquivo
+    estático (SWAGGER_SPEC_FILE).
+
+    Args:
+        app (Flask): Aplicação com o LazySwagger inicializado
+        path (str): Arquivo de destino
+        endpoint (str): Endpoint da spec configurado no Swagger
+
+    Returns:
+        str: Caminho absoluto do arquivo gerado
+    """
+    with app.test_request_context():
+        # Ignora o arquivo pré-calculado: a exportação sempre reflete as rotas atuais
+        spec = Swagger.get_apispecs(app.swag, endpoint)
+
+    path = os.path.abspath(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(spec, f, ensure_ascii=False, indent=2, default=str)
+    return path
@@ -1,16 +1,311 @@
-import cv2 # read image/camera/video input
-from pyzbar.pyzbar import decode
+"""
+Leitor de códigos de barras com pipeline produtor/consumidor.
+
+- Uma thread de captura lê quadros da fonte (câmera, vídeo ou pasta de imagens)
+- Um pool de workers converte para tons de cinza, reduz/recorta o quadro e
+  roda pyzbar.decode (a chamada à libzbar via ctypes libera o GIL)
+- Com câmera, quadros são pulados de forma adaptativa quando a decodificação
+  não acompanha a captura, em vez de acumular atraso
+- Códigos repetidos dentro de uma janela de tempo são descartados em O(1)
+
+Uso:
+    python -m scripts.barcode_scanner                      # câmera 0
+    python -m scripts.barcode_scanner --source video.mp4 --benchmark
+    python -m scripts.barcode_scanner --source fotos/ --workers 4 --scale 0.5
+    python -m scripts.barcode_scanner --api-url http://127.0.0.1:5000 --spool scan_spool.db
+"""
+import argparse
+import logging
+import os
+import queue
+import threading
 import time
 
-cap = cv2.VideoCapture(0)
-cap.set(3, 640) # width
-cap.set(4, 480) # height
+import cv2  # read image/camera/video input
+from pyzbar.pyzbar import decode
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.webp')
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+# ---------- Fontes de quadros ----------
+
+class CameraSource:
+    """Câmera ao vivo: quadros que não forem consumidos a tempo são descartados."""
+
+    realtime = True
+
+    def __init__(self, index=0, width=640, height=480):
+        self.cap = cv2.VideoCapture(index)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+    def read(self):
+        success, frame = self.cap.read()
+        return frame if success else None
+
+    def close(self):
+        self.cap.release()
+
+
+class VideoFileSource(CameraSource):
+    """Arquivo de vídeo: todos os quadros são processados (benchmark offline)."""
+
+    realtime = False
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+
+
+class ImageDirSource:
+    """Pasta de imagens, lidas em ordem alfabética (benchmark offline)."""
+
+    realtime = False
+
+    def __init__(self, directory, loops=1):
+        names = sorted(n for n in os.listdir(directory) if n.lower().endswith(IMAGE_EXTENSIONS))
+        self.paths = [os.path.join(directory, n) for n in names] * loops
+        self._next = 0
+
+    def read(self):
+        while self._next < len(self.paths):
+            frame = cv2.imread(self.paths[self._next])
+            self._next += 1
+            if frame is not None:
+                return frame
+        return None
+
+    def close(self):
+        pass
+
+
+def open_source(spec, width=640, height=480, loops=1):
+    """Escolhe a fonte: número = câmera, pasta = imagens, caso contrário = vídeo."""
+    if str(spec).isdigit():
+        return CameraSource(int(spec), width, height)
+    if os.path.isdir(spec):
+        return ImageDirSource(spec, loops)
+    return VideoFileSource(spec)
+
+
+# ---------- Pré-processamento e deduplicação ----------
+
+def preprocess(frame, scale=1.0, roi=1.0):
+    """
+    Converte para tons de cinza, recorta a região central (roi = fração da
+    largura/altura) e reduz a resolução (scale). O zbar trabalha em cinza de
+    qualquer forma; menos pixels = decodificação mais rápida.
+    """
+    gray = frame if frame.ndim == 2 else cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if roi < 1.0:
+        h, w = gray.shape
+        dh, dw = int(h * (1 - roi) / 2), int(w * (1 - roi) / 2)
+        gray = gray[dh:h - dh, dw:w - dw]
+    if scale != 1.0:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return gray
+
+
+class DedupeWindow:
+    """
+    Conjunto de códigos vistos nos últimos `window` segundos.
+    Consulta e inserção em O(1); entradas vencidas são podadas periodicamente.
+    """
+
+    def __init__(self, window=5.0):
+        self.window = window
+        self._seen = {}
+        self._lock = threading.Lock()
+        self._next_prune = 0.0
+
+    def first_seen(self, key, now=None):
+        """True se key não foi vista na janela (e a registra)."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if now >= self._next_prune:
+                self._seen = {k: t for k, t in self._seen.items() if now - t < self.window}
+                self._next_prune = now + self.window
+            last = self._seen.get(key)
+            self._seen[key] = now
+            return last is None or now - last >= self.window
+
+
+# ---------- Pipeline ----------
+
+class ScannerPipeline:
+    """
+    Captura -> fila limitada -> pool de decodificação -> dedupe -> on_code.
+
+    Args:
+        source: Objeto com read() -> quadro | None, close() e atributo realtime
+        on_code (callable): Chamado com (tipo, dados) para cada código novo
+        workers (int): Threads de decodificação
+        scale (float): Fator de redução do quadro antes de decodificar
+        roi (float): Fração central do quadro mantida (1.0 = quadro inteiro)
+        dedupe_window (float): Segundos em que um mesmo código é ignorado
+        decoder (callable): Função de decodificação (padrão: pyzbar.decode)
+    """
+
+    def __init__(self, source, on_code=None, workers=2, scale=0.5, roi=1.0,
+                 dedupe_window=5.0, decoder=decode):
+        self.source = source
+        self.on_code = on_code or (lambda code_type, data: print(code_type, data))
+        self.workers = workers
+        self.scale = scale
+        self.roi = roi
+        self.decoder = decoder
+        self.dedupe = DedupeWindow(dedupe_window)
+        self.frames = queue.Queue(maxsize=workers * 2)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        # Quadros pulados a cada quadro enviado (ajustado pela ocupação da fila)
+        self.skip = 0
+        self.stats = {'captured': 0, 'skipped': 0, 'decoded': 0, 'codes': 0, 'duplicates': 0,
+                      'errors': 0}
+
+    def stop(self):
+        self._stop.set()
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _capture(self):
+        pending_skip = 0
+        while not self._stop.is_set():
+            frame = self.source.read()
+            if frame is None:
+                break
+            self._count('captured')
+
+            if not self.source.realtime:
+                self.frames.put(frame)
+                continue
+
+            # Salto adaptativo: fila cheia => decodificação atrasada, pula mais;
+            # fila vazia => há folga, pula menos
+            if pending_skip > 0:
+                pending_skip -= 1
+                self._count('skipped')
+                continue
+            try:
+                self.frames.put_nowait(frame)
+                if self.frames.qsize() <= 1 and self.skip > 0:
+                    self.skip -= 1
+            except queue.Full:
+                self._count('skipped')
+                self.skip = min(self.skip + 1, 30)
+            pending_skip = self.skip
+
+        for _ in range(self.workers):
+            self.frames.put(_STOP)
+
+    def _decode_worker(self):
+        while True:
+            frame = self.frames.get()
+            if frame is _STOP:
+                break
+            # Um quadro corrompido (ou erro do cv2/pyzbar) não pode encerrar o
+            # worker: sem consumidores, a captura ficaria presa em frames.put
+            try:
+                self._decode_frame(frame)
+            except Exception as e:
+                self._count('errors')
+                logger.warning('Falha ao decodificar quadro: %s', e)
+                continue
+            self._count('decoded')
+
+    def _decode_frame(self, frame):
+        for code in self.decoder(preprocess(frame, self.scale, self.roi)):
+            data = code.data.decode('utf-8', 'replace')
+            if self.dedupe.first_seen((code.type, data)):
+                self._count('codes')
+                self.on_code(code.type, data)
+            else:
+                self._count('duplicates')
+
+    def run(self):
+        """Executa até a fonte acabar (ou stop()). Retorna as estatísticas."""
+        started = time.perf_counter()
+        threads = [threading.Thread(target=self._decode_worker, daemon=True)
+                   for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        capture = threading.Thread(target=self._capture, daemon=True)
+        capture.start()
+        try:
+            capture.join()
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            self.stop()
+            capture.join()
+        finally:
+            self.source.close()
+
+        elapsed = time.perf_counter() - started
+        stats = dict(self.stats, elapsed_s=round(elapsed, 3))
+        stats['decoded_fps'] = round(stats['decoded'] / elapsed, 1) if elapsed else 0.0
+        return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Leitor de códigos de barras.')
+    parser.add_argument('--source', default='0',
+                        help='Índice da câmera, arquivo de vídeo ou pasta de imagens.')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--scale', type=float, default=0.5,
+                        help='Redução do quadro antes de decodificar (1.0 = original).')
+    parser.add_argument('--roi', type=float, default=1.0,
+                        help='Fração central do quadro a decodificar (1.0 = inteiro).')
+    parser.add_argument('--dedupe-window', type=float, default=5.0,
+                        help='Segundos em que o mesmo código é ignorado.')
+    parser.add_argument('--loops', type=int, default=1,
+                        help='Repetições da pasta de imagens (benchmark).')
+    parser.add_argument('--benchmark', action='store_true',
+                        help='Não imprime códigos; mostra quadros/segundo ao final.')
+    parser.add_argument('--spool',
+                        help='Grava as leituras neste spool SQLite local.')
+    parser.add_argument('--api-url',
+                        help='Envia as leituras do spool para POST /product/scan desta API.')
+    parser.add_argument('--user-id', type=int, help='user_id enviado com cada leitura.')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Envios simultâneos para a API.')
+    args = parser.parse_args(argv)
+
+    spool = sender = None
+    if args.spool or args.api_url:
+        from scripts.scan_spool import ScanSpool, SpoolSender
+        spool = ScanSpool(args.spool or 'scan_spool.db')
+        if args.api_url:
+            sender = SpoolSender(spool, args.api_url, args.concurrency).start()
+
+    if spool is not None:
+        # Só uma inserção local: a rede fica por conta do SpoolSender
+        def on_code(code_type, data):
+            spool.append(data, code_type, args.user_id)
+    elif args.benchmark:
+        def on_code(code_type, data):
+            pass
+    else:
+        on_code = None
+
+    source = open_source(args.source, loops=args.loops)
+    pipeline = ScannerPipeline(source, on_code, args.workers, args.scale,
+                               args.roi, args.dedupe_window)
+    stats = pipeline.run()
 
-used_codes = []
+    if sender is not None:
+        sender.stop()
+    if spool is not None:
+        stats['spool'] = spool.counts()
+        spool.close()
+    if args.benchmark or spool is not None:
+        print(stats)
 
-camera = True
-while camera == True:
-    success, frame = cap.read()
 
-    for code in decode(frame):
-        print(code.type)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+import click
+
+
+def register_commands(app):
+    """
+    Registra os comandos de manutenção no CLI do Flask (flask --app app <comando>).
+    """
+
+    @app.cli.command('migrate')
+    def migrate_command():
+        """Cria as tabelas e aplica as migrações pendentes."""
+        from scripts.migrations import migrate
+        migrate(log=click.echo)
+
+    @app.cli.command('export-apispec')
+    @click.option('--output', default='static/apispec.json', show_default=True,
+                  help='Arquivo JSON de destino.')
+    def export_apispec_command(output):
+        """Pré-calcula a especificação OpenAPI como arquivo estático."""
+        from scripts.apispec import export_apispec
+        path = export_apispec(app, output)
+        click.echo(f'Spec gravada em {path}')
+        click.echo(f"Sirva-a com SWAGGER_SPEC_FILE = '{path}'")
+
+    @app.cli.command('build-alternatives-index')
+    def build_alternatives_index_command():
+        """Reconstrói o índice MinHash/LSH de alternativas a partir do banco."""
+        from extensions import alternatives
+        count = alternatives.build_from_db()
+        alternatives.save()
+        click.echo(f'{count} produtos indexados em {alternatives.path}')
+
+    @app.cli.command('export-products')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson', 'parquet']),
+                  default='csv', show_default=True)
+    @click.option('--output', default='-', show_default=True,
+                  help='Arquivo de destino (- = saída padrão).')
+    @click.option('--chunk-size', default=5000, show_default=True,
+                  help='Linhas lidas do banco por bloco / row group.')
+    def export_products_command(fmt, output, chunk_size):
+        """Exporta o histórico de produtos em streaming (CSV, NDJSON ou Parquet)."""
+        from scripts.export import export_stream
+        with click.open_file(output, 'wb') as f:
+            for part in export_stream(fmt, chunk_size):
+                f.write(part.encode('utf-8') if isinstance(part, str) else part)
+
+    @app.cli.command('reconcile-stats')
+    def reconcile_stats_command():
+        """Recalcula do zero as estatísticas de GET /stats (stat_counter)."""
+        from extensions import stats
+        stats.reconcile(log=click.echo)
+
+    @app.cli.command('compact-scans')
+    @click.option('--retention-days', type=int, default=None,
+                  help='Dias de eventos mantidos (padrão: SCAN_LOG_RETENTION_DAYS).')
+    def compact_scans_command(retention_days):
+        """Consolida por dia os eventos de scan mais antigos que a retenção."""
+        from extensions import scan_log
+        scan_log.compact(retention_days, log=click.echo)
+
+    @app.cli.command('build-snapshot')
+    @click.option('--output', default=None,
+                  help='Arquivo de destino (padrão: SNAPSHOT_PATH).')
+    def build_snapshot_command(output):
+        """Gera o snapshot binário do catálogo usado no hit do scan."""
+        from extensions import snapshot
+        snapshot.build(output, log=click.echo)
@@ -0,0 +1,313 @@
+"""
+Buffer de escrita (write-behind) para comentários, com group commit.
+
+No modo normal cada POST /comment faz a própria transação: no SQLite isso é
+um fsync por comentário, e rajadas de comentários (ex.: campanha pedindo
+avaliações de um produto) fazem fila no lock de escrita do banco. Com
+COMMENT_BUFFER_ENABLED, o comentário validado entra em uma fila em memória e
+uma thread gravadora o insere junto com os demais em uma única transação,
+fechada quando o lote atinge COMMENT_BUFFER_MAX_BATCH comentários ou quando
+o mais antigo espera COMMENT_BUFFER_MAX_DELAY_MS.
+
+Durabilidade (COMMENT_BUFFER_ACK):
+- 'queued': responde 202 assim que o comentário entra na fila, com um ID
+  provisório (consultável em GET /comment/pending/<id>). Comentários ainda
+  na fila se perdem se o processo morrer. O status fica na memória do
+  processo que aceitou o comentário: com vários workers, a consulta só
+  responde no worker que emitiu o ID (os demais respondem 404).
+- 'committed': a requisição espera o commit do lote e recebe o ID real;
+  continua havendo um fsync por lote, não por comentário.
+
+COMMENT_BUFFER_SYNCHRONOUS ajusta o PRAGMA synchronous (SQLite) da conexão
+da thread gravadora: FULL, NORMAL ou OFF. None mantém o padrão do banco. A
+gravadora usa então uma conexão própria, fora do pool, para o ajuste não
+vazar para as demais conexões do app.
+
+Falhas passageiras do banco (OperationalError, ex.: database is locked) são
+retentadas com backoff exponencial; só erros do próprio comentário
+(integridade ou valores inválidos) o marcam como failed, isolados
+regravando o lote um a um.
+"""
+import atexit
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from sqlalchemy.exc import OperationalError, SQLAlchemyError
+
+ACK_MODES = ('queued', 'committed')
+SYNCHRONOUS_MODES = ('FULL', 'NORMAL', 'OFF')
+
+PENDING = 'pending'
+COMMITTED = 'committed'
+FAILED = 'failed'
+
+# Novas tentativas de um lote diante de OperationalError (~6 s no total)
+RETRY_ATTEMPTS = 8
+RETRY_BACKOFF = 0.05
+RETRY_MAX_BACKOFF = 2.0
+
+_STOP = object()
+
+
+class PendingComment:
+    """Comentário aceito pelo buffer e ainda não (necessariamente) gravado."""
+
+    __slots__ = ('provisional_id', 'values', 'future')
+
+    def __init__(self, provisional_id, values):
+        self.provisional_id = provisional_id
+        self.values = values
+        self.future = Future()
+
+
+class CommentWriteBuffer:
+    """Fila de comentários gravados em lote por uma thread dedicada."""
+
+    def __init__(self):
+        self.enabled = False
+        self.ack = 'queued'
+        self.max_batch = 500
+        self.max_delay = 0.05
+        self.synchronous = None
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._engine = None
+        self._exit_hook = False
+        self._lock = threading.Lock()
+        # IDs provisórios: prefixo por processo + sequência
+        self._prefix = os.urandom(3).hex()
+        self._sequence = itertools.count(1)
+        self._recent = OrderedDict()
+        self._recent_limit = 100000
+        self.stats = {'accepted': 0, 'committed': 0, 'failed': 0, 'batches': 0, 'overflow': 0}
+
+    def init_app(self, app):
+        app.config.setdefault('COMMENT_BUFFER_ENABLED', False)
+        app.config.setdefault('COMMENT_BUFFER_MAX_BATCH', 500)
+        app.config.setdefault('COMMENT_BUFFER_MAX_DELAY_MS', 50)
+        app.config.setdefault('COMMENT_BUFFER_MAX_PENDING', 10000)
+        app.config.setdefault('COMMENT_BUFFER_ACK', 'queued')
+        app.config.setdefault('COMMENT_BUFFER_SYNCHRONOUS', None)
+
+        ack = app.config['COMMENT_BUFFER_ACK']
+        if ack not in ACK_MODES:
+            raise ValueError(f'COMMENT_BUFFER_ACK deve ser um de {ACK_MODES}: {ack!r}')
+        synchronous = app.config['COMMENT_BUFFER_SYNCHRONOUS']
+        if synchronous is not None and synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(
+                f'COMMENT_BUFFER_SYNCHRONOUS deve ser um de {SYNCHRONOUS_MODES}: {synchronous!r}')
+
+        # Um app anterior (ex.: benchmarks) pode ter deixado a thread rodando
+        self.stop()
+        self.enabled = app.config['COMMENT_BUFFER_ENABLED']
+        self.ack = ack
+        self.max_batch = app.config['COMMENT_BUFFER_MAX_BATCH']
+        self.max_delay = app.config['COMMENT_BUFFER_MAX_DELAY_MS'] / 1000.0
+        self.synchronous = synchronous.upper() if synchronous else None
+        self._app = app
+        self._queue = queue.Queue(maxsize=app.config['COMMENT_BUFFER_MAX_PENDING'])
+
+    # ---------- Produtor (requisições) ----------
+
+    def submit(self, values):
+        """
+        Enfileira um comentário já validado.
+
+        Args:
+            values (dict): Colunas do comentário (author, text, n_estrela,
+                product_id, date_inserted)
+
+        Returns:
+            PendingComment | None: None se a fila estiver cheia (quem chama
+            grava o comentário de forma síncrona)
+        """
+        self._ensure_started()
+        pending = PendingComment(f'tmp-{self._prefix}-{next(self._sequence)}', values)
+        # PENDING antes de enfileirar: a thread gravadora pode gravar o lote e
+        # registrar COMMITTED antes desta função voltar a rodar
+        with self._lock:
+            self._remember(pending.provisional_id, (PENDING, None, None))
+        try:
+            self._queue.put_nowait(pending)
+        except queue.Full:
+            with self._lock:
+                self._recent.pop(pending.provisional_id, None)
+                self.stats['overflow'] += 1
+            return None
+        with self._lock:
+            self.stats['accepted'] += 1
+        return pending
+
+    def status(self, provisional_id):
+        """(status, id real, erro) de um comentário recente, ou None se desconhecido."""
+        with self._lock:
+            return self._recent.get(provisional_id)
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self, timeout=None):
+        """Espera até todos os comentários já aceitos estarem gravados."""
+        if self._thread is None:
+            return True
+        marker = Future()
+        self._queue.put(marker)
+        try:
+            marker.result(timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+    def issued_here(self, provisional_id):
+        """True se o ID provisório foi emitido por este processo."""
+        return provisional_id.startswith(f'tmp-{self._prefix}-')
+
+    def _remember(self, provisional_id, state):
+        self._recent[provisional_id] = state
+        self._recent.move_to_end(provisional_id)
+        while len(self._recent) > self._recent_limit:
+            self._recent.popitem(last=False)
+
+    # ---------- Thread gravadora ----------
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._app, self._queue),
+                    name='comment-writer', daemon=True)
+                self._thread.start()
+                if not self._exit_hook:
+                    atexit.register(self.stop)
+                    self._exit_hook = True
+
+    def stop(self, timeout=10.0):
+        """Grava o que estiver na fila e encerra a thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self, app, source):
+        with app.app_context():
+            try:
+                while True:
+                    first = source.get()
+                    if first is _STOP:
+                        return
+                    batch, markers = [], []
+                    stop = self._collect(source, first, batch, markers)
+                    if batch:
+                        self._write(batch)
+                    for marker in markers:
+                        marker.set_result(None)
+                    if stop:
+                        return
+            finally:
+                if self._engine is not None:
+                    self._engine.dispose()
+                    self._engine = None
+
+    def _connect(self):
+        """
+        Conexão da gravadora. Com COMMENT_BUFFER_SYNCHRONOUS, uma conexão
+        própria (NullPool): o PRAGMA não volta para o pool do app.
+        """
+        from extensions import db
+
+        if not self.synchronous or db.engine.dialect.name != 'sqlite':
+            return db.engine.connect()
+        if self._engine is None:
+            from sqlalchemy import create_engine
+            from sqlalchemy.pool import NullPool
+            self._engine = create_engine(db.engine.url, poolclass=NullPool)
+        conn = self._engine.connect()
+        conn.exec_driver_sql(f'PRAGMA synchronous = {self.synchronous}')
+        return conn
+
+    def _collect(self, source, item, batch, markers):
+        """Junta itens até completar o lote ou vencer a janela do primeiro."""
+        deadline = time.monotonic() + self.max_delay
+        while True:
+            if item is _STOP:
+                return True
+            if isinstance(item, Future):
+                # flush(): tudo o que veio antes do marcador entra neste lote
+                markers.append(item)
+                return False
+            batch.append(item)
+            if len(batch) >= self.max_batch:
+                return False
+            remaining = deadline - time.monotonic()
+            try:
+                item = source.get(timeout=remaining) if remaining > 0 else source.get_nowait()
+            except queue.Empty:
+                return False
+
+    def _insert(self, rows):
+        from extensions import db, stats
+        from model.comment import Comment
+
+        table = Comment.__table__
+        statement = db.insert(table).returning(table.c.pk_comment, sort_by_parameter_order=True)
+        with self._connect() as conn:
+            ids = [row[0] for row in conn.execute(statement, rows)]
+            # Contadores de GET /stats na mesma transação do lote
+            stats.apply_comments(conn, rows)
+            conn.commit()
+        return ids
+
+    def _write(self, batch):
+        rows = [pending.values for pending in batch]
+        for attempt in range(RETRY_ATTEMPTS):
+            try:
+                ids = self._insert(rows)
+            except OperationalError as e:
+                # Banco ocupado/travado: passageiro, o lote inteiro é retentado
+                if attempt + 1 == RETRY_ATTEMPTS:
+                    self._app.logger.error(
+                        f'{len(batch)} comentários não gravados após {RETRY_ATTEMPTS} tentativas: {e}')
+                    self._resolve(batch, None, failed=True)
+                    return
+                time.sleep(min(RETRY_BACKOFF * 2 ** attempt, RETRY_MAX_BACKOFF))
+                continue
+            except (SQLAlchemyError, ValueError, TypeError) as e:
+                if len(batch) == 1:
+                    self._app.logger.warning(f'Comentário rejeitado pelo banco: {e}')
+                    self._resolve(batch, None, failed=True)
+                    return
+                # Um comentário inválido não pode derrubar o lote inteiro:
+                # regrava um a um para isolar o problema
+                for pending in batch:
+                    self._write([pending])
+                return
+            self._resolve(batch, ids)
+            return
+
+    def _resolve(self, batch, ids, failed=False):
+        with self._lock:
+            if failed:
+                self.stats['failed'] += len(batch)
+            else:
+                self.stats['committed'] += len(batch)
+                self.stats['batches'] += 1
+            for index, pending in enumerate(batch):
+                if failed:
+                    state = (FAILED, None, 'Comment could not be saved')
+                else:
+                    state = (COMMITTED, ids[index], None)
+                self._remember(pending.provisional_id, state)
+        for index, pending in enumerate(batch):
+            if failed:
+                pending.future.set_exception(RuntimeError('Comment could not be saved'))
+            else:
+                pending.future.set_result(ids[index])
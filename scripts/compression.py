@@ -0,0 +1,159 @@
+"""
+Compressão das respostas (gzip e, se o pacote brotli estiver instalado, br).
+
+O encoding é negociado pelo header Accept-Encoding (respeitando os pesos q)
+e só é aplicado a respostas de texto/JSON com pelo menos COMPRESSION_MIN_SIZE
+bytes: abaixo disso o ganho não paga o custo. Respostas em streaming (ex.:
+/products/export) passam direto.
+
+Os bytes comprimidos de respostas GET 200 ficam em um cache LRU limitado a
+COMPRESSION_CACHE_MAX_BYTES, indexado pelo hash do corpo: a mesma listagem
+ou a spec do Swagger (/apispec.json) é comprimida uma vez e reaproveitada
+enquanto o conteúdo não mudar. Calcular o hash custa bem menos que comprimir.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # opcional: pip install brotli
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'text/html',
+    'text/css',
+    'text/csv',
+    'text/plain',
+}
+
+
+class CompressedCache:
+    """LRU de bytes comprimidos com orçamento total em bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key, data):
+        # Uma entrada grande demais expulsaria o cache inteiro
+        if len(data) > self.max_bytes // 4:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+
+class ResponseCompressor:
+    """Hook after_request que comprime as respostas conforme o Accept-Encoding."""
+
+    def __init__(self):
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 5
+        self.cache = CompressedCache(16 * 1024 * 1024)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION_ENABLED', True)
+        app.config.setdefault('COMPRESSION_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESSION_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESSION_BROTLI_QUALITY', 5)
+        app.config.setdefault('COMPRESSION_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+        if not app.config['COMPRESSION_ENABLED']:
+            return
+
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        self.gzip_level = app.config['COMPRESSION_GZIP_LEVEL']
+        self.brotli_quality = app.config['COMPRESSION_BROTLI_QUALITY']
+        self.cache = CompressedCache(app.config['COMPRESSION_CACHE_MAX_BYTES'])
+
+        app.after_request(self.compress_response)
+
+    def encodings(self):
+        """Encodings suportados, na ordem de preferência do servidor."""
+        return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+    def negotiate(self):
+        """Melhor encoding aceito pelo cliente (q > 0), ou None."""
+        accepted = request.accept_encodings
+        best, best_quality = None, 0
+        for encoding in self.encodings():
+            quality = accepted[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def compress_response(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers
+                or response.status_code < 200 or response.status_code in (204, 304)):
+            return response
+
+        # A resposta varia com o Accept-Encoding mesmo quando sai sem compressão
+        response.vary.add('Accept-Encoding')
+
+        if request.method == 'HEAD' or (response.content_length or 0) < self.min_size:
+            return response
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        cacheable = (request.method == 'GET' and response.status_code == 200
+                     and not response.cache_control.no_store)
+        if cacheable:
+            from extensions import metrics
+
+            key = (encoding, hashlib.blake2b(data, digest_size=16).digest())
+            compressed = self.cache.get(key)
+            metrics.cache('compressed_response', compressed is not None)
+            if compressed is None:
+                compressed = self.compress(data, encoding)
+                self.cache.put(key, compressed)
+        else:
+            compressed = self.compress(data, encoding)
+
+        if len(compressed) >= len(data):
+            return response
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,206 @@
+"""
+Exportação em massa do histórico de produtos (CSV, NDJSON ou Parquet).
+
+A tabela é lida em blocos de tamanho fixo por keyset (pk_product > último id
+lido), sem OFFSET e sem passar pelo identity map do ORM, e cada bloco é
+convertido e devolvido antes de ler o próximo: a memória usada depende do
+tamanho do bloco, não do tamanho do catálogo. Usado por GET /products/export
+e por flask --app app export-products.
+
+Parquet é opcional e requer pyarrow (pip install pyarrow); cada bloco vira
+um row group e as colunas de tags (texto separado por vírgula no banco)
+viram listas de strings.
+"""
+import csv
+import io
+import json
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+
+MIMETYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+COLUMNS = ('id', 'name', 'barcode', 'image_url', 'date_inserted', 'score', 'nova_group',
+           'ingredients_analysis_tags', 'labels_tags', 'allergens_tags', 'additives_tags',
+           'score_rules')
+
+TAG_COLUMNS = ('ingredients_analysis_tags', 'labels_tags', 'allergens_tags', 'additives_tags')
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def iter_chunks(chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Percorre a tabela product em ordem de id, um bloco por vez (requer app context).
+
+    Cada bloco é uma leitura curta em conexão própria: no SQLite, manter uma
+    leitura aberta durante todo o download seguraria o lock compartilhado e
+    bloquearia as escritas (e os checkpoints) até o fim da exportação.
+
+    Yields:
+        list[tuple]: Até chunk_size linhas, com os valores na ordem de COLUMNS
+    """
+    from extensions import db
+    from model.product import Product
+
+    table = Product.__table__
+    columns = [getattr(Product, name).expression for name in COLUMNS]
+    last_id = 0
+    while True:
+        with db.engine.connect() as conn:
+            rows = conn.execute(
+                db.select(*columns)
+                .where(table.c.pk_product > last_id)
+                .order_by(table.c.pk_product)
+                .limit(chunk_size)
+            ).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1][0]
+        if len(rows) < chunk_size:
+            return
+
+
+def _split_tags(value):
+    return [tag for tag in value.split(',') if tag] if value else []
+
+
+# ---------- CSV / NDJSON ----------
+
+def csv_stream(chunks):
+    """Cabeçalho e depois um pedaço de texto CSV por bloco."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    yield buffer.getvalue()
+    for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [row[:4] + (row[4].isoformat() if row[4] else None,) + row[5:] for row in rows])
+        yield buffer.getvalue()
+
+
+def ndjson_stream(chunks):
+    """Um objeto JSON por linha; tags como listas, datas em ISO 8601."""
+    tag_positions = [COLUMNS.index(name) for name in TAG_COLUMNS]
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            record = dict(zip(COLUMNS, row))
+            if record['date_inserted']:
+                record['date_inserted'] = record['date_inserted'].isoformat()
+            for position in tag_positions:
+                record[COLUMNS[position]] = _split_tags(row[position])
+            lines.append(json.dumps(record, ensure_ascii=False))
+        lines.append('')
+        yield '\n'.join(lines)
+
+
+# ---------- Parquet ----------
+
+class _StreamSink:
+    """Arquivo só de escrita que acumula os bytes até serem drenados."""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    tags = pa.list_(pa.string())
+    return pa.schema([
+        ('id', pa.int64()),
+        ('name', pa.string()),
+        ('barcode', pa.string()),
+        ('image_url', pa.string()),
+        ('date_inserted', pa.timestamp('us')),
+        ('score', pa.float64()),
+        ('nova_group', pa.int32()),
+        ('ingredients_analysis_tags', tags),
+        ('labels_tags', tags),
+        ('allergens_tags', tags),
+        ('additives_tags', tags),
+        ('score_rules', pa.int32()),
+    ])
+
+
+def parquet_stream(chunks):
+    """Bytes de um arquivo Parquet, um row group por bloco."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    tag_columns = set(TAG_COLUMNS)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in chunks:
+            arrays = []
+            for position, name in enumerate(COLUMNS):
+                values = [row[position] for row in rows]
+                if name in tag_columns:
+                    values = [_split_tags(value) for value in values]
+                arrays.append(pa.array(values, type=schema.field(name).type))
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def export_stream(fmt, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Gerador com o conteúdo da exportação no formato pedido (requer app context).
+
+    Args:
+        fmt (str): 'csv', 'ndjson' ou 'parquet'
+        chunk_size (int): Linhas lidas do banco por bloco
+
+    Returns:
+        Iterator[str | bytes]: Texto para csv/ndjson, bytes para parquet
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    chunks = iter_chunks(chunk_size)
+    if fmt == 'csv':
+        return csv_stream(chunks)
+    if fmt == 'ndjson':
+        return ndjson_stream(chunks)
+    return parquet_stream(chunks)
@@ -0,0 +1,276 @@
+"""
+Gerador de catálogo sintético para testes de escala.
+
+Preenche as tabelas product, user e comment com milhões de linhas realistas:
+tags no vocabulário do Open Food Facts, barcodes GS1 válidos (já canônicos), score
+e regras disparadas calculados pelo próprio score_breakdown e número de comentários por produto
+seguindo uma distribuição de Pareto (poucos produtos concentram a maioria).
+
+O resultado é determinístico para uma mesma --seed.
+
+Uso:
+    python -m scripts.generate_catalogue --db /tmp/catalogo.db --products 1000000
+    python -m scripts.generate_catalogue --db /tmp/catalogo.db --products 200000 \\
+        --users 50000 --comment-alpha 1.2 --seed 7
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scripts.gtin import canonical_barcode, check_digit  # noqa: E402
+from scripts.score_calculator import score_breakdown  # noqa: E402
+
+
+# ---------- Vocabulário (tags reais do Open Food Facts) ----------
+
+LABELS = [
+    ('en:organic', 0.12), ('en:eu-organic', 0.08), ('en:fair-trade', 0.04),
+    ('en:rainforest-alliance', 0.03), ('en:no-gluten', 0.10), ('en:vegetarian', 0.08),
+    ('en:vegan', 0.05), ('en:green-dot', 0.15), ('en:sustainable-palm-oil', 0.03),
+    ('en:fsc', 0.04), ('en:utz-certified', 0.02), ('en:no-preservatives', 0.06),
+    ('en:no-added-sugar', 0.05), ('en:made-in-brazil', 0.10), ('en:nutriscore', 0.20),
+]
+
+PALM_OIL = [('en:palm-oil-free', 0.55), ('en:palm-oil', 0.15),
+            ('en:may-contain-palm-oil', 0.05), ('en:palm-oil-content-unknown', 0.25)]
+VEGAN = [('en:vegan', 0.30), ('en:non-vegan', 0.45),
+         ('en:maybe-vegan', 0.10), ('en:vegan-status-unknown', 0.15)]
+VEGETARIAN = [('en:vegetarian', 0.60), ('en:non-vegetarian', 0.15),
+              ('en:maybe-vegetarian', 0.10), ('en:vegetarian-status-unknown', 0.15)]
+
+ALLERGENS = [
+    ('en:gluten', 0.35), ('en:milk', 0.35), ('en:soybeans', 0.25), ('en:eggs', 0.15),
+    ('en:nuts', 0.10), ('en:peanuts', 0.06), ('en:sesame-seeds', 0.04),
+    ('en:celery', 0.02), ('en:mustard', 0.03), ('en:fish', 0.03),
+    ('en:crustaceans', 0.01), ('en:molluscs', 0.01), ('en:lupin', 0.005),
+    ('en:sulphur-dioxide-and-sulphites', 0.04),
+]
+
+# Aditivos mais comuns ficam no começo (a escolha é ponderada pela posição)
+ADDITIVES = [
+    'en:e330', 'en:e322', 'en:e322i', 'en:e300', 'en:e471', 'en:e415', 'en:e412',
+    'en:e440', 'en:e500', 'en:e500ii', 'en:e503', 'en:e503ii', 'en:e331', 'en:e202',
+    'en:e211', 'en:e250', 'en:e621', 'en:e150d', 'en:e338', 'en:e407', 'en:e476',
+    'en:e160a', 'en:e951', 'en:e955', 'en:e950', 'en:e1422', 'en:e410', 'en:e339',
+]
+ADDITIVE_WEIGHTS = [1.0 / (rank + 1) for rank in range(len(ADDITIVES))]
+
+NOVA_GROUPS = [1, 2, 3, 4]
+NOVA_WEIGHTS = [0.15, 0.05, 0.20, 0.60]
+
+GS1_PREFIXES = ['789', '790', '300', '301', '376', '400', '440', '500', '560', '800', '840', '000']
+
+BRANDS = ['Nestlé', 'Danone', 'Ninho', 'Piracanjuba', 'Yoki', 'Camil', 'Mãe Terra',
+          'Native', 'Jasmine', 'Vitao', 'Sadia', 'Perdigão', 'Seara', 'Bauducco',
+          'Marilan', 'Italac', 'Qualy', 'Knorr', 'Hellmann\'s', 'Ferrero', 'Coca-Cola',
+          'Ambev', 'Do Bem', 'Tial', 'Fazenda Futuro', 'Taeq', 'Great Value', 'Carrefour']
+PRODUCTS = ['Biscoito', 'Achocolatado', 'Iogurte', 'Leite', 'Granola', 'Aveia em Flocos',
+            'Arroz Integral', 'Feijão Preto', 'Macarrão', 'Molho de Tomate', 'Suco de Laranja',
+            'Refrigerante', 'Chocolate', 'Barra de Cereal', 'Café Torrado', 'Margarina',
+            'Manteiga', 'Queijo', 'Pão de Forma', 'Salgadinho', 'Azeite', 'Maionese',
+            'Sorvete', 'Hambúrguer Vegetal', 'Bebida de Aveia', 'Cereal Matinal']
+VARIANTS = ['Original', 'Integral', 'Zero Açúcar', 'Light', 'Orgânico', 'Tradicional',
+            'Chocolate', 'Morango', 'Baunilha', 'Sem Lactose', 'Sem Glúten', 'Vegano',
+            'Tamanho Família', '200g', '500g', '1kg', '1L']
+
+COMMENT_TEMPLATES = [
+    'O selo {label} aparece na embalagem, mas não encontrei a certificação.',
+    'Produto gostoso, porém tem muitos aditivos.',
+    'Rótulo claro sobre a origem dos ingredientes.',
+    'Diz ser sustentável, mas a embalagem não é reciclável.',
+    'Preço justo para um produto orgânico.',
+    'Contém óleo de palma, o que não fica claro na frente do rótulo.',
+    'Compro sempre, recomendo.',
+    'Esperava mais pela propaganda de produto natural.',
+]
+
+BASE_DATE = datetime(2024, 1, 1)
+
+
+# ---------- Geradores de linhas ----------
+
+def _pick(rnd, weighted):
+    roll = rnd.random()
+    acc = 0.0
+    for tag, weight in weighted:
+        acc += weight
+        if roll < acc:
+            return tag
+    return weighted[-1][0]
+
+
+def _sample(rnd, weighted):
+    return [tag for tag, prob in weighted if rnd.random() < prob]
+
+
+def make_product(rnd, seq, date_span_days):
+    labels = _sample(rnd, LABELS)
+    analysis = [_pick(rnd, PALM_OIL), _pick(rnd, VEGAN), _pick(rnd, VEGETARIAN)]
+    allergens = _sample(rnd, ALLERGENS)
+    nova = rnd.choices(NOVA_GROUPS, NOVA_WEIGHTS)[0]
+    n_additives = 0 if nova == 1 else min(int(rnd.expovariate(0.35)), 15)
+    additives = sorted(set(rnd.choices(ADDITIVES, ADDITIVE_WEIGHTS, k=n_additives)))
+
+    off_data = {
+        'labels_tags': labels,
+        'ingredients_analysis_tags': analysis,
+        'additives_tags': additives,
+        'nova_group': nova,
+    }
+    body = rnd.choice(GS1_PREFIXES) + f'{seq:09d}'
+    barcode = canonical_barcode(body + check_digit(body))
+    score, rules = score_breakdown(off_data, nova_group=nova)
+    return {
+        'name': f'{rnd.choice(PRODUCTS)} {rnd.choice(BRANDS)} {rnd.choice(VARIANTS)}',
+        'barcode': barcode,
+        'image_url': f'https://images.openfoodfacts.net/images/products/'
+                     f'{barcode[:3]}/{barcode[3:6]}/{barcode[6:9]}/{barcode[9:]}/front_pt.400.jpg',
+        'date_inserted': BASE_DATE + timedelta(seconds=rnd.randrange(date_span_days * 86400)),
+        'score': float(score),
+        'score_rules': rules,
+        'nova_group': nova,
+        'ingredients_analysis_tags': ','.join(analysis),
+        'labels_tags': ','.join(labels),
+        'allergens_tags': ','.join(allergens),
+        'additives_tags': ','.join(additives),
+    }
+
+
+def comment_count(rnd, alpha, cap):
+    """Número de comentários de um produto: Pareto(alpha) - 1, limitado a cap."""
+    return min(int(rnd.paretovariate(alpha)) - 1, cap)
+
+
+# ---------- Inserção em lote ----------
+
+def _flush(conn, table, rows):
+    if rows:
+        conn.execute(table.insert(), rows)
+        rows.clear()
+
+
+def generate(products, users=10000, comment_alpha=1.5, max_comments=5000,
+             seed=42, batch_size=20000, date_span_days=730, log=print):
+    """
+    Gera o catálogo no banco do app atual (requer app context).
+
+    Returns:
+        dict: quantidade de linhas inseridas por tabela
+    """
+    from sqlalchemy import create_engine, func
+    from sqlalchemy.pool import NullPool
+
+    from extensions import db
+    from model.comment import Comment
+    from model.product import Product
+    from model.user import User
+
+    rnd = random.Random(seed)
+    next_product_id = (db.session.query(func.max(Product.id)).scalar() or 0) + 1
+    next_user_id = (db.session.query(func.max(User.id)).scalar() or 0) + 1
+    db.session.commit()
+
+    # Carga em massa: durabilidade relaxada em uma conexão fora do pool, que
+    # é descartada no fim; as conexões do app mantêm os PRAGMAs padrão
+    engine = create_engine(db.engine.url, poolclass=NullPool)
+    conn = engine.connect()
+    try:
+        conn.exec_driver_sql('PRAGMA synchronous = OFF')
+        conn.exec_driver_sql('PRAGMA journal_mode = MEMORY')
+
+        # Usuários
+        usernames = []
+        rows = []
+        for i in range(users):
+            uid = next_user_id + i
+            name = f'user{uid}'
+            usernames.append(name)
+            rows.append({'id': uid, 'username': name, 'email': f'{name}@example.com',
+                         'date_created': BASE_DATE + timedelta(seconds=rnd.randrange(date_span_days * 86400))})
+            if len(rows) >= batch_size:
+                _flush(conn, User.__table__, rows)
+        _flush(conn, User.__table__, rows)
+        conn.commit()
+        log(f'user: {users} linhas')
+
+        # Produtos e comentários, intercalados para não acumular tudo em memória
+        product_rows, comment_rows = [], []
+        total_comments = 0
+        started = time.perf_counter()
+        for i in range(products):
+            pk = next_product_id + i
+            row = make_product(rnd, pk, date_span_days)
+            row['pk_product'] = pk
+            product_rows.append(row)
+
+            for _ in range(comment_count(rnd, comment_alpha, max_comments)):
+                label = row['labels_tags'].split(',')[0] or 'orgânico'
+                comment_rows.append({
+                    'text': rnd.choice(COMMENT_TEMPLATES).format(label=label),
+                    'author': rnd.choice(usernames) if usernames else 'Anônimo',
+                    'n_estrela': min(5, max(0, int(rnd.gauss(row['score'] / 20, 1.2)))),
+                    'date_inserted': row['date_inserted'] + timedelta(days=rnd.randrange(1, 365)),
+                    'product_id': pk,
+                })
+
+            if len(product_rows) >= batch_size:
+                _flush(conn, Product.__table__, product_rows)
+                conn.commit()
+                log(f'product: {i + 1}/{products} ({(i + 1) / (time.perf_counter() - started):.0f} linhas/s)')
+            if len(comment_rows) >= batch_size:
+                total_comments += len(comment_rows)
+                _flush(conn, Comment.__table__, comment_rows)
+
+        _flush(conn, Product.__table__, product_rows)
+        total_comments += len(comment_rows)
+        _flush(conn, Comment.__table__, comment_rows)
+        conn.commit()
+    finally:
+        conn.close()
+        engine.dispose()
+    log(f'product: {products} linhas, comment: {total_comments} linhas')
+
+    # A carga em Core não passa pelo listener da sessão: recalcula o resumo
+    from extensions import stats
+    if stats.enabled:
+        stats.reconcile(log)
+
+    return {'product': products, 'user': users, 'comment': total_comments}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Gera um catálogo sintético para testes de escala.')
+    parser.add_argument('--db', required=True,
+                        help='Arquivo SQLite de destino (criado se não existir).')
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--comment-alpha', type=float, default=1.5,
+                        help='Parâmetro da Pareto para comentários por produto (menor = mais concentrado).')
+    parser.add_argument('--max-comments', type=int, default=5000,
+                        help='Limite de comentários de um único produto.')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=20000)
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    from scripts.migrations import migrate
+
+    db_path = os.path.abspath(args.db)
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}'})
+    started = time.perf_counter()
+    with app.app_context():
+        migrate()
+        counts = generate(args.products, args.users, args.comment_alpha,
+                          args.max_comments, args.seed, args.batch_size)
+    print(f'{counts} em {time.perf_counter() - started:.1f}s -> {db_path}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Canonicalização de códigos de barras GS1 (EAN-8, UPC-A, EAN-13, GTIN-14).
+
+Todos esses formatos são o mesmo número GTIN-14 com zeros à esquerda, então
+"0789..." (EAN-13) e "789..." (UPC-A) identificam o mesmo produto. A chave
+canônica segue a normalização do Open Food Facts: o GTIN sem zeros à
+esquerda, completado com zeros até 8 dígitos (EAN-8) ou 13 dígitos
+(EAN-13); GTIN-14 que não começam com zero ficam com 14 dígitos.
+"""
+import re
+
+VALID_LENGTHS = (8, 12, 13, 14)
+
+_SEPARATORS = re.compile(r'[\s\-.]')
+
+
+class InvalidBarcodeError(ValueError):
+    """Código de barras com formato ou dígito verificador inválido."""
+
+
+def check_digit(body):
+    """Dígito verificador GS1 para os dígitos de `body` (sem o verificador)."""
+    # Da direita para a esquerda, os pesos alternam 3, 1, 3, 1...
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return str((10 - total % 10) % 10)
+
+
+def is_valid_gtin(code):
+    return (code.isdigit() and len(code) in VALID_LENGTHS
+            and check_digit(code[:-1]) == code[-1])
+
+
+def canonical_barcode(raw):
+    """
+    Valida e normaliza um código de barras para a chave canônica.
+
+    Args:
+        raw (str): Código lido (aceita espaços e hífens)
+
+    Returns:
+        str: Código canônico (8, 13 ou 14 dígitos)
+
+    Raises:
+        InvalidBarcodeError: Se não for um GTIN válido
+    """
+    code = _SEPARATORS.sub('', str(raw))
+    if not code.isdigit():
+        raise InvalidBarcodeError(f"Barcode must contain only digits: {raw!r}")
+    if len(code) not in VALID_LENGTHS:
+        raise InvalidBarcodeError(
+            f"Barcode must have 8, 12, 13 or 14 digits, got {len(code)}: {raw!r}")
+    if check_digit(code[:-1]) != code[-1]:
+        raise InvalidBarcodeError(f"Invalid GS1 check digit: {raw!r}")
+
+    stripped = code.lstrip('0')
+    if len(stripped) <= 8:
+        return stripped.zfill(8)
+    return stripped.zfill(13)
+
+
+def lookup_key(raw):
+    """
+    Chave para consultas de leitura: a forma canônica quando o código é
+    válido, senão o próprio texto (registros antigos com códigos fora do padrão).
+    """
+    try:
+        return canonical_barcode(raw)
+    except InvalidBarcodeError:
+        return str(raw).strip()
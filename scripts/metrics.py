@@ -0,0 +1,275 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# Buckets (em segundos) adequados para latências de API web
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Buckets para contagem de queries SQL por requisição
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100, 250)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    body = ','.join(
+        '{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """
+    Família de métricas com labels. Cada combinação de valores de labels
+    guarda seu próprio estado, protegido pelo lock do registro.
+    """
+
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames, lock):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = lock
+        self._children = {}
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f"{self.name} espera labels {self.labelnames}, recebeu {labels}")
+        return tuple(str(v) for v in labels)
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, *labels):
+        return self._children.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in sorted(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+
+    def set(self, value, *labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = value
+
+    def inc(self, *labels, amount=1):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0) + amount
+
+    def value(self, *labels):
+        return self._children.get(self._key(labels), 0)
+
+    def samples(self):
+        for key, value in sorted(self._children.items()):
+            yield self.name, _format_labels(self.labelnames, key), value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames, lock, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames, lock)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        key = self._key(labels)
+        # bisect_left: o valor cai no primeiro bucket com limite >= valor
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                # [contagens por bucket (+Inf no fim), soma, total]
+                child = self._children[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            child[0][idx] += 1
+            child[1] += value
+            child[2] += 1
+
+    def count(self, *labels):
+        child = self._children.get(self._key(labels))
+        return child[2] if child else 0
+
+    def samples(self):
+        for key, (counts, total, n) in sorted(self._children.items()):
+            cumulative = 0
+            for bound, c in zip(self.buckets + (float('inf'),), counts):
+                cumulative += c
+                yield (self.name + '_bucket',
+                       _format_labels(self.labelnames, key, ('le', _format_value(float(bound)))),
+                       cumulative)
+            yield self.name + '_sum', _format_labels(self.labelnames, key), total
+            yield self.name + '_count', _format_labels(self.labelnames, key), n
+
+
+class Metrics:
+    """
+    Registro de métricas da aplicação, exposto em formato Prometheus no
+    endpoint /metrics.
+
+    Segue o padrão das extensões Flask (ver extensions.py): a instância é
+    criada globalmente e ligada ao app com init_app(app).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._families = {}
+
+        self.http_latency = self.histogram(
+            'http_request_duration_seconds',
+            'Latência das requisições HTTP por endpoint.',
+            ('endpoint', 'method', 'status'))
+        self.sql_queries = self.histogram(
+            'http_request_sql_queries',
+            'Quantidade de queries SQL executadas por requisição.',
+            ('endpoint',), buckets=COUNT_BUCKETS)
+        self.sql_seconds = self.histogram(
+            'http_request_sql_duration_seconds',
+            'Tempo total gasto em SQL por requisição.',
+            ('endpoint',))
+        self.off_latency = self.histogram(
+            'off_request_duration_seconds',
+            'Latência das chamadas à API do Open Food Facts.',
+            ('status',))
+        self.scoring_seconds = self.histogram(
+            'scoring_duration_seconds',
+            'Tempo gasto em calculate_score.')
+        self.cache_requests = self.counter(
+            'cache_requests_total',
+            'Consultas a caches da aplicação, por resultado (hit/miss).',
+            ('cache', 'result'))
+
+    # ---------- Registro ----------
+
+    def _register(self, cls, name, documentation, labelnames, **kwargs):
+        with self._lock:
+            if name in self._families:
+                return self._families[name]
+            metric = cls(name, documentation, labelnames, self._lock, **kwargs)
+            self._families[name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    # ---------- Atalhos de instrumentação ----------
+
+    def cache(self, name, hit):
+        """Registra um acesso a cache (hit=True/False)."""
+        self.cache_requests.inc(name, 'hit' if hit else 'miss')
+
+    def render(self):
+        """Gera o texto no formato de exposição do Prometheus (0.0.4)."""
+        lines = []
+        with self._lock:
+            families = list(self._families.values())
+            for metric in families:
+                lines.append(f'# HELP {metric.name} {metric.documentation}')
+                lines.append(f'# TYPE {metric.name} {metric.type_name}')
+                for sample_name, labels, value in list(metric.samples()):
+                    lines.append(f'{sample_name}{labels} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    # ---------- Integração com Flask / SQLAlchemy ----------
+
+    def init_app(self, app):
+        """
+        Registra os hooks de requisição, os listeners de SQL e a rota /metrics.
+        Desativado com METRICS_ENABLED = False.
+        """
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        _listen_sql()
+
+        @app.before_request
+        def _metrics_start():
+            g._metrics_start = time.perf_counter()
+            g._sql_count = 0
+            g._sql_time = 0.0
+
+        @app.after_request
+        def _metrics_record(response):
+            start = g.pop('_metrics_start', None)
+            if start is None:
+                return response
+            endpoint = request.endpoint or 'unmatched'
+            self.http_latency.observe(time.perf_counter() - start,
+                                      endpoint, request.method, response.status_code)
+            self.sql_queries.observe(g.get('_sql_count', 0), endpoint)
+            self.sql_seconds.observe(g.get('_sql_time', 0.0), endpoint)
+            return response
+
+        def metrics_endpoint():
+            return Response(self.render(),
+                            mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+        app.add_url_rule('/metrics', 'metrics', metrics_endpoint, methods=['GET'])
+
+
+# ---------- Listeners SQL (registrados uma única vez por processo) ----------
+
+_sql_listening = False
+
+
+# O início fica no contexto de execução, e não na conexão do pool: uma
+# instrução que falha não chega a after_cursor_execute, e o contexto dela é
+# descartado junto em vez de deixar um início órfão para a próxima consulta.
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_metrics_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    if has_request_context() and '_sql_count' in g:
+        g._sql_count += 1
+        g._sql_time += elapsed
+
+
+def _listen_sql():
+    global _sql_listening
+    if _sql_listening:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    _sql_listening = True
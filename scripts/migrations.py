@@ -0,0 +1,243 @@
+"""
+Criação e evolução do schema do banco.
+
+O schema não é mais criado a cada boot do app: rode explicitamente
+
+    flask --app app migrate
+
+O comando cria as tabelas que ainda não existem (db.create_all) e aplica,
+em ordem, as migrações registradas com @migration que ainda não rodaram.
+A versão aplicada fica em PRAGMA user_version do SQLite. Um banco vazio
+já nasce com o schema atual dos modelos e é marcado com a última versão,
+então as migrações só rodam em bancos criados antes delas.
+
+Migrações já publicadas não são reescritas. Como as mais antigas usam o
+ORM, colunas anuláveis novas dos modelos são adicionadas (vazias) antes de
+as migrações rodarem; preenchê-las e criar os índices delas fica a cargo de
+uma migração numerada nova.
+"""
+from sqlalchemy import inspect, text
+
+from extensions import db
+
+# Lista ordenada de (versão, descrição, função)
+MIGRATIONS = []
+
+
+def migration(version, description):
+    """Registra uma migração. As versões devem ser inteiros crescentes."""
+    def decorator(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def current_version():
+    return db.session.execute(text('PRAGMA user_version')).scalar() or 0
+
+
+def stamp(version):
+    db.session.execute(text(f'PRAGMA user_version = {int(version)}'))
+    db.session.commit()
+
+
+def add_missing_columns(log=print):
+    """
+    ALTER TABLE ADD COLUMN para colunas anuláveis dos modelos que ainda não
+    existem nas tabelas do banco (sem dados nem índices).
+    """
+    conn = db.session.connection()
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            log(f'Adicionando coluna {table.name}.{column.name}')
+            conn.exec_driver_sql(
+                f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+    db.session.commit()
+
+
+def migrate(log=print):
+    """
+    Cria as tabelas faltantes e aplica as migrações pendentes (requer app context).
+
+    Returns:
+        int: Versão do schema após a execução
+    """
+    # Garante que todos os modelos estejam registrados no metadata
+    import model.product  # noqa: F401
+    import model.comment  # noqa: F401
+    import model.user  # noqa: F401
+    import model.stats  # noqa: F401
+    import model.scan  # noqa: F401
+    import model.snapshot  # noqa: F401
+
+    fresh = not inspect(db.engine).get_table_names()
+    db.create_all()
+
+    if fresh and MIGRATIONS:
+        stamp(MIGRATIONS[-1][0])
+    else:
+        add_missing_columns(log)
+
+    version = current_version()
+    for number, description, fn in MIGRATIONS:
+        if number <= version:
+            continue
+        log(f'Aplicando migração {number}: {description}')
+        try:
+            fn()
+            stamp(number)
+        except Exception:
+            db.session.rollback()
+            raise
+        version = number
+
+    log(f'Schema na versão {version}')
+    return version
+
+
+# ---------- Migrações ----------
+
+@migration(1, 'canonicaliza barcodes e mescla produtos duplicados')
+def canonicalize_barcodes():
+    """
+    Converte os barcodes para a forma canônica (scripts/gtin.py). Produtos que
+    passam a ter o mesmo código são mesclados no mais antigo: os comentários
+    são transferidos e os campos vazios preenchidos pelos duplicados.
+    Códigos inválidos (sem dígito verificador GS1 correto) ficam como estão.
+    """
+    from model.comment import Comment
+    from model.product import Product
+    from scripts.gtin import InvalidBarcodeError, canonical_barcode
+
+    groups = {}
+    for product_id, barcode in db.session.query(Product.id, Product.barcode).order_by(Product.id):
+        if barcode is None:
+            continue
+        try:
+            key = canonical_barcode(barcode)
+        except InvalidBarcodeError:
+            continue
+        groups.setdefault(key, []).append(product_id)
+
+    merged_fields = ('name', 'image_url', 'score', 'nova_group', 'ingredients_analysis_tags',
+                     'labels_tags', 'allergens_tags', 'additives_tags')
+    for key, ids in groups.items():
+        keep = db.session.get(Product, ids[0])
+        for duplicate_id in ids[1:]:
+            duplicate = db.session.get(Product, duplicate_id)
+            for field in merged_fields:
+                if getattr(keep, field) in (None, '') and getattr(duplicate, field) not in (None, ''):
+                    setattr(keep, field, getattr(duplicate, field))
+            Comment.query.filter_by(product_id=duplicate_id).update(
+                {'product_id': keep.id}, synchronize_session=False)
+            db.session.delete(duplicate)
+        # Remove os duplicados antes de gravar a chave canônica (barcode é UNIQUE)
+        db.session.flush()
+        keep.barcode = key
+    db.session.flush()
+
+
+@migration(2, 'índices do ranking de produtos por score')
+def ranking_indexes():
+    from model.product import Product
+
+    for index in Product.__table__.indexes:
+        index.create(bind=db.session.connection(), checkfirst=True)
+
+
+@migration(3, 'coluna score_rules (regras do score em bitmask) com índice')
+def score_rules_column():
+    """
+    Adiciona Product.score_rules e preenche a partir das tags já gravadas,
+    com o mesmo cálculo do score (score_breakdown). O score em si não muda.
+    """
+    from model.product import Product
+    from scripts.score_calculator import score_breakdown
+
+    conn = db.session.connection()
+    columns = {column['name'] for column in inspect(conn).get_columns('product')}
+    if 'score_rules' not in columns:
+        conn.exec_driver_sql('ALTER TABLE product ADD COLUMN score_rules INTEGER')
+
+    def tags(value):
+        return [tag for tag in value.split(',') if tag] if value else []
+
+    table = Product.__table__
+    rows = conn.execute(db.select(
+        table.c.pk_product, table.c.nova_group, table.c.labels_tags,
+        table.c.ingredients_analysis_tags, table.c.additives_tags)).all()
+    updates = []
+    for product_id, nova, labels, analysis, additives in rows:
+        _, rules = score_breakdown({
+            'labels_tags': tags(labels),
+            'ingredients_analysis_tags': tags(analysis),
+            'additives_tags': tags(additives),
+        }, nova_group=nova)
+        updates.append({'product_id': product_id, 'rules': rules})
+    if updates:
+        conn.execute(
+            table.update().where(table.c.pk_product == db.bindparam('product_id'))
+            .values(score_rules=db.bindparam('rules')), updates)
+
+    for index in table.indexes:
+        if index.name == 'ix_product_rules_score_id':
+            index.create(bind=conn, checkfirst=True)
+
+
+@migration(4, 'tabela de resumo das estatísticas do catálogo (stat_counter)')
+def stat_counter_table():
+    """Cria stat_counter (se o create_all ainda não criou) e a preenche do zero."""
+    from extensions import stats
+    from model.stats import StatCounter
+
+    StatCounter.__table__.create(bind=db.session.connection(), checkfirst=True)
+    # reconcile usa a própria conexão: a criação da tabela precisa estar gravada
+    db.session.commit()
+    stats.reconcile()
+
+
+@migration(5, 'índice (ts, product_id) de scan_event para produtos populares')
+def scan_event_ts_index():
+    from model.scan import ScanEvent
+
+    for index in ScanEvent.__table__.indexes:
+        index.create(bind=db.session.connection(), checkfirst=True)
+
+
+@migration(6, 'chave de product com AUTOINCREMENT (ids removidos não são reutilizados)')
+def product_autoincrement():
+    """
+    Recria product com AUTOINCREMENT. Sem ele o SQLite reutiliza o maior id
+    depois que o produto dele é removido, e os índices em memória, que
+    incorporam produtos novos pelo maior id, manteriam os dados do antigo.
+    O SQLite não altera a chave de uma tabela existente: cria a nova, copia
+    as linhas (com os mesmos ids), remove a antiga e renomeia.
+    """
+    from sqlalchemy.schema import CreateTable
+
+    from model.product import Product
+
+    conn = db.session.connection()
+    current = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'product'").scalar()
+    if 'AUTOINCREMENT' in current.upper():
+        return
+
+    table = Product.__table__
+    create = str(CreateTable(table).compile(dialect=conn.dialect))
+    conn.exec_driver_sql(create.replace('CREATE TABLE product ', 'CREATE TABLE product_new ', 1))
+    columns = ', '.join(column.name for column in table.columns)
+    conn.exec_driver_sql(f'INSERT INTO product_new ({columns}) SELECT {columns} FROM product')
+    conn.exec_driver_sql('DROP TABLE product')
+    conn.exec_driver_sql('ALTER TABLE product_new RENAME TO product')
+    for index in table.indexes:
+        index.create(bind=conn, checkfirst=True)
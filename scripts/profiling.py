@@ -0,0 +1,133 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestProfiler:
+    """
+    Profiling opcional por requisição.
+
+    Só é ativado quando PROFILING_ENABLED = True na config E a requisição
+    pede explicitamente (header X-Profile: 1 ou ?profile=1). Para cada
+    requisição perfilada são gravados no diretório PROFILING_DIR:
+
+    - <id>.pstats: saída do cProfile (abre com snakeviz, flameprof, pstats)
+    - <id>.sql.json: statements SQL executados, com parâmetros e tempos
+
+    O diretório é limitado a PROFILING_MAX_FILES perfis; os mais antigos são
+    removidos. Com o profiling desativado nenhum hook é registrado, então o
+    custo em scan_product e nas demais rotas é zero.
+    """
+
+    HEADER = 'X-Profile'
+    QUERY_PARAM = 'profile'
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sql_listening = False
+        self.directory = None
+        self.max_files = 50
+
+    def init_app(self, app):
+        app.config.setdefault('PROFILING_ENABLED', False)
+        app.config.setdefault('PROFILING_DIR', os.path.join(app.instance_path, 'profiles'))
+        app.config.setdefault('PROFILING_MAX_FILES', 50)
+        if not app.config['PROFILING_ENABLED']:
+            return
+
+        self.directory = app.config['PROFILING_DIR']
+        self.max_files = app.config['PROFILING_MAX_FILES']
+        os.makedirs(self.directory, exist_ok=True)
+        self._listen_sql()
+
+        @app.before_request
+        def _profile_start():
+            if not self._requested():
+                return
+            g._profile_sql = []
+            g._profile_started = time.perf_counter()
+            g._profiler = cProfile.Profile()
+            g._profiler.enable()
+
+        @app.after_request
+        def _profile_stop(response):
+            profiler = g.pop('_profiler', None)
+            if profiler is None:
+                return response
+            profiler.disable()
+            elapsed = time.perf_counter() - g.pop('_profile_started')
+            profile_id = self._save(profiler, g.pop('_profile_sql', []), elapsed,
+                                    response.status_code)
+            response.headers['X-Profile-Id'] = profile_id
+            return response
+
+    def _requested(self):
+        return (request.headers.get(self.HEADER) == '1'
+                or request.args.get(self.QUERY_PARAM) == '1')
+
+    # ---------- Persistência ----------
+
+    def _save(self, profiler, sql_log, elapsed, status):
+        endpoint = (request.endpoint or 'unmatched').replace('.', '_')
+        profile_id = '{}-{}-{}ms'.format(
+            datetime.now().strftime('%Y%m%dT%H%M%S%f'), endpoint, int(elapsed * 1000))
+        base = os.path.join(self.directory, profile_id)
+
+        profiler.dump_stats(base + '.pstats')
+        with open(base + '.sql.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'method': request.method,
+                'path': request.full_path,
+                'status': status,
+                'elapsed_ms': round(elapsed * 1000, 3),
+                'sql_total_ms': round(sum(q['ms'] for q in sql_log), 3),
+                'queries': sql_log,
+            }, f, ensure_ascii=False, indent=2)
+
+        self._rotate()
+        return profile_id
+
+    def _rotate(self):
+        """Mantém no máximo max_files perfis, removendo os mais antigos."""
+        with self._lock:
+            profiles = sorted(name[:-len('.pstats')] for name in os.listdir(self.directory)
+                              if name.endswith('.pstats'))
+            for old in profiles[:max(0, len(profiles) - self.max_files)]:
+                for suffix in ('.pstats', '.sql.json'):
+                    try:
+                        os.remove(os.path.join(self.directory, old + suffix))
+                    except FileNotFoundError:
+                        pass
+
+    # ---------- SQL ----------
+
+    def _listen_sql(self):
+        if self._sql_listening:
+            return
+
+        def before(conn, cursor, statement, parameters, context, executemany):
+            if has_request_context() and '_profile_sql' in g:
+                conn.info.setdefault('_profile_start', []).append(time.perf_counter())
+
+        def after(conn, cursor, statement, parameters, context, executemany):
+            if not (has_request_context() and '_profile_sql' in g):
+                return
+            stack = conn.info.get('_profile_start')
+            if not stack:
+                return
+            g._profile_sql.append({
+                'statement': statement,
+                'parameters': repr(parameters),
+                'ms': round((time.perf_counter() - stack.pop()) * 1000, 3),
+            })
+
+        event.listen(Engine, 'before_cursor_execute', before)
+        event.listen(Engine, 'after_cursor_execute', after)
+        self._sql_listening = True
@@ -0,0 +1,366 @@
+"""
+Histórico de scans por usuário e popularidade dos produtos (scan_event).
+
+Cada POST /product/scan que encontra ou cria um produto registra um evento
+(user_id, product_id, ts). O registro só coloca o evento em uma fila em
+memória: uma thread o grava junto com os demais em uma única transação a
+cada SCAN_LOG_MAX_BATCH eventos ou SCAN_LOG_MAX_DELAY_MS, então o scan não
+ganha nenhum commit. Com a fila cheia (SCAN_LOG_MAX_PENDING) o evento é
+descartado e contado em dropped: o log nunca atrasa nem derruba o scan.
+
+Retenção: eventos mais antigos que SCAN_LOG_RETENTION_DAYS são somados em
+scan_daily (produto, dia) e apagados, a cada SCAN_LOG_COMPACT_INTERVAL
+segundos e com flask --app app compact-scans. O histórico por usuário cobre
+a janela de retenção; a popularidade soma eventos e contadores diários.
+"""
+import atexit
+import base64
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from datetime import date, datetime, timedelta
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+_STOP = object()
+
+
+def encode_cursor(ts, scan_id):
+    raw = json.dumps([ts.isoformat(), scan_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Returns:
+        tuple[datetime, int]: (ts, id) do último scan da página anterior
+
+    Raises:
+        ValueError: Se o cursor estiver malformado
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        ts, scan_id = json.loads(raw)
+        return datetime.fromisoformat(ts), int(scan_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def window_start(days):
+    """Início (meia-noite) da janela dos últimos `days` dias, hoje incluído."""
+    first_day = date.today() - timedelta(days=days - 1)
+    return datetime.combine(first_day, datetime.min.time())
+
+
+class ScanLog:
+    """Appender em lote de scan_event, retenção e consultas de histórico."""
+
+    def __init__(self):
+        self.enabled = False
+        self.max_batch = 1000
+        self.max_delay = 0.2
+        self.retention_days = 90
+        self.interval = 0
+        self._app = None
+        self._queue = None
+        self._thread = None
+        self._timer = None
+        self._exit_hook = False
+        self._lock = threading.Lock()
+        self.stats = {'recorded': 0, 'written': 0, 'dropped': 0, 'batches': 0}
+
+    def init_app(self, app):
+        app.config.setdefault('SCAN_LOG_ENABLED', True)
+        app.config.setdefault('SCAN_LOG_MAX_BATCH', 1000)
+        app.config.setdefault('SCAN_LOG_MAX_DELAY_MS', 200)
+        app.config.setdefault('SCAN_LOG_MAX_PENDING', 50000)
+        app.config.setdefault('SCAN_LOG_RETENTION_DAYS', 90)
+        app.config.setdefault('SCAN_LOG_COMPACT_INTERVAL', 24 * 3600)
+
+        # Um app anterior (ex.: benchmarks) pode ter deixado a thread rodando
+        self.stop()
+        self.enabled = app.config['SCAN_LOG_ENABLED']
+        self.max_batch = app.config['SCAN_LOG_MAX_BATCH']
+        self.max_delay = app.config['SCAN_LOG_MAX_DELAY_MS'] / 1000.0
+        self.retention_days = app.config['SCAN_LOG_RETENTION_DAYS']
+        self.interval = app.config['SCAN_LOG_COMPACT_INTERVAL']
+        self._app = app
+        self._queue = queue.Queue(maxsize=app.config['SCAN_LOG_MAX_PENDING'])
+        if self.enabled:
+            self._schedule()
+
+    # ---------- Appender ----------
+
+    def record(self, user_id, product_id, ts=None):
+        """
+        Enfileira um scan (não bloqueia e não acessa o banco).
+
+        Args:
+            user_id (int | None): Usuário informado no scan
+            product_id (int): Produto encontrado ou criado
+            ts (datetime | None): Momento do scan (agora, se omitido)
+
+        Returns:
+            bool: False se o log estiver desligado ou a fila cheia
+        """
+        if not self.enabled:
+            return False
+        self._ensure_started()
+        event = {'user_id': user_id, 'product_id': product_id, 'ts': ts or datetime.now()}
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            with self._lock:
+                self.stats['dropped'] += 1
+            return False
+        with self._lock:
+            self.stats['recorded'] += 1
+        return True
+
+    def pending(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self, timeout=None):
+        """Espera até todos os eventos já enfileirados estarem gravados."""
+        if self._thread is None:
+            return True
+        marker = Future()
+        self._queue.put(marker)
+        try:
+            marker.result(timeout)
+        except FutureTimeoutError:
+            return False
+        return True
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._app, self._queue),
+                    name='scan-log-writer', daemon=True)
+                self._thread.start()
+                if not self._exit_hook:
+                    atexit.register(self.stop)
+                    self._exit_hook = True
+
+    def stop(self, timeout=10.0):
+        """Grava o que estiver na fila e encerra a thread e a retenção periódica."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _run(self, app, source):
+        with app.app_context():
+            while True:
+                item = source.get()
+                if item is _STOP:
+                    return
+                batch, markers = [], []
+                deadline = time.monotonic() + self.max_delay
+                stop = False
+                while True:
+                    if item is _STOP:
+                        stop = True
+                        break
+                    if isinstance(item, Future):
+                        markers.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.max_batch:
+                        break
+                    remaining = deadline - time.monotonic()
+                    try:
+                        item = source.get(timeout=remaining) if remaining > 0 else source.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    self._write(app, batch)
+                for marker in markers:
+                    marker.set_result(None)
+                if stop:
+                    return
+
+    def _write(self, app, batch):
+        from extensions import db
+        from model.scan import ScanEvent
+
+        try:
+            with db.engine.connect() as conn:
+                conn.execute(db.insert(ScanEvent.__table__), batch)
+                conn.commit()
+        except Exception as e:
+            app.logger.warning(f'Falha ao gravar {len(batch)} eventos de scan: {e}')
+            with self._lock:
+                self.stats['dropped'] += len(batch)
+            return
+        with self._lock:
+            self.stats['written'] += len(batch)
+            self.stats['batches'] += 1
+
+    # ---------- Retenção ----------
+
+    def compact(self, retention_days=None, chunk_size=50000, log=None):
+        """
+        Consolida em scan_daily os eventos mais antigos que a retenção e os apaga.
+
+        Percorre scan_event em ordem de id (que acompanha ts) em blocos de
+        chunk_size, com um commit por bloco: o lock de escrita fica preso por
+        pouco tempo e o appender continua gravando entre os blocos.
+
+        Returns:
+            int: Quantidade de eventos consolidados
+        """
+        from extensions import db
+        from model.scan import ScanDaily, ScanEvent
+
+        days = retention_days if retention_days is not None else self.retention_days
+        cutoff = window_start(days)
+        events = ScanEvent.__table__
+        daily = ScanDaily.__table__
+        day = db.func.date(events.c.ts)
+
+        upsert = sqlite_insert(daily)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=['product_id', 'day'],
+            set_={'count': daily.c['count'] + upsert.excluded['count']})
+
+        total = 0
+        with db.engine.connect() as conn:
+            while True:
+                ids = conn.execute(
+                    db.select(events.c.pk_scan).order_by(events.c.pk_scan).limit(chunk_size)
+                    .where(events.c.ts < cutoff)).scalars().all()
+                if not ids:
+                    break
+                in_chunk = db.and_(events.c.pk_scan.between(ids[0], ids[-1]),
+                                   events.c.ts < cutoff)
+                rows = conn.execute(
+                    db.select(events.c.product_id, day, db.func.count())
+                    .where(in_chunk).group_by(events.c.product_id, day)).all()
+                conn.execute(upsert, [
+                    {'product_id': product_id, 'day': date.fromisoformat(value), 'count': count}
+                    for product_id, value, count in rows])
+                total += conn.execute(events.delete().where(in_chunk)).rowcount
+                conn.commit()
+                if len(ids) < chunk_size:
+                    break
+
+        if log:
+            log(f'{total} eventos de scan anteriores a {cutoff.date()} consolidados por dia')
+        return total
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.interval and self.interval > 0:
+            self._timer = threading.Timer(self.interval, self._periodic_compact)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _periodic_compact(self):
+        app = self._app
+        try:
+            with app.app_context():
+                self.compact()
+        except Exception as e:
+            app.logger.warning(f'Falha na retenção de scan_event: {e}')
+        finally:
+            self._schedule()
+
+    # ---------- Consultas ----------
+
+    def history(self, user_id, limit=20, after=None):
+        """
+        Página do histórico de scans do usuário, do mais recente ao mais antigo,
+        por keyset em (ts, id) no índice (user_id, ts).
+
+        Args:
+            after (tuple[datetime, int] | None): (ts, id) do último item da página anterior
+
+        Returns:
+            tuple[list, str | None]: Linhas (id, ts, product_id) e o cursor da próxima página
+        """
+        from extensions import db
+        from model.scan import ScanEvent
+
+        query = db.select(ScanEvent.id, ScanEvent.ts, ScanEvent.product_id).where(
+            ScanEvent.user_id == user_id)
+        if after is not None:
+            ts, scan_id = after
+            query = query.where(db.or_(
+                ScanEvent.ts < ts, db.and_(ScanEvent.ts == ts, ScanEvent.id < scan_id)))
+        rows = db.session.execute(
+            query.order_by(ScanEvent.ts.desc(), ScanEvent.id.desc()).limit(limit + 1)).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return rows, (encode_cursor(rows[-1].ts, rows[-1].id) if has_more else None)
+
+    def _counts(self, days, product_id=None):
+        """Subquery (product_id, day, scans) unindo eventos e contadores diários."""
+        from extensions import db
+        from model.scan import ScanDaily, ScanEvent
+
+        since = window_start(days)
+        recent = db.select(
+            ScanEvent.product_id, db.func.date(ScanEvent.ts).label('day'),
+            db.func.count().label('scans')
+        ).where(ScanEvent.ts >= since)
+        older = db.select(
+            ScanDaily.product_id, db.func.date(ScanDaily.day).label('day'),
+            ScanDaily.count.label('scans')
+        ).where(ScanDaily.day >= since.date())
+        group = ScanEvent.product_id
+        if product_id is not None:
+            recent = recent.where(ScanEvent.product_id == product_id)
+            older = older.where(ScanDaily.product_id == product_id)
+        else:
+            # Só a janela de tempo filtra: agrupando pela coluna pura, o
+            # planner do SQLite varre o índice (product_id, ts) inteiro; com
+            # "+ 0" ele faz uma busca por faixa em (ts, product_id)
+            group = ScanEvent.product_id + db.literal_column('0')
+        recent = recent.group_by(group, db.func.date(ScanEvent.ts))
+        return db.union_all(recent, older).subquery()
+
+    def popular(self, days=7, limit=10):
+        """
+        Produtos mais escaneados nos últimos `days` dias.
+
+        Returns:
+            list[tuple[int, int]]: (product_id, scans) de produtos ainda no catálogo
+        """
+        from extensions import db
+        from model.product import Product
+
+        counts = self._counts(days)
+        scans = db.func.sum(counts.c.scans).label('scans')
+        product = Product.__table__
+        return db.session.execute(
+            db.select(counts.c.product_id, scans)
+            .join(product, product.c.pk_product == counts.c.product_id)
+            .group_by(counts.c.product_id)
+            .order_by(scans.desc(), counts.c.product_id)
+            .limit(limit)).all()
+
+    def daily_scans(self, product_id, days=30):
+        """
+        Scans por dia de um produto nos últimos `days` dias.
+
+        Returns:
+            list[tuple[str, int]]: (dia em ISO 8601, scans), só dias com scans
+        """
+        from extensions import db
+
+        counts = self._counts(days, product_id)
+        return db.session.execute(
+            db.select(counts.c.day, db.func.sum(counts.c.scans))
+            .group_by(counts.c.day).order_by(counts.c.day)).all()
@@ -0,0 +1,210 @@
+"""
+Spool local de leituras do scanner e envio em segundo plano para a API.
+
+Cada código decodificado é gravado em um arquivo SQLite local (append-only)
+antes de qualquer acesso à rede, então o loop da câmera nunca espera pela
+API. Uma thread de envio drena o spool em lotes para POST /product/scan,
+com sessão HTTP keep-alive, concorrência limitada e novas tentativas com
+backoff exponencial. Leituras feitas com a API fora do ar ficam no spool e
+são reenviadas quando ela volta (inclusive depois de reiniciar o scanner).
+"""
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PENDING = 'pending'
+SENT = 'sent'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    barcode TEXT NOT NULL,
+    code_type TEXT,
+    user_id INTEGER,
+    scanned_at REAL NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS ix_spool_status_next ON spool (status, next_attempt_at);
+"""
+
+
+class ScanSpool:
+    """Fila persistente de leituras em SQLite (segura para várias threads)."""
+
+    def __init__(self, path='scan_spool.db'):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode = WAL')
+        self._conn.execute('PRAGMA synchronous = NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.has_work = threading.Event()
+        self.has_work.set()
+
+    def append(self, barcode, code_type=None, user_id=None):
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO spool (barcode, code_type, user_id, scanned_at) VALUES (?, ?, ?, ?)',
+                (barcode, code_type, user_id, time.time()))
+        self.has_work.set()
+
+    def due(self, limit, now=None):
+        """Leituras pendentes cuja próxima tentativa já venceu, na ordem de leitura."""
+        now = time.time() if now is None else now
+        with self._lock:
+            return self._conn.execute(
+                'SELECT id, barcode, user_id, attempts FROM spool '
+                'WHERE status = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?',
+                (PENDING, now, limit)).fetchall()
+
+    def next_due_at(self):
+        with self._lock:
+            return self._conn.execute(
+                'SELECT MIN(next_attempt_at) FROM spool WHERE status = ?',
+                (PENDING,)).fetchone()[0]
+
+    def mark_sent(self, entry_id):
+        with self._lock:
+            self._conn.execute('UPDATE spool SET status = ?, sent_at = ? WHERE id = ?',
+                               (SENT, time.time(), entry_id))
+
+    def mark_retry(self, entry_id, error, next_attempt_at):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE spool SET attempts = attempts + 1, last_error = ?, next_attempt_at = ? '
+                'WHERE id = ?', (error, next_attempt_at, entry_id))
+
+    def mark_dead(self, entry_id, error):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE spool SET status = ?, attempts = attempts + 1, last_error = ? WHERE id = ?',
+                (DEAD, error, entry_id))
+
+    def counts(self):
+        with self._lock:
+            return dict(self._conn.execute('SELECT status, COUNT(*) FROM spool GROUP BY status'))
+
+    def purge_sent(self, older_than_s=86400):
+        """Remove leituras já enviadas há mais de older_than_s segundos."""
+        with self._lock:
+            self._conn.execute('DELETE FROM spool WHERE status = ? AND sent_at < ?',
+                               (SENT, time.time() - older_than_s))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SpoolSender:
+    """
+    Thread que drena o ScanSpool para a API.
+
+    Args:
+        spool (ScanSpool): Spool de origem
+        api_url (str): URL base da API (ex.: http://127.0.0.1:5000)
+        concurrency (int): Requisições simultâneas (e conexões keep-alive)
+        max_attempts (int): Tentativas antes de descartar uma leitura
+        backoff (float): Espera inicial entre tentativas, dobrada a cada falha
+        max_backoff (float): Limite da espera entre tentativas
+        timeout (float): Timeout de cada requisição
+    """
+
+    # Respostas definitivas da API: não adianta reenviar
+    FINAL_STATUSES = {200, 201, 404}
+    # Rejeições da leitura em si (código inválido): vão direto para dead
+    REJECTED_STATUSES = {422}
+
+    def __init__(self, spool, api_url, concurrency=4, max_attempts=20,
+                 backoff=1.0, max_backoff=300.0, timeout=15.0):
+        self.spool = spool
+        self.scan_url = api_url.rstrip('/') + '/product/scan'
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, drain_timeout=5.0):
+        """Para a thread, tentando antes esvaziar o que já venceu por até drain_timeout."""
+        deadline = time.time() + drain_timeout
+        while time.time() < deadline and self.spool.due(1):
+            time.sleep(0.05)
+        self._stop.set()
+        self.spool.has_work.set()
+        self._thread.join()
+        self._executor.shutdown(wait=True)
+        self.session.close()
+
+    def _send(self, entry):
+        entry_id, barcode, user_id, attempts = entry
+        payload = {'barcode': barcode}
+        if user_id is not None:
+            payload['user_id'] = user_id
+        try:
+            response = self.session.post(self.scan_url, json=payload, timeout=self.timeout)
+        except requests.RequestException as e:
+            return self._retry(entry_id, attempts, f'{type(e).__name__}: {e}')
+
+        if response.status_code in self.FINAL_STATUSES:
+            self.spool.mark_sent(entry_id)
+        elif self._rejected(response):
+            # A leitura em si é inválida: reenviar daria o mesmo resultado
+            self.spool.mark_dead(entry_id, f'HTTP {response.status_code}: {response.text[:200]}')
+        else:
+            # 5xx, 429 e demais 4xx: POST /product/scan também responde 400 a
+            # falhas internas (banco ocupado, timeout da OFF), que são passageiras
+            self._retry(entry_id, attempts, f'HTTP {response.status_code}: {response.text[:200]}')
+
+    def _rejected(self, response):
+        """Rejeição de validação: 422 ou o 400 do schema, que traz 'details'."""
+        if response.status_code in self.REJECTED_STATUSES:
+            return True
+        if response.status_code != 400:
+            return False
+        try:
+            body = response.json()
+        except ValueError:
+            return False
+        return isinstance(body, dict) and 'details' in body
+
+    def _retry(self, entry_id, attempts, error):
+        if attempts + 1 >= self.max_attempts:
+            self.spool.mark_dead(entry_id, error)
+            return
+        delay = min(self.backoff * (2 ** attempts), self.max_backoff)
+        self.spool.mark_retry(entry_id, error, time.time() + delay)
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self.spool.due(self.concurrency * 4)
+            if batch:
+                # Lote processado com no máximo `concurrency` requisições em voo
+                list(self._executor.map(self._send, batch))
+                continue
+
+            # Nada vencido: dorme até a próxima tentativa agendada ou uma nova leitura
+            self.spool.has_work.clear()
+            next_at = self.spool.next_due_at()
+            wait = None if next_at is None else max(0.0, next_at - time.time())
+            self.spool.has_work.wait(timeout=wait if wait is not None else 60.0)
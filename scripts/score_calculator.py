@@ -1,12 +1,101 @@
+from enum import IntFlag
+
+
+class ScoreRule(IntFlag):
+    """
+    Regras do score, uma por bit. O conjunto de regras que dispararam para um
+    produto é gravado em Product.score_rules (inteiro indexado), então filtrar
+    por regra ("penalizados por óleo de palma") não precisa reler as tags.
+    Novas regras entram sempre no próximo bit livre: os bits já gravados no
+    banco não podem mudar de significado.
+    """
+    CERTIFIED_LABEL = 1 << 0
+    PALM_OIL_FREE = 1 << 1
+    PALM_OIL = 1 << 2
+    VEGAN = 1 << 3
+    NOVA_1 = 1 << 4
+    NOVA_4 = 1 << 5
+    ADDITIVES = 1 << 6
+
+
+ALL_RULES = int(sum(ScoreRule))
+
+# Pontos e descrição de cada regra (pontos por ocorrência nas regras contadas)
+RULE_DETAILS = {
+    ScoreRule.CERTIFIED_LABEL: (15, 'Official certification label (organic, fair-trade, rainforest alliance), per label'),
+    ScoreRule.PALM_OIL_FREE: (10, 'Palm oil free'),
+    ScoreRule.PALM_OIL: (-20, 'Contains palm oil'),
+    ScoreRule.VEGAN: (10, 'Vegan'),
+    ScoreRule.NOVA_1: (10, 'Unprocessed or minimally processed (NOVA 1)'),
+    ScoreRule.NOVA_4: (-15, 'Ultra-processed (NOVA 4)'),
+    ScoreRule.ADDITIVES: (-2, 'Additives, per additive'),
+}
+
+
+def rule_names():
+    """Nomes aceitos nos filtros da API (ex.: 'palm_oil')."""
+    return [rule.name.lower() for rule in ScoreRule]
+
+
+def parse_rules(names):
+    """
+    Converte nomes de regras em bitmask.
+
+    Raises:
+        ValueError: Se algum nome não for uma regra conhecida
+    """
+    mask = 0
+    for name in names:
+        try:
+            mask |= ScoreRule[name.strip().upper()]
+        except KeyError:
+            raise ValueError(f"Unknown score rule: {name!r}") from None
+    return int(mask)
+
+
+def decode_rules(mask):
+    """Bitmask -> lista de regras com pontos e descrição, na ordem dos bits."""
+    if not mask:
+        return []
+    return [
+        {"rule": rule.name.lower(), "points": RULE_DETAILS[rule][0],
+         "description": RULE_DETAILS[rule][1]}
+        for rule in ScoreRule if mask & rule
+    ]
+
+
+def matching_masks(all_of=0, none_of=0):
+    """
+    Todos os valores possíveis de score_rules com os bits de all_of ligados e
+    os de none_of desligados. Com poucas regras o universo é pequeno (2^7), e
+    "score_rules IN (...)" equivale a "(score_rules & all_of) = all_of AND
+    (score_rules & none_of) = 0", mas pode usar o índice da coluna.
+    """
+    universe = 1 << len(ScoreRule)
+    return [value for value in range(universe)
+            if value & all_of == all_of and not value & none_of]
+
+
 def calculate_score(off_data=None, **kwargs):
     """
     # O uso de off_data=None torna o argumento opcional na posição, 
     # e **kwargs captura qualquer outro dado enviado (como nova_group ou ingredients_tags).
     """
+    return score_breakdown(off_data, **kwargs)[0]
+
+
+def score_breakdown(off_data=None, **kwargs):
+    """
+    Mesmo cálculo de calculate_score, devolvendo também as regras que dispararam.
+
+    Returns:
+        tuple[int, int]: (score de 0 a 100, bitmask de ScoreRule)
+    """
     # Se off_data não for passado, tenta extrair de kwargs ou cria um dict vazio
     # Garante que temos um dicionário para trabalhar, mesmo que venha via kwargs
     data = off_data if off_data is not None else kwargs.get('off_data', {})
     score = 50  # Pontuação base neutra
+    rules = 0
 
     # 1. Labels/Certificações (Prioridade Alta: Essencial)
     # Importante para validar greenwashing e peso alto no score. [cite: 17-12-2025]
@@ -16,16 +105,20 @@ def calculate_score(off_data=None, **kwargs):
     for label in labels:
         if any(vip in label for vip in certificacoes_vips):
             score += 15  # Bônus alto para certificações oficiais
+            rules |= ScoreRule.CERTIFIED_LABEL
 
     # 2. Análise de Ingredientes (Prioridade Alta: Vegan/Palm Oil)
     # Indica análise automática; palm-oil tem peso negativo. [cite: 17-12-2025]
     analysis = data.get('ingredients_analysis_tags', [])
     if 'en:palm-oil-free' in analysis:
         score += 10
+        rules |= ScoreRule.PALM_OIL_FREE
     if 'en:palm-oil' in analysis:
         score -= 20  # Peso negativo forte para óleo de palma
+        rules |= ScoreRule.PALM_OIL
     if 'en:vegan' in analysis:
         score += 10
+        rules |= ScoreRule.VEGAN
 
     # 3. Nível de Processamento (Prioridade Média: NOVA Group)
     # Produtos ultra-processados (4) têm maior pegada ambiental. [cite: 17-12-2025]
@@ -35,8 +128,10 @@ def calculate_score(off_data=None, **kwargs):
             val = int(nova)
             if val == 1:
                 score += 10
+                rules |= ScoreRule.NOVA_1
             if val == 4:
                 score -= 15  # Peso negativo para ultra-processados
+                rules |= ScoreRule.NOVA_4
         except (ValueError, TypeError):
             pass
 
@@ -44,6 +139,8 @@ def calculate_score(off_data=None, **kwargs):
     # A quantidade indica o nível de processamento. [cite: 17-12-2025]
     additives = data.get('additives_tags', [])
     score -= (len(additives) * 2)
+    if additives:
+        rules |= ScoreRule.ADDITIVES
 
     # Garante que o score fique entre 0 e 100
-    return max(0, min(100, score))
+    return max(0, min(100, score)), int(rules)
@@ -0,0 +1,453 @@
+"""
+Snapshot binário, somente leitura, do catálogo para o caminho de hit do scan.
+
+Com vários workers (gunicorn), cada leitura de barcode passaria pelo
+SQLAlchemy e pelo SQLite em cada processo. O snapshot é um arquivo
+compacto que todos os workers mapeiam com mmap: as páginas ficam no page
+cache do sistema uma única vez, compartilhadas, e a busca é uma busca
+binária direto sobre os bytes mapeados, sem cópia do arquivo.
+
+Formato (little-endian):
+
+- cabeçalho (HEADER_SIZE bytes): magic, versão, quantidade de produtos,
+  momento da geração (epoch) e offsets das seções
+- registros de tamanho fixo (RECORD), ordenados por barcode: barcode em
+  14 bytes, id, score, nova_group, score_rules, bitmap de nulos e
+  (offset, tamanho) dos textos no blob
+- blob: name, image_url, date_inserted e as tags de cada produto, em UTF-8,
+  separados por FIELD_SEPARATOR
+
+O SQLite continua sendo a fonte da verdade: escritas e misses vão ao banco.
+O snapshot é regenerado com flask --app app build-snapshot (ex.: via cron)
+ou a cada SNAPSHOT_REBUILD_INTERVAL segundos; os workers percebem o arquivo
+novo (trocado de forma atômica) em até SNAPSHOT_CHECK_INTERVAL segundos.
+
+Alterações e remoções de produtos feitas pela sessão, em qualquer worker,
+são registradas em product_change na mesma transação (listener
+before_flush). Junto com a verificação do arquivo, no máximo uma vez a cada
+SNAPSHOT_CHECK_INTERVAL segundos, cada worker lê de product_change os ids
+alterados desde a geração do snapshot (menos CHANGE_GRACE segundos, para
+transações que terminaram durante a leitura) para um conjunto em memória.
+Um hit de um id desse conjunto segue para o banco; os demais não passam
+pelo SQLAlchemy nem pelo SQLite. Alterações feitas por este worker entram
+no conjunto na hora; as de outros workers, em até SNAPSHOT_CHECK_INTERVAL
+segundos. Escritas em Core que não passam pela sessão não são
+registradas. Barcodes que não cabem na chave do snapshot (não ASCII ou com
+mais de 14 caracteres) ficam fora do arquivo e são sempre buscados no banco.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+MAGIC = b'TLSNAP\x00\x01'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<8sIIdQQ')
+HEADER_SIZE = 64
+RECORD = struct.Struct('<14sqdbiHQI')
+BARCODE_SIZE = 14
+
+# Alterações até esses segundos antes da geração ainda invalidam o snapshot
+CHANGE_GRACE = 60
+
+FIELD_SEPARATOR = '\x1f'
+TEXT_FIELDS = ('name', 'image_url', 'date_inserted', 'ingredients_analysis_tags',
+               'labels_tags', 'allergens_tags', 'additives_tags')
+
+# Bits do bitmap de nulos: score, nova_group e score_rules, depois TEXT_FIELDS
+NULL_SCORE, NULL_NOVA, NULL_RULES = 1, 2, 4
+_TEXT_NULL_BITS = {field: 1 << (3 + i) for i, field in enumerate(TEXT_FIELDS)}
+
+
+def _key(barcode):
+    """Barcode como chave de tamanho fixo, ou None se não couber no snapshot."""
+    try:
+        key = barcode.encode('ascii')
+    except (AttributeError, UnicodeEncodeError):
+        return None
+    if len(key) > BARCODE_SIZE:
+        return None
+    return key.ljust(BARCODE_SIZE, b'\x00')
+
+
+class SnapshotProduct:
+    """Produto lido do snapshot, com os mesmos atributos usados por ProductResponseSchema."""
+
+    __slots__ = ('id', 'barcode', 'score', 'nova_group', 'score_rules') + TEXT_FIELDS
+
+    def __repr__(self):
+        return f'<SnapshotProduct {self.name} - Score: {self.score}>'
+
+
+class ProductSnapshot:
+    """Um arquivo de snapshot mapeado em memória."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            info = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, built_at, records_offset, blob_offset = HEADER.unpack_from(self._mm)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'Snapshot em formato incompatível: {path}')
+        self.path = path
+        self.identity = (info.st_ino, info.st_mtime_ns, info.st_size)
+        self.count = count
+        self.built_at = built_at
+        self._records = records_offset
+        self._blob = blob_offset
+
+    def find(self, barcode):
+        """Busca binária pelo barcode; devolve SnapshotProduct ou None."""
+        key = _key(barcode)
+        if key is None:
+            return None
+        mm, base, size = self._mm, self._records, RECORD.size
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * size
+            if mm[offset:offset + BARCODE_SIZE] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        offset = base + lo * size
+        if lo >= self.count or mm[offset:offset + BARCODE_SIZE] != key:
+            return None
+        return self._product(offset)
+
+    def _product(self, offset):
+        (barcode, product_id, score, nova_group, score_rules, nulls,
+         text_offset, text_size) = RECORD.unpack_from(self._mm, offset)
+        start = self._blob + text_offset
+        texts = self._mm[start:start + text_size].decode('utf-8').split(FIELD_SEPARATOR)
+
+        product = SnapshotProduct()
+        product.id = product_id
+        product.barcode = barcode.rstrip(b'\x00').decode('ascii')
+        product.score = None if nulls & NULL_SCORE else score
+        product.nova_group = None if nulls & NULL_NOVA else nova_group
+        product.score_rules = None if nulls & NULL_RULES else score_rules
+        for field, value in zip(TEXT_FIELDS, texts):
+            setattr(product, field, None if nulls & _TEXT_NULL_BITS[field] else value)
+        if product.date_inserted is not None:
+            product.date_inserted = datetime.fromisoformat(product.date_inserted)
+        return product
+
+
+def write_snapshot(path, rows):
+    """
+    Grava o snapshot de forma atômica (arquivo temporário + rename).
+
+    Args:
+        path (str): Arquivo de destino
+        rows (Iterable[tuple]): (barcode, id, score, nova_group, score_rules,
+            *TEXT_FIELDS), ordenadas por barcode
+
+    Returns:
+        tuple[int, int]: Produtos gravados e ignorados (barcode sem chave válida)
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    records_offset = HEADER_SIZE
+    # Momento de antes da leitura: alterações posteriores podem faltar no arquivo
+    built_at = time.time()
+
+    fd, tmp = tempfile.mkstemp(prefix='.snapshot-', dir=directory)
+    try:
+        # Os textos vão para um segundo arquivo e são anexados no fim: a
+        # memória usada não depende do tamanho do catálogo
+        with os.fdopen(fd, 'wb') as out, tempfile.TemporaryFile(dir=directory) as blob:
+            out.write(b'\x00' * HEADER_SIZE)
+            written, skipped, text_offset = 0, 0, 0
+            for barcode, product_id, score, nova_group, score_rules, *texts in rows:
+                key = _key(barcode)
+                if key is None:
+                    skipped += 1
+                    continue
+                nulls = ((NULL_SCORE if score is None else 0)
+                         | (NULL_NOVA if nova_group is None else 0)
+                         | (NULL_RULES if score_rules is None else 0))
+                values = []
+                for field, value in zip(TEXT_FIELDS, texts):
+                    if value is None:
+                        nulls |= _TEXT_NULL_BITS[field]
+                        value = ''
+                    elif field == 'date_inserted':
+                        value = value.isoformat()
+                    values.append(value.replace(FIELD_SEPARATOR, ' '))
+                data = FIELD_SEPARATOR.join(values).encode('utf-8')
+                out.write(RECORD.pack(
+                    key, product_id,
+                    score if score is not None else float('nan'),
+                    nova_group if nova_group is not None else -1,
+                    score_rules if score_rules is not None else 0,
+                    nulls, text_offset, len(data)))
+                blob.write(data)
+                text_offset += len(data)
+                written += 1
+
+            # Registros são contíguos; o blob começa logo depois do último
+            blob_offset = records_offset + written * RECORD.size
+            blob.seek(0)
+            while True:
+                chunk = blob.read(1024 * 1024)
+                if not chunk:
+                    break
+                out.write(chunk)
+            out.seek(0)
+            out.write(HEADER.pack(MAGIC, FORMAT_VERSION, written, built_at,
+                                  records_offset, blob_offset))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return written, skipped
+
+
+class SnapshotStore:
+    """Carrega, recarrega e regenera o snapshot compartilhado entre workers."""
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.check_interval = 5.0
+        self.interval = 0
+        self._app = None
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._changed = None     # ids alterados desde a geração; None = desconhecido
+        self._timer = None
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('SNAPSHOT_ENABLED', False)
+        app.config.setdefault('SNAPSHOT_PATH',
+                              os.path.join(app.instance_path, 'product_snapshot.bin'))
+        app.config.setdefault('SNAPSHOT_CHECK_INTERVAL', 5)
+        app.config.setdefault('SNAPSHOT_REBUILD_INTERVAL', 0)
+        self.enabled = app.config['SNAPSHOT_ENABLED']
+        self.path = app.config['SNAPSHOT_PATH']
+        self.check_interval = app.config['SNAPSHOT_CHECK_INTERVAL']
+        self.interval = app.config['SNAPSHOT_REBUILD_INTERVAL']
+        self._app = app
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._changed = None
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self.enabled:
+            return
+
+        # Listener global da classe Session, registrado uma vez por processo
+        if not self._listening:
+            event.listen(Session, 'before_flush', self._before_flush)
+            self._listening = True
+        self._schedule()
+
+    # ---------- Leitura ----------
+
+    def current(self):
+        """
+        Snapshot mapeado, recarregado se o arquivo foi trocado (ou None), com
+        o conjunto de ids alterados desde a geração dele atualizado.
+        """
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self._reload()
+            self._refresh_changes()
+        return self._snapshot
+
+    def _reload(self):
+        try:
+            info = os.stat(self.path)
+        except (FileNotFoundError, TypeError):
+            self._snapshot = None
+            return
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.identity == (
+                info.st_ino, info.st_mtime_ns, info.st_size):
+            return
+        try:
+            fresh = ProductSnapshot(self.path)
+        except (OSError, ValueError, struct.error) as e:
+            if self._app is not None:
+                self._app.logger.warning(f'Snapshot ignorado: {e}')
+            return
+        # O mmap anterior é fechado quando a última busca em andamento o soltar
+        self._snapshot = fresh
+
+    def lookup(self, barcode):
+        """
+        Produto pelo barcode canônico, ou None para seguir para o banco.
+
+        Returns:
+            SnapshotProduct | None
+        """
+        if not self.enabled:
+            return None
+        from extensions import metrics
+
+        snapshot = self.current()
+        product = snapshot.find(barcode) if snapshot is not None else None
+        if product is not None:
+            changed = self._changed
+            # Sem a lista de alterações não dá para confiar no arquivo
+            if changed is None or product.id in changed:
+                product = None
+        metrics.cache('product_snapshot', product is not None)
+        return product
+
+    def _refresh_changes(self):
+        """Relê de product_change os ids alterados, por qualquer worker, desde a geração."""
+        from extensions import db
+        from model.snapshot import ProductChange
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            self._changed = None
+            return
+        table = ProductChange.__table__
+        try:
+            with db.engine.connect() as conn:
+                changed = set(conn.execute(
+                    db.select(table.c.product_id)
+                    .where(table.c.changed_at >= snapshot.built_at - CHANGE_GRACE)).scalars())
+        except Exception as e:
+            self._app.logger.warning(f'Falha ao ler product_change: {e}')
+            changed = None
+        with self._lock:
+            self._changed = changed
+
+    # ---------- Registro de alterações ----------
+
+    def _before_flush(self, session, flush_context, instances):
+        if not self.enabled:
+            return
+        from model.product import Product
+
+        changed = {obj.id for obj in session.deleted if isinstance(obj, Product)}
+        changed.update(obj.id for obj in session.dirty
+                       if isinstance(obj, Product) and session.is_modified(obj))
+        if changed:
+            self.record_changes(session.connection(), changed)
+            # Este worker deixa de servir os produtos na hora, sem esperar a releitura
+            with self._lock:
+                if self._changed is not None:
+                    self._changed.update(changed)
+
+    @staticmethod
+    def record_changes(conn, product_ids):
+        """Marca produtos como alterados agora (UPSERT), na transação de conn."""
+        from model.snapshot import ProductChange
+
+        changed_at = time.time()
+        statement = sqlite_insert(ProductChange.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['product_id'], set_={'changed_at': statement.excluded.changed_at})
+        conn.execute(statement, [{'product_id': product_id, 'changed_at': changed_at}
+                                 for product_id in product_ids])
+
+    # ---------- Geração ----------
+
+    def build(self, path=None, log=None):
+        """
+        Gera o snapshot a partir da tabela product (requer app context).
+
+        Returns:
+            int: Produtos no snapshot
+        """
+        path = path or self.path
+        started = time.perf_counter()
+        previous = self._built_at(path)
+        written, skipped = write_snapshot(path, self._rows())
+        if previous is not None:
+            self._prune_changes(previous - CHANGE_GRACE)
+        if log:
+            log(f'Snapshot com {written} produtos gravado em {path} '
+                f'({os.path.getsize(path) / 1e6:.1f} MB, {time.perf_counter() - started:.1f}s)')
+            if skipped:
+                log(f'{skipped} produtos com barcode fora do formato do snapshot '
+                    f'(não ASCII ou acima de {BARCODE_SIZE} caracteres) ficaram de fora')
+        return written
+
+    @staticmethod
+    def _built_at(path):
+        """Momento de geração do snapshot em path, ou None se não houver um válido."""
+        try:
+            return ProductSnapshot(path).built_at
+        except (OSError, ValueError, struct.error):
+            return None
+
+    @staticmethod
+    def _prune_changes(before):
+        """
+        Apaga de product_change o que é anterior a before. Usa a geração do
+        snapshot substituído: workers que ainda não trocaram de arquivo
+        continuam precisando das alterações feitas depois dela.
+        """
+        from extensions import db
+        from model.snapshot import ProductChange
+
+        table = ProductChange.__table__
+        with db.engine.begin() as conn:
+            conn.execute(table.delete().where(table.c.changed_at < before))
+
+    @staticmethod
+    def _rows(chunk_size=10000):
+        """
+        Linhas de product em ordem de barcode, em blocos por keyset.
+
+        Cada bloco é uma leitura curta: no SQLite, uma única leitura longa
+        seguraria o lock compartilhado e bloquearia as escritas durante
+        toda a geração.
+        """
+        from extensions import db
+        from model.product import Product
+
+        table = Product.__table__
+        query = (db.select(table.c.barcode, table.c.pk_product, table.c.score,
+                           table.c.nova_group, table.c.score_rules,
+                           *[table.c[field] for field in TEXT_FIELDS])
+                 .where(db.func.length(table.c.barcode) <= BARCODE_SIZE)
+                 .order_by(table.c.barcode)
+                 .limit(chunk_size))
+        last = None
+        while True:
+            with db.engine.connect() as conn:
+                rows = conn.execute(
+                    query if last is None else query.where(table.c.barcode > last)).all()
+            yield from rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][0]
+
+    def _schedule(self):
+        if self.interval and self.interval > 0:
+            self._timer = threading.Timer(self.interval, self._periodic_build)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _periodic_build(self):
+        app = self._app
+        try:
+            # Com vários workers, só regenera quem encontrar o arquivo vencido
+            age = time.time() - os.path.getmtime(self.path) if os.path.exists(self.path) else None
+            if age is None or age >= self.interval * 0.9:
+                with app.app_context():
+                    self.build()
+        except Exception as e:
+            app.logger.warning(f'Falha ao gerar o snapshot: {e}')
+        finally:
+            self._schedule()
@@ -0,0 +1,305 @@
+"""
+Estatísticas do catálogo mantidas de forma incremental (GET /stats).
+
+Em vez de GROUP BY sobre product e comment (e de separar as tags em Python)
+a cada consulta, os números ficam na tabela de resumo stat_counter:
+
+- products: quantidade de produtos e soma dos scores (score médio)
+- score_bucket: histograma do score em faixas de 10 pontos (0 a 9)
+- nova_group: distribuição por NOVA group ('unknown' sem valor)
+- additive / label: ocorrências de cada aditivo e de cada label/certificação
+- rating: quantidade de comentários e soma das estrelas (nota média)
+
+Um listener before_flush da sessão calcula a variação causada por cada
+produto ou comentário criado, alterado ou removido e a aplica com UPSERT na
+mesma conexão, ou seja, na mesma transação da escrita. Escritas em Core que
+não passam pela sessão (buffer de comentários) chamam apply_comments.
+
+Para corrigir desvios (ex.: cargas em massa ou alterações manuais no banco),
+reconcile() recalcula tudo do zero; roda a cada STATS_RECONCILE_INTERVAL
+segundos e com flask --app app reconcile-stats.
+"""
+import threading
+from collections import defaultdict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+PRODUCT_FIELDS = ('score', 'nova_group', 'labels_tags', 'additives_tags')
+
+KIND_PRODUCTS = 'products'
+KIND_SCORE = 'score_bucket'
+KIND_NOVA = 'nova_group'
+KIND_ADDITIVE = 'additive'
+KIND_LABEL = 'label'
+KIND_RATING = 'rating'
+
+
+def _tags(value):
+    return [tag for tag in value.split(',') if tag] if value else []
+
+
+def score_bucket(score):
+    """Faixa de 10 pontos do score (100 entra na última faixa, 9)."""
+    return str(min(int(score // 10), 9))
+
+
+def product_deltas(deltas, values, sign):
+    """
+    Acumula em deltas a contribuição de um produto.
+
+    Args:
+        deltas (defaultdict): (kind, key) -> [count, total]
+        values (dict): score, nova_group, labels_tags e additives_tags
+        sign (int): +1 ao incluir, -1 ao remover
+    """
+    score = values['score']
+    entry = deltas[(KIND_PRODUCTS, '')]
+    entry[0] += sign
+    if score is not None:
+        entry[1] += sign * score
+        bucket = deltas[(KIND_SCORE, score_bucket(score))]
+        bucket[0] += sign
+        bucket[1] += sign * score
+    nova = values['nova_group']
+    deltas[(KIND_NOVA, str(nova) if nova is not None else 'unknown')][0] += sign
+    for tag in set(_tags(values['additives_tags'])):
+        deltas[(KIND_ADDITIVE, tag)][0] += sign
+    for tag in set(_tags(values['labels_tags'])):
+        deltas[(KIND_LABEL, tag)][0] += sign
+
+
+def comment_deltas(deltas, n_estrela, sign, count=1):
+    entry = deltas[(KIND_RATING, '')]
+    entry[0] += sign * count
+    entry[1] += sign * (n_estrela or 0)
+
+
+def _committed(obj, name):
+    """Valor do atributo como está no banco (antes das alterações pendentes)."""
+    history = inspect(obj).attrs[name].load_history()
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return history.added[0] if history.added else None
+
+
+class CatalogueStats:
+    """Mantém stat_counter em dia e serve o resumo de GET /stats."""
+
+    def __init__(self):
+        self.enabled = False
+        self.interval = 0
+        self._app = None
+        self._timer = None
+        self._listening = False
+
+    def init_app(self, app):
+        app.config.setdefault('STATS_ENABLED', True)
+        app.config.setdefault('STATS_RECONCILE_INTERVAL', 6 * 3600)
+        self.enabled = app.config['STATS_ENABLED']
+        self.interval = app.config['STATS_RECONCILE_INTERVAL']
+        self._app = app
+        if not self.enabled:
+            return
+
+        # Listener global da classe Session, registrado uma vez por processo
+        if not self._listening:
+            event.listen(Session, 'before_flush', self._before_flush)
+            self._listening = True
+        self._schedule()
+
+    # ---------- Atualização incremental ----------
+
+    def _before_flush(self, session, flush_context, instances):
+        if not self.enabled:
+            return
+        from model.comment import Comment
+        from model.product import Product
+
+        deltas = defaultdict(lambda: [0, 0.0])
+        deleted_products = set()
+
+        for obj in session.deleted:
+            if isinstance(obj, Product):
+                deleted_products.add(obj.id)
+                product_deltas(deltas, {f: _committed(obj, f) for f in PRODUCT_FIELDS}, -1)
+        if deleted_products:
+            # Comentários removidos em cascata com o produto: pelo banco, pois
+            # nem todos estão carregados na sessão
+            from extensions import db
+            table = Comment.__table__
+            count, stars = session.connection().execute(
+                db.select(db.func.count(), db.func.coalesce(db.func.sum(table.c.n_estrela), 0))
+                .where(table.c.product_id.in_(deleted_products))).one()
+            if count:
+                comment_deltas(deltas, stars, -1, count)
+
+        for obj in session.deleted:
+            if isinstance(obj, Comment) and _committed(obj, 'product_id') not in deleted_products:
+                comment_deltas(deltas, _committed(obj, 'n_estrela'), -1)
+
+        for obj in session.new:
+            if isinstance(obj, Product):
+                product_deltas(deltas, {f: getattr(obj, f) for f in PRODUCT_FIELDS}, +1)
+            elif isinstance(obj, Comment):
+                comment_deltas(deltas, obj.n_estrela, +1)
+
+        for obj in session.dirty:
+            if obj in session.deleted or not session.is_modified(obj):
+                continue
+            if isinstance(obj, Product):
+                # Rescore ou alteração de tags: sai o estado antigo, entra o novo
+                state = inspect(obj)
+                if any(state.attrs[f].history.has_changes() for f in PRODUCT_FIELDS):
+                    product_deltas(deltas, {f: _committed(obj, f) for f in PRODUCT_FIELDS}, -1)
+                    product_deltas(deltas, {f: getattr(obj, f) for f in PRODUCT_FIELDS}, +1)
+            elif isinstance(obj, Comment) and inspect(obj).attrs.n_estrela.history.has_changes():
+                comment_deltas(deltas, _committed(obj, 'n_estrela'), -1)
+                comment_deltas(deltas, obj.n_estrela, +1)
+
+        if deltas:
+            self.apply(session.connection(), deltas)
+
+    def apply(self, conn, deltas):
+        """Soma as variações aos contadores (UPSERT), na transação de conn."""
+        from model.stats import StatCounter
+
+        rows = [{'kind': kind, 'key': key, 'count': count, 'total': total}
+                for (kind, key), (count, total) in deltas.items() if count or total]
+        if not rows:
+            return
+        statement = sqlite_insert(StatCounter.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['kind', 'key'],
+            set_={'count': StatCounter.__table__.c['count'] + statement.excluded['count'],
+                  'total': StatCounter.__table__.c.total + statement.excluded.total})
+        conn.execute(statement, rows)
+
+    def apply_comments(self, conn, comments):
+        """Variação para comentários inseridos em Core (fora da sessão)."""
+        if not self.enabled:
+            return
+        deltas = defaultdict(lambda: [0, 0.0])
+        for comment in comments:
+            comment_deltas(deltas, comment.get('n_estrela'), +1)
+        self.apply(conn, deltas)
+
+    # ---------- Reconciliação ----------
+
+    def compute(self, conn, batch_size=10000):
+        """Contadores recalculados do zero a partir de product e comment."""
+        from extensions import db
+        from model.comment import Comment
+        from model.product import Product
+
+        deltas = defaultdict(lambda: [0, 0.0])
+        product = Product.__table__
+        rows = conn.execution_options(yield_per=batch_size).execute(
+            db.select(*[product.c[f] for f in PRODUCT_FIELDS]))
+        for row in rows:
+            product_deltas(deltas, dict(zip(PRODUCT_FIELDS, row)), +1)
+
+        comment = Comment.__table__
+        count, stars = conn.execute(db.select(
+            db.func.count(), db.func.coalesce(db.func.sum(comment.c.n_estrela), 0))).one()
+        comment_deltas(deltas, stars, +1, count)
+        deltas[(KIND_PRODUCTS, '')]  # presente mesmo com o catálogo vazio
+        return deltas
+
+    def reconcile(self, log=None):
+        """
+        Recalcula stat_counter do zero em uma única transação e devolve
+        quantos contadores estavam errados.
+
+        O DELETE inicial (que também devolve os valores antigos) pega o lock de
+        escrita do SQLite antes da leitura: nenhuma escrita concorrente entra
+        entre o recálculo e a gravação.
+        """
+        from extensions import db
+        from model.stats import StatCounter
+
+        table = StatCounter.__table__
+        with db.engine.connect() as conn:
+            previous = {(kind, key): (count, total) for kind, key, count, total in conn.execute(
+                table.delete().returning(table.c.kind, table.c.key, table.c['count'], table.c.total))}
+            fresh = self.compute(conn)
+            rows = [{'kind': kind, 'key': key, 'count': count, 'total': total}
+                    for (kind, key), (count, total) in fresh.items()
+                    if count or total or kind == KIND_PRODUCTS]
+            if rows:
+                conn.execute(table.insert(), rows)
+            conn.commit()
+
+        drift = sum(
+            1 for key in set(previous) | set(fresh)
+            if round(previous.get(key, (0, 0.0))[0]) != fresh.get(key, (0, 0.0))[0]
+            or abs(previous.get(key, (0, 0.0))[1] - fresh.get(key, (0, 0.0))[1]) > 1e-6)
+        if log:
+            log(f'Estatísticas recalculadas: {len(rows)} contadores, {drift} corrigidos')
+        return drift
+
+    def _schedule(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self.interval and self.interval > 0:
+            self._timer = threading.Timer(self.interval, self._periodic_reconcile)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _periodic_reconcile(self):
+        app = self._app
+        try:
+            with app.app_context():
+                drift = self.reconcile()
+            if drift:
+                app.logger.warning(f'stat_counter: {drift} contadores corrigidos na reconciliação')
+        except Exception as e:
+            app.logger.warning(f'Falha ao reconciliar estatísticas: {e}')
+        finally:
+            self._schedule()
+
+    # ---------- Leitura ----------
+
+    def summary(self, top=10):
+        """
+        Resumo para GET /stats: só buscas por chave e top-K pelo índice
+        (kind, count), sem varrer product nem comment.
+        """
+        from extensions import db
+        from model.stats import StatCounter
+
+        def single(kind):
+            row = db.session.get(StatCounter, (kind, ''))
+            return (row.count, row.total) if row else (0, 0.0)
+
+        def rows(kind, limit=None):
+            query = StatCounter.query.filter(StatCounter.kind == kind, StatCounter.count > 0)
+            if limit:
+                query = query.order_by(StatCounter.count.desc()).limit(limit)
+            return query.all()
+
+        products, score_sum = single(KIND_PRODUCTS)
+        buckets = {row.key: row for row in rows(KIND_SCORE)}
+        scored = sum(row.count for row in buckets.values())
+        ratings, stars = single(KIND_RATING)
+
+        return {
+            "products": products,
+            "average_score": round(score_sum / scored, 2) if scored else None,
+            "score_histogram": [
+                {"range": f"{b * 10}-{b * 10 + 9 if b < 9 else 100}",
+                 "products": buckets[str(b)].count if str(b) in buckets else 0}
+                for b in range(10)
+            ],
+            "nova_groups": {row.key: row.count for row in rows(KIND_NOVA)},
+            "top_additives": [{"tag": row.key, "products": row.count}
+                              for row in rows(KIND_ADDITIVE, top)],
+            "top_labels": [{"tag": row.key, "products": row.count}
+                           for row in rows(KIND_LABEL, top)],
+            "comments": ratings,
+            "average_rating": round(stars / ratings, 2) if ratings else None,
+        }
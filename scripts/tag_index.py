@@ -0,0 +1,307 @@
+"""
+Índice de bitmaps das tags dos produtos para filtros de dieta e alergênicos.
+
+Para cada tag de TAG_INDEX_FIELDS (por padrão allergens_tags e
+ingredients_analysis_tags) o índice guarda um bitmap com o bit `id` ligado
+para cada produto que tem a tag. Os bitmaps são inteiros do Python, que
+fazem AND/OR/NOT em C sobre palavras de 30 bits: com 1M de produtos cada
+bitmap ocupa ~130 KB e um filtro como "vegano, sem óleo de palma, sem
+glúten nem leite" custa poucas operações sobre eles, em vez de LIKE linha a
+linha em texto separado por vírgulas.
+
+O índice é montado na inicialização (init_app), em uma thread, lendo a
+tabela product em blocos por keyset; até ficar pronto, ensure_loaded devolve
+False e GET /products/filter responde 503. Depois disso é atualizado a cada
+scan (produto novo) e remoção deste processo. Antes de cada consulta,
+produtos com id acima do maior já indexado (inseridos por outro worker ou
+por carga em massa) são incorporados; ids de produtos que já não existem são
+limpos do índice quando aparecem em uma página.
+
+Limitações, porque essa incorporação só enxerga ids novos:
+
+- Se outro worker ou um script alterar as tags de um produto já indexado,
+  este processo continua com as tags antigas até o próximo init_app. A API
+  não altera tags de produtos existentes (o PATCH muda só nome e barcode);
+  cargas que reescrevem tags devem ser seguidas de um reinício dos workers.
+- Ids não podem ser reutilizados: se outro worker remover o produto de
+  maior id e o SQLite der o mesmo id a um produto novo, o índice manteria
+  as tags do antigo. product.pk_product é AUTOINCREMENT (migração 6) para
+  isso não acontecer; bancos anteriores à migração têm esse risco.
+"""
+import threading
+
+DEFAULT_FIELDS = ('allergens_tags', 'ingredients_analysis_tags')
+
+
+def popcount(bitmap):
+    """Quantidade de bits ligados (int.bit_count só existe a partir do Python 3.10)."""
+    return bin(bitmap).count('1')
+
+
+def _tags(value):
+    return {tag for tag in value.split(',') if tag} if value else set()
+
+
+def iter_bits(bitmap, after=-1, window=4096):
+    """
+    Posições dos bits ligados de bitmap maiores que after, em ordem crescente.
+
+    Cada operação sobre o bitmap inteiro custa O(tamanho): em vez de uma por
+    bit, salta para o próximo bit ligado e lê uma janela de `window` bits
+    de uma vez, percorrida como inteiro pequeno.
+    """
+    offset = after + 1
+    bitmap >>= offset
+    mask = (1 << window) - 1
+    while bitmap:
+        skip = (bitmap & -bitmap).bit_length() - 1
+        if skip:
+            bitmap >>= skip
+            offset += skip
+        chunk = bitmap & mask
+        while chunk:
+            low = chunk & -chunk
+            yield offset + low.bit_length() - 1
+            chunk ^= low
+        bitmap >>= window
+        offset += window
+
+
+class _Bitmaps:
+    """Estado do índice: bitmap por tag, bitmap de todos os ids e o maior id."""
+
+    def __init__(self):
+        self.bitmaps = {}   # tag -> int com o bit de cada product_id
+        self.all = 0        # todos os produtos indexados
+        self.max_id = 0
+
+    def add_rows(self, rows):
+        """Incorpora linhas (id, *campos)."""
+        # As mesmas combinações de tags se repetem muito: agrupa os ids pelo
+        # texto dos campos e separa as tags uma vez por combinação
+        groups = {}
+        ids = []
+        for product_id, *values in rows:
+            ids.append(product_id)
+            key = tuple(values)
+            group = groups.get(key)
+            if group is None:
+                groups[key] = [product_id]
+            else:
+                group.append(product_id)
+        if not ids:
+            return
+
+        positions = {}
+        for values, members in groups.items():
+            tags = set()
+            for value in values:
+                tags.update(_tags(value))
+            for tag in tags:
+                positions.setdefault(tag, []).extend(members)
+
+        # Monta cada bitmap em um bytearray e converte de uma vez: ligar bit a
+        # bit no int criaria uma cópia do bitmap inteiro por produto
+        def to_int(members):
+            buffer = bytearray(max(members) // 8 + 1)
+            for member in members:
+                buffer[member >> 3] |= 1 << (member & 7)
+            return int.from_bytes(buffer, 'little')
+
+        for tag, members in positions.items():
+            self.bitmaps[tag] = self.bitmaps.get(tag, 0) | to_int(members)
+        self.all |= to_int(ids)
+        self.max_id = max(self.max_id, max(ids))
+
+    def discard(self, product_id):
+        bit = 1 << product_id
+        if not self.all & bit:
+            return
+        self.all &= ~bit
+        for tag, bitmap in list(self.bitmaps.items()):
+            if bitmap & bit:
+                bitmap &= ~bit
+                if bitmap:
+                    self.bitmaps[tag] = bitmap
+                else:
+                    del self.bitmaps[tag]
+
+    def apply(self, change):
+        """Aplica uma alteração do diário: (id, *campos) indexa, (id,) remove."""
+        self.discard(change[0])
+        if len(change) > 1:
+            self.add_rows([change])
+
+
+class TagIndex:
+    """Bitmaps tag -> ids de produto, com filtros AND/OR/NOT."""
+
+    def __init__(self):
+        self.fields = DEFAULT_FIELDS
+        self._lock = threading.RLock()
+        self._app = None
+        self._state = _Bitmaps()
+        self._loaded = False
+        self._journal = None      # alterações feitas durante uma construção
+        self._worker = None       # thread de construção em andamento
+        self._generation = 0      # muda a cada init_app/build: descarta construções antigas
+
+    def init_app(self, app):
+        app.config.setdefault('TAG_INDEX_FIELDS', DEFAULT_FIELDS)
+        app.config.setdefault('TAG_INDEX_WARMUP', True)
+        self.fields = tuple(app.config['TAG_INDEX_FIELDS'])
+        self._app = app
+        # Um novo app pode apontar para outro banco: remonta desde já
+        with self._lock:
+            self._generation += 1
+            self._state = _Bitmaps()
+            self._loaded = False
+            self._journal = None
+            self._worker = None
+        if app.config['TAG_INDEX_WARMUP']:
+            self._start()
+
+    def __len__(self):
+        return popcount(self._state.all)
+
+    # ---------- Construção ----------
+
+    def _rows(self, chunk_size=50000, after_id=0):
+        """
+        Linhas (id, *campos) de product em ordem de id, em blocos por keyset.
+
+        Cada bloco é uma leitura curta: no SQLite, uma única leitura longa
+        bloquearia as escritas durante toda a construção.
+        """
+        from extensions import db
+        from model.product import Product
+
+        table = Product.__table__
+        query = (db.select(table.c.pk_product, *[table.c[field] for field in self.fields])
+                 .order_by(table.c.pk_product)
+                 .limit(chunk_size))
+        last = after_id
+        while True:
+            with db.engine.connect() as conn:
+                rows = conn.execute(query.where(table.c.pk_product > last)).all()
+            yield rows
+            if len(rows) < chunk_size:
+                return
+            last = rows[-1][0]
+
+    def _build(self, generation, batch_size=50000):
+        state = _Bitmaps()
+        for rows in self._rows(batch_size):
+            state.add_rows(rows)
+        with self._lock:
+            if generation != self._generation:
+                return False
+            for change in self._journal or ():
+                state.apply(change)
+            self._state = state
+            self._journal = None
+            self._loaded = True
+            return True
+
+    def build_from_db(self, batch_size=50000):
+        """Monta o índice agora, nesta thread (requer app context)."""
+        with self._lock:
+            self._generation += 1
+            generation = self._generation
+            self._journal = []
+        self._build(generation, batch_size)
+        return len(self)
+
+    def _start(self):
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            if self._app is None:
+                return
+            self._journal = []
+            self._worker = threading.Thread(
+                target=self._run, args=(self._app, self._generation),
+                name='tag-index', daemon=True)
+            self._worker.start()
+
+    def _run(self, app, generation):
+        from extensions import db
+
+        try:
+            with app.app_context():
+                # Banco ainda sem migração: a próxima consulta tenta de novo
+                if not db.inspect(db.engine).has_table('product'):
+                    with self._lock:
+                        if generation == self._generation:
+                            self._journal = None
+                    return
+                self._build(generation)
+        except Exception as e:
+            app.logger.warning(f'Falha ao montar o índice de tags: {e}')
+            with self._lock:
+                if generation == self._generation:
+                    self._journal = None
+
+    def ensure_loaded(self):
+        """
+        True se o índice está pronto, depois de incorporar produtos novos de
+        fora deste processo. Se ainda não está (construção em andamento ou
+        que falhou), dispara a construção em segundo plano e devolve False.
+        """
+        from extensions import db
+        from model.product import Product
+
+        if not self._loaded:
+            self._start()
+            return False
+        newest = db.session.query(db.func.max(Product.id)).scalar() or 0
+        if newest > self._state.max_id:
+            with self._lock:
+                for rows in self._rows(after_id=self._state.max_id):
+                    self._state.add_rows(rows)
+        return True
+
+    # ---------- Atualização ----------
+
+    def _change(self, change):
+        with self._lock:
+            if self._journal is not None:
+                self._journal.append(change)
+            if self._loaded:
+                self._state.apply(change)
+
+    def upsert(self, product):
+        """Indexa (ou reindexa) um produto após o commit."""
+        self._change((product.id, *[getattr(product, field) for field in self.fields]))
+
+    def remove(self, product_id):
+        self._change((product_id,))
+
+    # ---------- Consulta ----------
+
+    def match(self, all_of=(), any_of=(), none_of=()):
+        """
+        Bitmap dos produtos com todas as tags de all_of, ao menos uma de any_of
+        (se informado) e nenhuma de none_of.
+        """
+        state = self._state
+        bitmaps = state.bitmaps
+        result = state.all
+        for tag in all_of:
+            result &= bitmaps.get(tag, 0)
+            if not result:
+                return 0
+        if any_of:
+            union = 0
+            for tag in any_of:
+                union |= bitmaps.get(tag, 0)
+            result &= union
+        for tag in none_of:
+            result &= ~bitmaps.get(tag, 0)
+        return result
+
+    def discard_missing(self, product_ids):
+        """Limpa do índice ids que já não existem no banco."""
+        with self._lock:
+            for product_id in product_ids:
+                self._state.discard(product_id)
@@ -0,0 +1,317 @@
+"""
+Proxy e cache local das imagens dos produtos (GET /product/<id>/image).
+
+A imagem original (Product.image_url, nos servidores do OFF) é baixada uma
+única vez por um requests.Session com pool de conexões e redimensionada
+para os tamanhos de IMAGE_SIZES. Originais e miniaturas ficam em disco em
+IMAGE_CACHE_DIR:
+
+- blobs/<hash do conteúdo>.<ext>: os bytes, nomeados pelo próprio hash, que
+  também é o ETag (conteúdos iguais ocupam um arquivo só)
+- refs/<hash de url + tamanho>: o nome do blob daquela url nesse tamanho
+
+O total de blobs é limitado a IMAGE_CACHE_MAX_BYTES; ao passar disso os menos
+usados recentemente (mtime, atualizado a cada acesso) são removidos. Refs
+que apontam para um blob removido contam como miss.
+
+O redimensionamento requer Pillow (pip install Pillow). Sem ele, a rota
+serve a imagem original a partir do cache local.
+"""
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from flask import send_file
+
+try:
+    from PIL import Image
+except ImportError:  # opcional: pip install Pillow
+    Image = None
+
+EXTENSIONS = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'image/gif': 'gif',
+}
+
+MIMETYPES = {ext: mimetype for mimetype, ext in EXTENSIONS.items()}
+
+ORIGINAL = 0
+
+
+class ImageFetchError(Exception):
+    """A imagem original não pôde ser obtida ou não é uma imagem válida."""
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DiskLRU:
+    """Blobs nomeados pelo hash do conteúdo, com orçamento total em bytes."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._blobs = os.path.join(directory, 'blobs')
+        self._refs = os.path.join(directory, 'refs')
+        self._entries = OrderedDict()  # nome do blob -> tamanho, do menos ao mais recente
+        self._size = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Reconstrói a ordem LRU a partir do mtime dos arquivos já em disco."""
+        os.makedirs(self._blobs, exist_ok=True)
+        os.makedirs(self._refs, exist_ok=True)
+        found = []
+        with os.scandir(self._blobs) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    info = entry.stat()
+                    found.append((info.st_mtime, entry.name, info.st_size))
+        found.sort()
+        self._entries = OrderedDict((name, size) for _, name, size in found)
+        self._size = sum(size for _, _, size in found)
+        self._loaded = True
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def get(self, key):
+        """
+        Returns:
+            tuple[str, str] | None: (caminho do blob, nome do blob) ou None se ausente
+        """
+        self._ensure_loaded()
+        ref = os.path.join(self._refs, key)
+        try:
+            with open(ref, encoding='ascii') as f:
+                name = f.read().strip()
+        except FileNotFoundError:
+            return None
+        path = os.path.join(self._blobs, name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Blob removido pela LRU (deste ou de outro worker)
+            try:
+                os.remove(ref)
+            except FileNotFoundError:
+                pass
+            return None
+        with self._lock:
+            if name in self._entries:
+                self._entries.move_to_end(name)
+        return path, name
+
+    def put(self, key, data, ext):
+        """Grava o blob (se ainda não existir) e a ref da chave; devolve (caminho, nome)."""
+        self._ensure_loaded()
+        name = f'{_digest(data)}.{ext}'
+        path = os.path.join(self._blobs, name)
+        if not os.path.exists(path):
+            self._write(path, data)
+        self._write(os.path.join(self._refs, key), name.encode('ascii'))
+        with self._lock:
+            if name not in self._entries:
+                self._size += len(data)
+            self._entries[name] = len(data)
+            self._entries.move_to_end(name)
+            self._evict(keep=name)
+        return path, name
+
+    @staticmethod
+    def _write(path, data):
+        # Grava em um temporário e renomeia: leitores nunca veem arquivo pela metade
+        tmp = f'{path}.{threading.get_ident()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _evict(self, keep):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            name, size = next(iter(self._entries.items()))
+            if name == keep:
+                self._entries.move_to_end(name)
+                continue
+            del self._entries[name]
+            self._size -= size
+            try:
+                os.remove(os.path.join(self._blobs, name))
+            except FileNotFoundError:
+                pass
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+
+class ThumbnailCache:
+    """Baixa, redimensiona e guarda em disco as imagens dos produtos."""
+
+    def __init__(self):
+        self.sizes = (100, 200, 400)
+        self.default_size = 200
+        self.max_age = 30 * 24 * 3600
+        self.timeout = 10
+        self.max_source_bytes = 10 * 1024 * 1024
+        self.pool_size = 10
+        self.jpeg_quality = 85
+        self.cache = None
+        self._session = None
+        self._locks = [threading.Lock() for _ in range(64)]
+
+    def init_app(self, app):
+        app.config.setdefault('IMAGE_CACHE_DIR', os.path.join(app.instance_path, 'images'))
+        app.config.setdefault('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+        app.config.setdefault('IMAGE_SIZES', (100, 200, 400))
+        app.config.setdefault('IMAGE_DEFAULT_SIZE', 200)
+        app.config.setdefault('IMAGE_MAX_AGE', 30 * 24 * 3600)
+        app.config.setdefault('IMAGE_FETCH_TIMEOUT', 10)
+        app.config.setdefault('IMAGE_MAX_SOURCE_BYTES', 10 * 1024 * 1024)
+        app.config.setdefault('IMAGE_POOL_SIZE', 10)
+        app.config.setdefault('IMAGE_JPEG_QUALITY', 85)
+
+        self.sizes = tuple(sorted(app.config['IMAGE_SIZES']))
+        self.default_size = app.config['IMAGE_DEFAULT_SIZE']
+        self.max_age = app.config['IMAGE_MAX_AGE']
+        self.timeout = app.config['IMAGE_FETCH_TIMEOUT']
+        self.max_source_bytes = app.config['IMAGE_MAX_SOURCE_BYTES']
+        self.pool_size = app.config['IMAGE_POOL_SIZE']
+        self.jpeg_quality = app.config['IMAGE_JPEG_QUALITY']
+        # O diretório só é lido no primeiro acesso: não pesa no boot
+        self.cache = DiskLRU(app.config['IMAGE_CACHE_DIR'], app.config['IMAGE_CACHE_MAX_BYTES'])
+        self._session = None
+
+    def resize_available(self):
+        return Image is not None
+
+    # ---------- Cliente HTTP ----------
+
+    def session(self):
+        if self._session is None:
+            # Importado só na primeira imagem baixada, como a busca na OFF
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self._session = session
+        return self._session
+
+    def fetch(self, url):
+        """
+        Baixa a imagem original.
+
+        Returns:
+            tuple[bytes, str]: Conteúdo e extensão (jpg, png, webp ou gif)
+
+        Raises:
+            ImageFetchError: Erro de rede, status diferente de 200, tipo que
+                não é imagem ou arquivo maior que IMAGE_MAX_SOURCE_BYTES
+        """
+        import requests
+
+        try:
+            with self.session().get(url, timeout=self.timeout, stream=True) as response:
+                if response.status_code != 200:
+                    raise ImageFetchError(f'Upstream returned {response.status_code}')
+                mimetype = response.headers.get('Content-Type', '').split(';')[0].strip()
+                ext = EXTENSIONS.get(mimetype)
+                if ext is None:
+                    raise ImageFetchError(f'Unsupported image type: {mimetype or "unknown"}')
+                chunks, total = [], 0
+                for chunk in response.iter_content(64 * 1024):
+                    total += len(chunk)
+                    if total > self.max_source_bytes:
+                        raise ImageFetchError('Image too large')
+                    chunks.append(chunk)
+        except requests.RequestException as e:
+            raise ImageFetchError(f'Image download failed: {e}') from e
+        return b''.join(chunks), ext
+
+    # ---------- Miniaturas ----------
+
+    def resize(self, data, size):
+        """
+        Reduz a imagem para caber em size x size (mantendo a proporção).
+
+        Returns:
+            tuple[bytes, str]: JPEG, ou PNG se a imagem tiver transparência
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as image:
+                # JPEG: decodifica já em escala reduzida
+                image.draft('RGB', (size, size))
+                image.thumbnail((size, size), Image.LANCZOS)
+                alpha = image.mode in ('RGBA', 'LA') or (
+                    image.mode == 'P' and 'transparency' in image.info)
+                output = io.BytesIO()
+                if alpha:
+                    image.save(output, 'PNG', optimize=True)
+                    return output.getvalue(), 'png'
+                image.convert('RGB').save(output, 'JPEG', quality=self.jpeg_quality,
+                                          optimize=True, progressive=True)
+                return output.getvalue(), 'jpg'
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            raise ImageFetchError(f'Invalid image: {e}') from e
+
+    @staticmethod
+    def _key(url, size):
+        return _digest(f'{url}\n{size}'.encode('utf-8'))
+
+    def get(self, url, size):
+        """
+        Miniatura de `url` no tamanho pedido, do cache ou baixada e gerada agora.
+        Sem Pillow, devolve a imagem original.
+
+        Returns:
+            tuple[str, str, bool]: (caminho, nome do blob, veio do cache)
+
+        Raises:
+            ImageFetchError: Se a original não puder ser obtida ou decodificada
+        """
+        if Image is None:
+            size = ORIGINAL
+        key = self._key(url, size)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached + (True,)
+
+        # Lock por url: requisições simultâneas da mesma imagem baixam uma vez só
+        with self._locks[hash(url) % len(self._locks)]:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached + (True,)
+
+            original_key = self._key(url, ORIGINAL)
+            original = self.cache.get(original_key)
+            if original is not None:
+                with open(original[0], 'rb') as f:
+                    data = f.read()
+            else:
+                data, ext = self.fetch(url)
+                original = self.cache.put(original_key, data, ext)
+            if size == ORIGINAL:
+                return original + (False,)
+
+            thumbnail, ext = self.resize(data, size)
+            return self.cache.put(key, thumbnail, ext) + (False,)
+
+    def response(self, path, name):
+        """Resposta com ETag (hash do conteúdo) e cache longo; 304 se o ETag bater."""
+        digest, ext = name.rsplit('.', 1)
+        return send_file(open(path, 'rb'), mimetype=MIMETYPES[ext], etag=digest,
+                         max_age=self.max_age, conditional=True)
@@ -0,0 +1,33 @@
+"""
+Fixtures compartilhadas pelos testes: app isolado (banco SQLite temporário,
+nunca o instance/truthlable.db) e o stub local de imagens dos benchmarks.
+"""
+import os
+import sys
+
+import pytest
+
+# Permite rodar "pytest" a partir da raiz do repositório
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+@pytest.fixture(scope='session')
+def image_stub():
+    from benchmarks.image_stub import ImageStubServer
+
+    with ImageStubServer(size=600) as stub:
+        yield stub
+
+
+@pytest.fixture
+def make_test_app(tmp_path):
+    """Fábrica de apps com banco e diretórios de cache dentro de tmp_path."""
+    from benchmarks.common import make_app
+
+    def factory(**config):
+        config.setdefault('IMAGE_CACHE_DIR', str(tmp_path / 'images'))
+        return make_app(str(tmp_path / 'test.db'), **config)
+
+    return factory
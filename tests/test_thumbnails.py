@@ -0,0 +1,99 @@
+"""GET /product/<id>/image contra o stub local de imagens (benchmarks/image_stub.py)."""
+import pytest
+
+
+def add_products(app, urls):
+    """Cria um produto por url de imagem; devolve os ids na mesma ordem."""
+    from extensions import db
+    from model.product import Product
+
+    with app.app_context():
+        products = [Product(name=f'Produto {i}', barcode=f'200000000{i:04d}', image_url=url)
+                    for i, url in enumerate(urls)]
+        db.session.add_all(products)
+        db.session.commit()
+        return [product.id for product in products]
+
+
+@pytest.fixture
+def app(make_test_app):
+    return make_test_app()
+
+
+def test_cold_miss_then_warm_hit(app, image_stub):
+    (product_id,) = add_products(app, [f'{image_stub.base_url}/images/warm.png'])
+    client = app.test_client()
+    before = image_stub.requests_served
+
+    cold = client.get(f'/product/{product_id}/image?size=100')
+    assert cold.status_code == 200
+    assert cold.mimetype.startswith('image/')
+    assert image_stub.requests_served == before + 1
+
+    warm = client.get(f'/product/{product_id}/image?size=100')
+    assert warm.status_code == 200
+    assert warm.data == cold.data
+    assert image_stub.requests_served == before + 1
+    assert 'max-age' in warm.headers['Cache-Control']
+
+
+def test_etag_revalidation_returns_304(app, image_stub):
+    (product_id,) = add_products(app, [f'{image_stub.base_url}/images/etag.png'])
+    client = app.test_client()
+
+    first = client.get(f'/product/{product_id}/image')
+    etag = first.headers['ETag']
+    assert etag
+
+    revalidated = client.get(f'/product/{product_id}/image', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+    changed = client.get(f'/product/{product_id}/image', headers={'If-None-Match': '"other"'})
+    assert changed.status_code == 200
+
+
+def test_lru_evicts_least_recently_used(make_test_app, image_stub):
+    from extensions import thumbnails
+
+    max_bytes = 10000
+    app = make_test_app(IMAGE_CACHE_MAX_BYTES=max_bytes)
+    ids = add_products(app, [f'{image_stub.base_url}/images/lru-{i}.png' for i in range(6)])
+    client = app.test_client()
+
+    for product_id in ids:
+        assert client.get(f'/product/{product_id}/image?size=100').status_code == 200
+    assert thumbnails.cache.size <= max_bytes
+
+    # O mais recente continua em cache; o primeiro foi removido e é baixado de novo
+    before = image_stub.requests_served
+    assert client.get(f'/product/{ids[-1]}/image?size=100').status_code == 200
+    assert image_stub.requests_served == before
+    assert client.get(f'/product/{ids[0]}/image?size=100').status_code == 200
+    assert image_stub.requests_served == before + 1
+    assert thumbnails.cache.size <= max_bytes
+
+
+def test_unsupported_size_returns_400(app, image_stub):
+    (product_id,) = add_products(app, [f'{image_stub.base_url}/images/size.png'])
+    before = image_stub.requests_served
+
+    response = app.test_client().get(f'/product/{product_id}/image?size=123')
+    assert response.status_code == 400
+    assert response.json['sizes'] == [100, 200, 400]
+    assert image_stub.requests_served == before
+
+
+@pytest.mark.parametrize('path', ['/missing/gone.png', '/images/not-an-image.txt'])
+def test_upstream_failure_returns_502(app, image_stub, path):
+    (product_id,) = add_products(app, [f'{image_stub.base_url}{path}'])
+
+    response = app.test_client().get(f'/product/{product_id}/image')
+    assert response.status_code == 502
+    assert 'error' in response.json
+
+
+def test_product_without_image_returns_404(app):
+    (product_id,) = add_products(app, [None])
+
+    assert app.test_client().get(f'/product/{product_id}/image').status_code == 404